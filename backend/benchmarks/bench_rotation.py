@@ -0,0 +1,323 @@
+"""
+Rotation Benchmark
+Times the rotation decision hot path for every built-in class over randomized
+state snapshots and compares the results against a stored baseline
+
+decide times RotationEngine._decide alone over the states of a simulated
+fight, where power and target health move a little each tick, with the
+decision cache and with full evaluation (decide_full, for reading only).
+
+Timings are compared relative to a fixed reference workload timed right
+before each measurement (the *_rel metrics, in multiples of one reference
+call), not in absolute ns. On a shared single-CPU VM the same code swings
+about 2x between runs as the machine speeds up and slows down, and the
+reference swings with it; the ratios stay within about 15%, which the
+default threshold allows for. The *_ns values are kept for reading only.
+
+Usage (from backend/):
+    python -m benchmarks.bench_rotation
+    python -m benchmarks.bench_rotation --save-baseline --reason "why the numbers moved"
+    python -m benchmarks.bench_rotation --threshold 0.5
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from array import array
+
+from config.rotations import CLASSES
+from core.game_state import GameState
+from core.memory_reader import MockMemoryReader
+from core.rotation_engine import RotationEngine
+from core.simulator import CombatSimulator, NullKeySink, VirtualClock
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+# Metrics checked against the baseline (lower is better)
+METRICS = ["update_rel", "execute_rel", "should_cast_rel", "decide_rel", "alloc_bytes_per_tick"]
+# Baseline keys holding the reason given for each update and the machine it ran on
+HISTORY_KEY = "_history"
+MACHINE_KEY = "_machine"
+
+# Distinct snapshots cycled through; the live reader refills a single
+# GameState, and thousands of them (5KB each) would time cache misses
+SNAPSHOT_POOL = 64
+REFERENCE_CALLS = 2000
+# Simulated seconds of the fight the decide metrics replay
+FIGHT_SECONDS = 120
+
+
+class _ReferenceState:
+    __slots__ = ("power", "target_health_percent")
+
+    def __init__(self):
+        self.power = 40
+        self.target_health_percent = 50
+
+
+def _reference_check(state):
+    # Shaped like a compiled spell check
+    if not (state.power >= 40):
+        return 4
+    if not (state.target_health_percent > 30):
+        return 8
+    return 0
+
+
+_REFERENCE_STATE = _ReferenceState()
+
+
+def run_reference():
+    """REFERENCE_CALLS calls of a check over two slotted attributes"""
+    state = _REFERENCE_STATE
+    check = _reference_check
+    for _ in range(REFERENCE_CALLS // 4):
+        check(state)
+        check(state)
+        check(state)
+        check(state)
+
+
+class SnapshotReader(MockMemoryReader):
+    """MockMemoryReader that cycles through prebuilt state snapshots"""
+
+    def __init__(self, snapshots):
+        self.snapshots = snapshots
+        self.index = 0
+
+    def get_game_state(self):
+        state = self.snapshots[self.index]
+        self.index = (self.index + 1) % len(self.snapshots)
+        return state
+
+
+def make_snapshots(count: int, seed: int) -> list:
+    """Build randomized game state snapshots"""
+    rng = random.Random(seed)
+    snapshots = []
+    for _ in range(count):
+        state = GameState()
+        state.health_percent = rng.randint(10, 100)
+        state.power = rng.randint(0, 100)
+        state.in_combat = rng.random() < 0.9
+        state.target_name = "训练假人"
+        state.target_health_percent = rng.randint(0, 100)
+        snapshots.append(state)
+    return snapshots
+
+
+def make_engine(class_name: str, snapshots: list):
+    clock = VirtualClock()
+    engine = RotationEngine(SnapshotReader(snapshots), NullKeySink(), clock=clock)
+    engine.set_class(class_name)
+    engine.set_keybinds({})
+    engine.set_options(combat_protect=False)
+    engine.action_cooldown = 0
+    engine.start()
+    return engine, clock
+
+
+def record_fight(class_name: str, seconds: float = FIGHT_SECONDS):
+    """
+    Simulate a fight, returning its engine and every tick's decision inputs
+    as (state, now, GCD ready time, spell ready times)
+    """
+    sim = CombatSimulator(class_name)
+    engine, clock, cooldowns = sim.engine, sim.clock, sim.engine.cooldowns
+    engine.start()
+    decisions = []
+    for index in range(1, int(seconds / sim.tick) + 1):
+        state = sim.state.get_game_state()
+        decisions.append((state.copy(), clock(), cooldowns.gcd_ready_at, array("d", cooldowns.ready_at)))
+        engine.update(state)
+        clock.now = index * sim.tick
+    return engine, decisions
+
+
+def _elapsed_ns(fn) -> int:
+    started = time.perf_counter_ns()
+    fn()
+    return time.perf_counter_ns() - started
+
+
+def _measure(repeats: int, fn, calls: int):
+    """
+    Time fn repeats times, each right after the reference workload
+    Returns (fastest ns per call, median ns per call in reference calls)
+    """
+    best = None
+    ratios = []
+    for _ in range(repeats):
+        reference = _elapsed_ns(run_reference) / REFERENCE_CALLS
+        elapsed = _elapsed_ns(fn) / calls
+        ratios.append(elapsed / reference)
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, statistics.median(ratios)
+
+
+def machine() -> str:
+    return (f"{platform.system()} {platform.machine()}, {os.cpu_count()} CPU, "
+            f"{platform.python_implementation()} {platform.python_version()}")
+
+
+def bench_class(class_name: str, iterations: int, repeats: int, seed: int) -> dict:
+    """Benchmark one class, returning per-call times and bytes allocated per tick"""
+    snapshots = make_snapshots(SNAPSHOT_POOL, seed)
+    ticks = [snapshots[index % SNAPSHOT_POOL] for index in range(iterations)]
+    engine, clock = make_engine(class_name, snapshots)
+
+    def run_update():
+        for _ in range(iterations):
+            clock.advance(0.1)
+            engine.update()
+
+    def run_execute():
+        for state in ticks:
+            clock.advance(0.1)
+            engine._execute_rotation(state)
+
+    def run_should_cast():
+        should_cast = engine._should_cast_spell
+        program = engine.program
+        for state in ticks:
+            for spell in program:
+                should_cast(spell, state)
+
+    fight_engine, decisions = record_fight(class_name)
+    cache = fight_engine.decision_cache
+
+    def run_decide():
+        cooldowns = fight_engine.cooldowns
+        decide = fight_engine._decide
+        for state, now, gcd_ready_at, ready_at in decisions:
+            cooldowns.gcd_ready_at = gcd_ready_at
+            cooldowns.ready_at = ready_at
+            decide(state, now)
+
+    def run_decide_full():
+        fight_engine.decision_cache = None
+        try:
+            run_decide()
+        finally:
+            fight_engine.decision_cache = cache
+
+    update_ns, update_rel = _measure(repeats, run_update, iterations)
+    execute_ns, execute_rel = _measure(repeats, run_execute, iterations)
+    should_cast_ns, should_cast_rel = _measure(repeats, run_should_cast,
+                                               iterations * len(engine.program))
+    decide_ns, decide_rel = _measure(repeats, run_decide, len(decisions))
+    decide_full_ns, decide_full_rel = _measure(repeats, run_decide_full, len(decisions))
+
+    # Transient allocations: peak traced memory above the steady state, per tick
+    tracemalloc.start()
+    total = 0
+    for _ in range(min(iterations, 1000)):
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        clock.advance(0.1)
+        engine.update()
+        _, peak = tracemalloc.get_traced_memory()
+        total += peak - current
+    tracemalloc.stop()
+    alloc_bytes = total / min(iterations, 1000)
+
+    return {
+        "update_ns": round(update_ns, 1),
+        "execute_ns": round(execute_ns, 1),
+        "should_cast_ns": round(should_cast_ns, 1),
+        "update_rel": round(update_rel, 2),
+        "execute_rel": round(execute_rel, 2),
+        "should_cast_rel": round(should_cast_rel, 3),
+        "decide_ns": round(decide_ns, 1),
+        "decide_rel": round(decide_rel, 2),
+        "decide_full_ns": round(decide_full_ns, 1),
+        "decide_full_rel": round(decide_full_rel, 2),
+        "alloc_bytes_per_tick": round(alloc_bytes, 1),
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """Return a list of regressions exceeding the threshold"""
+    regressions = []
+    for class_name, metrics in results.items():
+        base = baseline.get(class_name, {})
+        for metric in METRICS:
+            old = base.get(metric)
+            new = metrics.get(metric)
+            if not old or new is None:
+                continue
+            if new > old * (1 + threshold):
+                regressions.append(
+                    f"{class_name}.{metric}: {new} vs baseline {old} (+{(new / old - 1) * 100:.0f}%)"
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rotation hot path benchmark")
+    parser.add_argument("--iterations", type=int, default=5000)
+    parser.add_argument("--repeats", type=int, default=9)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--threshold", type=float, default=0.3,
+                        help="Allowed slowdown vs baseline, relative to the reference workload (0.3 = 30%%)")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--reason", help="Why the baseline is being updated (required with --save-baseline)")
+    parser.add_argument("--classes", nargs="*", default=CLASSES)
+    args = parser.parse_args()
+    if args.save_baseline and not args.reason:
+        parser.error("--save-baseline needs a --reason, recorded in the baseline's history")
+
+    results = {}
+    columns = ("update", "execute", "should_cast", "decide", "decide_full")
+    print(f"{'class':<14}" + "".join(f"{name:>18}" for name in columns) + f"{'alloc/tick':>12}")
+    for class_name in args.classes:
+        metrics = bench_class(class_name, args.iterations, args.repeats, args.seed)
+        results[class_name] = metrics
+        print(f"{class_name:<14}" + "".join(
+            f"{metrics[name + '_ns']:>8.0f}ns ({metrics[name + '_rel']:>5.2f}x)"
+            for name in columns)
+            + f"{metrics['alloc_bytes_per_tick']:>11.0f}B")
+
+    if args.save_baseline:
+        # Keep the reasons for every earlier update, so the file says why each number is what it is
+        history = []
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding="utf-8") as f:
+                history = json.load(f).get(HISTORY_KEY, [])
+        results[HISTORY_KEY] = history + [f"{time.strftime('%Y-%m-%d')}: {args.reason}"]
+        results[MACHINE_KEY] = machine()
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, sort_keys=True, ensure_ascii=False)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("No baseline found, run with --save-baseline first")
+        return 0
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline.get(MACHINE_KEY) != machine():
+        print(f"Baseline measured on {baseline.get(MACHINE_KEY, 'an unknown machine')}, "
+              f"this is {machine()}")
+
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"Regressions over {args.threshold * 100:.0f}%:")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+
+    print("No regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,151 @@
+"""
+Startup Benchmark
+Measures cold start of the entry points in fresh interpreters with
+-X importtime and compares them against a stored baseline
+
+Modes:
+    main      import main (must not pull in Qt or pywin32)
+    headless  python main.py --headless, started and stopped immediately
+    ui        import ui.main_window (PyQt6), skipped if PyQt6 isn't installed
+
+Usage (from backend/):
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --save-baseline
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "startup_baseline.json")
+
+MODES = {
+    "main": ["-c", "import main"],
+    "headless": ["main.py", "--headless", "--duration", "0.001", "--no-watch", "--no-metrics"],
+    "ui": ["-c", "import ui.main_window"],
+}
+# Modules that must never be imported by the non-UI modes
+FORBIDDEN = {"main": ("PyQt6", "win32api"), "headless": ("PyQt6", "win32api")}
+
+# Metrics checked against the baseline (lower is better)
+METRICS = ["import_ms", "wall_ms"]
+
+
+def parse_importtime(stderr: str):
+    """Return (total cumulative us of top-level imports, {module: self us})"""
+    total = 0
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = int(self_us)
+        # Nested imports are indented under their parent
+        if not name[1:].startswith(" "):
+            total += int(cumulative_us)
+    return total, modules
+
+
+def run_mode(mode: str):
+    """One fresh interpreter run: (import us, wall ms, modules) or None if it failed"""
+    command = [sys.executable, "-X", "importtime"] + MODES[mode]
+    started = time.perf_counter()
+    result = subprocess.run(command, cwd=BACKEND_DIR, capture_output=True, text=True)
+    wall_ms = (time.perf_counter() - started) * 1000
+    if result.returncode != 0:
+        return None
+    import_us, modules = parse_importtime(result.stderr)
+    return import_us, wall_ms, modules
+
+
+def bench_mode(mode: str, repeats: int):
+    """Best of repeats, or None if the mode can't run here"""
+    best = None
+    for _ in range(repeats):
+        run = run_mode(mode)
+        if run is None:
+            return None
+        if best is None or run[1] < best[1]:
+            best = run
+    import_us, wall_ms, modules = best
+
+    for name in FORBIDDEN.get(mode, ()):
+        if name in modules:
+            print(f"  warning: {mode} imported {name}")
+
+    return {
+        "import_ms": round(import_us / 1000, 1),
+        "wall_ms": round(wall_ms, 1),
+        "modules": len(modules),
+        "slowest": sorted(modules.items(), key=lambda item: -item[1])[:5],
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """Return a list of regressions exceeding the threshold"""
+    regressions = []
+    for mode, metrics in results.items():
+        base = baseline.get(mode, {})
+        for metric in METRICS:
+            old = base.get(metric)
+            new = metrics.get(metric)
+            if not old or new is None:
+                continue
+            if new > old * (1 + threshold):
+                regressions.append(
+                    f"{mode}.{metric}: {new} vs baseline {old} (+{(new / old - 1) * 100:.0f}%)"
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Startup time benchmark")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--threshold", type=float, default=0.3,
+                        help="Allowed slowdown vs baseline (0.3 = 30%%)")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--modes", nargs="*", default=list(MODES))
+    args = parser.parse_args()
+
+    results = {}
+    print(f"{'mode':<10}{'imports':>10}{'wall':>10}{'modules':>9}  slowest (self)")
+    for mode in args.modes:
+        metrics = bench_mode(mode, args.repeats)
+        if metrics is None:
+            print(f"{mode:<10}  unavailable (failed to start)")
+            continue
+        slowest = ", ".join(f"{name} {us / 1000:.1f}ms" for name, us in metrics.pop("slowest"))
+        results[mode] = metrics
+        print(f"{mode:<10}{metrics['import_ms']:>8.1f}ms{metrics['wall_ms']:>8.1f}ms"
+              f"{metrics['modules']:>9}  {slowest}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("No baseline found, run with --save-baseline first")
+        return 0
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"Regressions over {args.threshold * 100:.0f}%:")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+
+    print("No regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+"""
+Default spell keybinds for each class
+User overrides can be placed in config/rotation_files/keybinds.toml, one table
+per class:
+
+    [druid]
+    "割裂" = "3"
+"""
+import os
+import tomllib
+from typing import Dict, Optional
+
+KEYBINDS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             "rotation_files", "keybinds.toml")
+
+DEFAULT_KEYBINDS = {
+    "death_knight": {
+        "暗影打击": "1",
+        "传染": "2",
+        "心脏打击": "3",
+        "灵界打击": "4",
+        "符文打击": "5",
+        "枯萎凋零": "q",
+        "血液沸腾": "e",
+    },
+    "hunter": {
+        "杀戮命令": "1",
+        "奥术射击": "2",
+        "多重射击": "3",
+        "稳固射击": "4",
+        "钉刺": "5",
+        "狂野怒火": "q",
+        "误导": "e",
+    },
+    "warrior": {
+        "致死打击": "1",
+        "巨人打击": "2",
+        "压制": "3",
+        "顺劈斩": "4",
+        "英勇打击": "5",
+        "撕裂": "q",
+        "冲锋": "e",
+    },
+    "monk": {
+        "猛虎掌": "1",
+        "幻灭踢": "2",
+        "碎玉闪电": "3",
+        "连击": "4",
+        "腿击": "q",
+        "旭日东升踢": "e",
+    },
+    "shaman": {
+        "闪电箭": "1",
+        "大地震击": "2",
+        "风暴打击": "3",
+        "烈焰震击": "4",
+        "元素冲击": "q",
+        "冰霜震击": "e",
+    },
+    "druid": {
+        "凶猛撕咬": "1",
+        "斜掠": "2",
+        "割裂": "3",
+        "爪击": "4",
+        "裂伤": "5",
+        "狂暴": "q",
+    },
+}
+
+
+def load_keybind_overrides(path: str = KEYBINDS_FILE) -> dict:
+    """Read keybind overrides (class -> spell name -> key), empty if there is no file"""
+    if not os.path.exists(path):
+        return {}
+    with open(path, "rb") as f:
+        overrides = tomllib.load(f)
+    for class_name, keybinds in overrides.items():
+        if not isinstance(keybinds, dict) or not all(isinstance(k, str) for k in keybinds.values()):
+            raise ValueError(f"{path}: [{class_name}] must map spell names to keys")
+    return overrides
+
+
+def load_keybinds(class_name: str, path: str = KEYBINDS_FILE) -> dict:
+    """Default keybinds for a class with file overrides applied"""
+    keybinds = DEFAULT_KEYBINDS.get(class_name, {}).copy()
+    try:
+        keybinds.update(load_keybind_overrides(path).get(class_name, {}))
+    except (OSError, ValueError) as e:
+        print(f"Ignoring keybind overrides: {e}")
+    return keybinds
+
+
+def keybind_changes(previous: Dict[str, str], loaded: Dict[str, str],
+                    live: Dict[str, str]) -> Dict[str, Optional[str]]:
+    """
+    Keybinds to write into the live dict after the keybinds file changed
+    Args:
+        previous: Defaults plus file overrides as of the last read
+        loaded: Defaults plus file overrides now
+        live: The engine's current keybinds, possibly edited in the UI
+    Returns spell name -> key, None for a binding to remove
+    """
+    changes = {name: key for name, key in loaded.items() if previous.get(name) != key}
+    for name, key in previous.items():
+        # Dropped from the file (no default either), unless since edited in the UI
+        if name not in loaded and live.get(name) == key:
+            changes[name] = None
+    return changes
+
+
+def merge_keybinds(keybinds: Dict[str, str], changes: Dict[str, Optional[str]]):
+    """Apply keybind_changes to a keybind dict in place"""
+    for name, key in changes.items():
+        if key is None:
+            keybinds.pop(name, None)
+        else:
+            keybinds[name] = key
@@ -0,0 +1,315 @@
+"""
+Async Runtime
+Runs state reading, rotation decisions and key emission as separate asyncio
+tasks, an alternative to the EngineWorker thread
+
+    reader  --states-->  decider  --presses-->  actor
+
+Each arrow is a single-slot queue with latest-value semantics: an unread
+value is replaced by a newer one, so a stage that falls behind works on
+fresh data instead of a backlog. Memory reads run on a dedicated thread, so
+a slow read never delays a key release the actor has already scheduled.
+Readers refill one GameState on every read, so states are copied into a
+SnapshotBuffer on the read thread and the decider works on its own copy
+while the next read runs.
+
+The runtime hosts its own event loop on a thread by default; with the Qt UI
+it can run on the GUI event loop instead through qasync, if installed.
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from core.game_state import SnapshotBuffer
+
+_EMPTY = object()
+
+
+class LatestSlot:
+    """
+    Single-value queue: put() replaces whatever is still unread
+    put() must be called on the event loop's thread.
+    """
+
+    def __init__(self):
+        self._value = _EMPTY
+        self._waiter = None
+        # Values overwritten before anyone read them
+        self.replaced = 0
+
+    def put(self, value):
+        if self._value is not _EMPTY:
+            self.replaced += 1
+        self._value = value
+        waiter = self._waiter
+        if waiter is not None and not waiter.done():
+            waiter.set_result(None)
+
+    async def get(self):
+        while self._value is _EMPTY:
+            self._waiter = asyncio.get_running_loop().create_future()
+            try:
+                await self._waiter
+            finally:
+                self._waiter = None
+        value, self._value = self._value, _EMPTY
+        return value
+
+
+class AsyncKeyActor:
+    """
+    Emits key presses from an asyncio task
+    Drop-in for KeyDispatcher as the KeySimulator dispatcher: schedule() takes
+    the same (delay, vk_code, is_down) event lists. A press that hasn't started
+    when the next one arrives is dropped; one that has started always runs to
+    its key ups, even when the actor is cancelled.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._slot = LatestSlot()
+        self._held = set()
+        self._loop = None
+        self._loop_thread = None
+
+    def schedule(self, events):
+        """Queue a press (a list of key events) and return immediately"""
+        events = list(events)
+        loop = self._loop
+        if loop is not None and threading.get_ident() != self._loop_thread:
+            loop.call_soon_threadsafe(self._slot.put, events)
+        else:
+            self._slot.put(events)
+
+    @property
+    def dropped_presses(self) -> int:
+        """Presses replaced by a newer one before they started"""
+        return self._slot.replaced
+
+    async def run(self):
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        try:
+            while True:
+                await self._emit(await self._slot.get())
+        finally:
+            self.release_all()
+            self._loop = None
+
+    async def _emit(self, events):
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        # Stable sort keeps events with the same delay in the order given
+        for delay, vk_code, is_down in sorted(events, key=lambda event: event[0]):
+            wait = started + delay - loop.time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._send(vk_code, is_down)
+
+    def _send(self, vk_code: int, is_down: bool):
+        try:
+            if is_down:
+                self.backend.key_down(vk_code)
+                self._held.add(vk_code)
+            else:
+                self.backend.key_up(vk_code)
+                self._held.discard(vk_code)
+        except Exception as e:
+            print(f"Error sending key {vk_code:#x}: {e}")
+
+    def release_all(self):
+        """Send key ups for every key still held down"""
+        for vk_code in list(self._held):
+            self._send(vk_code, False)
+
+
+class AsyncEngineRuntime:
+    """
+    Reader, decider and (optional) actor tasks around one rotation engine
+    Exposes the same start/stop/ticks interface as EngineWorker. on_state gets
+    every state read, live as in EngineWorker, on the event loop's thread.
+    """
+
+    def __init__(self, memory_reader, rotation_engine, actor: AsyncKeyActor = None,
+                 interval: float = 0.1, on_state=None, event_driven: bool = False,
+                 min_interval: float = 0.005):
+        self.memory_reader = memory_reader
+        self.rotation_engine = rotation_engine
+        # Only needed when the engine's KeySimulator dispatches through it
+        self.actor = actor
+        # Fixed read interval, or the polling ceiling when event driven
+        self.interval = interval
+        self.on_state = on_state
+        self.event_driven = event_driven
+        self.min_interval = min_interval
+
+        self.ticks = 0
+        # Intervals missed, counted as by EngineWorker
+        self.dropped_ticks = 0
+
+        self._snapshots = SnapshotBuffer()
+        # Wakes the decider when a snapshot is published
+        self._published = LatestSlot()
+        self._decided = asyncio.Event()
+        self._next_delay = interval
+        self._executor = None
+        self._loop = None
+        self._task = None
+        self._thread = None
+
+    @property
+    def dropped_states(self) -> int:
+        """States replaced by a newer read before the decider got to them"""
+        return self._snapshots.replaced
+
+    @property
+    def is_alive(self) -> bool:
+        if self._thread is not None:
+            return self._thread.is_alive()
+        return self._task is not None and not self._task.done()
+
+    async def run(self):
+        """Run every task until cancelled"""
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="StateReader")
+        tasks = [asyncio.create_task(self._read_loop()),
+                 asyncio.create_task(self._decide_loop())]
+        if self.actor is not None:
+            tasks.append(asyncio.create_task(self.actor.run()))
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            # A read still in flight finishes on its own; don't wait for it
+            self._executor.shutdown(wait=False)
+
+    def start(self, loop: asyncio.AbstractEventLoop = None):
+        """
+        Start the runtime
+        Args:
+            loop: Event loop to run on (e.g. the Qt loop from create_qt_event_loop),
+                  called from that loop's thread; a private loop thread if omitted
+        """
+        if self.is_alive:
+            return
+        if loop is not None:
+            self._loop = loop
+            self._task = loop.create_task(self.run())
+            return
+        # Created here so stop() can cancel the task even before the thread runs it
+        loop = asyncio.new_event_loop()
+        self._loop = loop
+        self._task = loop.create_task(self.run())
+        self._thread = threading.Thread(target=self._run_thread, args=(loop, self._task),
+                                        name="EngineRuntime", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 1.0):
+        """Cancel the tasks; with a private loop, wait for its thread to exit"""
+        loop, task, thread = self._loop, self._task, self._thread
+        if task is not None and loop is not None:
+            if thread is not None:
+                loop.call_soon_threadsafe(task.cancel)
+            else:
+                task.cancel()
+        if thread is not None:
+            thread.join(timeout)
+            self._thread = None
+            self._loop = None
+        elif self.actor is not None:
+            # The loop may stop before the cancellation runs
+            self.actor.release_all()
+        self._task = None
+
+    def _run_thread(self, loop, task):
+        asyncio.set_event_loop(loop)
+        try:
+            loop.run_until_complete(task)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            loop.close()
+
+    def _read(self):
+        """Read the game state and publish a copy for the decider (read thread)"""
+        state = self.memory_reader.get_game_state()
+        if state is not None:
+            self._snapshots.publish(state)
+        return state
+
+    async def _read_loop(self):
+        loop = asyncio.get_running_loop()
+        next_tick = due = loop.time()
+        while True:
+            try:
+                state = await loop.run_in_executor(self._executor, self._read)
+            except Exception as e:
+                print(f"Error in engine runtime: {e}")
+                state = None
+
+            if state is not None:
+                self.ticks += 1
+                if self.on_state:
+                    self.on_state(state)
+                self._decided.clear()
+                self._published.put(True)
+
+            if self.event_driven:
+                # Wake at the engine's predicted next action, once it has seen this state
+                if state is not None:
+                    try:
+                        await asyncio.wait_for(self._decided.wait(), self.interval)
+                    except asyncio.TimeoutError:
+                        pass
+                now = loop.time()
+                late = now - due
+                if late >= self.interval:
+                    # Decided that long after the predicted wake-up
+                    self.dropped_ticks += int(late / self.interval)
+                delay = max(self.min_interval, self._next_delay)
+                due = now + delay
+                await asyncio.sleep(delay)
+                continue
+
+            next_tick += self.interval
+            delay = next_tick - loop.time()
+            if delay < 0:
+                # Overran one or more ticks, skip them instead of bursting
+                missed = int(-delay / self.interval) + 1
+                self.dropped_ticks += missed
+                next_tick += missed * self.interval
+                delay = next_tick - loop.time()
+            await asyncio.sleep(max(0.0, delay))
+
+    async def _decide_loop(self):
+        engine = self.rotation_engine
+        while True:
+            await self._published.get()
+            # Valid until the next take(), whatever the read thread does meanwhile
+            state = self._snapshots.take()
+            if state is None:
+                continue
+            delay = self.interval
+            try:
+                engine.update(state)
+                if self.event_driven:
+                    delay = engine.time_until_next_action(state, ceiling=self.interval)
+            except Exception as e:
+                print(f"Error in engine runtime: {e}")
+            self._next_delay = delay
+            self._decided.set()
+
+
+def create_qt_event_loop(app):
+    """
+    An asyncio loop that runs on the Qt event loop, or None without qasync
+    Run it with loop.run_forever() instead of app.exec().
+    """
+    try:
+        import qasync
+    except ImportError:
+        return None
+    loop = qasync.QEventLoop(app)
+    asyncio.set_event_loop(loop)
+    return loop
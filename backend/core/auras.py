@@ -0,0 +1,129 @@
+"""
+Auras
+Buff/debuff tables backed by fixed-size arrays, indexed by interned aura IDs
+"""
+import ast
+from array import array
+from typing import Dict, List, Tuple
+
+from core.conditions import parse_conditions
+from core.spell_registry import REGISTRY, SpellRegistry
+
+
+class AuraTable:
+    """
+    Active auras on one unit
+    remaining[id] is the seconds left and stacks[id] the stack count; an aura
+    is active while its stack count is non-zero, so lookups are one array read
+    """
+    __slots__ = ("index", "remaining", "stacks", "active", "mask")
+
+    def __init__(self, index: SpellRegistry = REGISTRY):
+        self.index = index
+        self.remaining = array("d", bytes(8 * index.capacity))
+        self.stacks = array("H", bytes(2 * index.capacity))
+        # IDs with non-zero stacks, so clearing and iterating skip empty slots
+        self.active = set()
+        # Bitset of the active IDs, for the decision trace
+        self.mask = 0
+
+    def set(self, aura_id: int, remaining: float, stacks: int = 1):
+        self.remaining[aura_id] = remaining
+        self.stacks[aura_id] = stacks
+        if stacks:
+            self.active.add(aura_id)
+            self.mask |= 1 << aura_id
+        else:
+            self.active.discard(aura_id)
+            self.mask &= ~(1 << aura_id)
+
+    def remove(self, aura_id: int):
+        self.remaining[aura_id] = 0.0
+        self.stacks[aura_id] = 0
+        self.active.discard(aura_id)
+        self.mask &= ~(1 << aura_id)
+
+    def clear(self):
+        for aura_id in self.active:
+            self.remaining[aura_id] = 0.0
+            self.stacks[aura_id] = 0
+        self.active.clear()
+        self.mask = 0
+
+    def has(self, aura_id: int) -> bool:
+        return self.stacks[aura_id] > 0
+
+    def copy_from(self, other: "AuraTable"):
+        self.clear()
+        for aura_id in other.active:
+            self.set(aura_id, other.remaining[aura_id], other.stacks[aura_id])
+
+    def items(self) -> List[Tuple[str, float, int]]:
+        """Active auras as (name, remaining, stacks), for display"""
+        return [(self.index.name(aura_id), self.remaining[aura_id], self.stacks[aura_id])
+                for aura_id in sorted(self.active)]
+
+
+class MockAuraSource:
+    """
+    Scripted auras for testing without the game
+    Casting a spell listed in effects applies its aura for a fixed duration.
+    effects: spell name -> (aura name, "buff" or "debuff", duration)
+    """
+
+    def __init__(self, effects: Dict[str, Tuple[str, str, float]], index: SpellRegistry = REGISTRY):
+        self.index = index
+        self.effects = {
+            index.intern(spell): (index.intern(aura), kind, duration)
+            for spell, (aura, kind, duration) in effects.items()
+        }
+        self.buff_expires: Dict[int, float] = {}
+        self.debuff_expires: Dict[int, float] = {}
+
+    def on_cast(self, spell_id: int, now: float):
+        effect = self.effects.get(spell_id)
+        if effect is None:
+            return
+        aura_id, kind, duration = effect
+        expires = self.buff_expires if kind == "buff" else self.debuff_expires
+        expires[aura_id] = now + duration
+
+    def clear_debuffs(self):
+        """Target changed - its debuffs are gone"""
+        self.debuff_expires.clear()
+
+    def fill(self, state, now: float):
+        """Write the auras active at now into the state's tables"""
+        for table, expires in ((state.buffs, self.buff_expires),
+                               (state.debuffs, self.debuff_expires)):
+            table.clear()
+            for aura_id, expires_at in list(expires.items()):
+                if expires_at <= now:
+                    del expires[aura_id]
+                else:
+                    table.set(aura_id, expires_at - now)
+
+
+def effects_from_rotation(rotation: List[dict], duration: float = 15.0) -> Dict[str, Tuple[str, str, float]]:
+    """
+    Guess mock aura effects from a rotation
+    A spell guarded by has_not_debuff X (or not debuff(X)) is assumed to apply
+    debuff X, and by has_not_buff X (or not buff(X)) to apply buff X
+    """
+    effects = {}
+    for spell in rotation:
+        conditions = spell.get("conditions", {})
+        for key, kind in (("has_not_debuff", "debuff"), ("has_not_buff", "buff")):
+            auras = conditions.get(key)
+            if isinstance(auras, str):
+                auras = [auras]
+            for aura in auras or ():
+                effects.setdefault(spell.get("name"), (aura, kind, duration))
+        # Same for a 'not debuff(X)' / 'not buff(X)' term of the when expression
+        for condition in parse_conditions(spell["when"]) if spell.get("when") else ():
+            expr = condition.expr
+            if isinstance(expr, ast.UnaryOp) and isinstance(expr.op, ast.Not) \
+                    and isinstance(expr.operand, ast.Call):
+                call = expr.operand
+                effects.setdefault(spell.get("name"), (call.args[0].value, call.func.id, duration))
+    return effects
@@ -0,0 +1,381 @@
+"""
+Batch Evaluator
+Evaluates a rotation over columns of game state snapshots with NumPy, for
+what-if tuning of thresholds over millions of synthetic states
+
+Each condition expression is evaluated as a boolean mask over all rows and
+the first passing priority is resolved with argmax, giving the same choice
+per row as RotationEngine.update. Auras are bitset columns, plus a stack
+count column per aura that has stacks, so buff()/debuff() give the stack
+count as in the engine. NumPy is optional and only needed here.
+
+Usage (from backend/):
+    python -m core.batch_eval --class druid --rows 1000000
+    python -m core.batch_eval --class druid --verify
+"""
+import argparse
+import ast
+import operator
+import random
+import sys
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+from core.conditions import ATTRIBUTES, AURA_FUNCTIONS, FIELDS
+from core.game_state import GameState
+from core.rotation_engine import SELF_HEAL, RotationEngine
+from core.rotation_program import spell_conditions
+from core.simulator import NullKeySink, VirtualClock
+from core.spell_registry import REGISTRY
+from core.trace import NO_SPELL
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+NO_CHOICE = -1
+SELF_HEAL_CHOICE = -2  # the engine's healthstone below 20% health
+
+# One bit per aura ID, packed into 64-bit words per row
+AURA_WORDS = (REGISTRY.capacity + 63) // 64
+# Stack counts drawn by random_batch for an active aura
+MAX_RANDOM_STACKS = 5
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("numpy is required for batch evaluation (pip install numpy)")
+
+
+class StateBatch:
+    """
+    Game state snapshots as columns
+    buffs and debuffs are (rows, AURA_WORDS) uint64 bitsets indexed by aura ID,
+    the same layout as AuraTable.mask. stacks maps each table name to
+    {aura ID: stack count column}; an active aura without a column has 1 stack.
+    """
+
+    def __init__(self, power, health_percent, target_health_percent, in_combat,
+                 buffs=None, debuffs=None, max_power=None, stacks=None):
+        _require_numpy()
+        self.power = np.asarray(power)
+        self.max_power = np.full(len(self.power), 100) if max_power is None else np.asarray(max_power)
+        self.health_percent = np.asarray(health_percent)
+        self.target_health_percent = np.asarray(target_health_percent)
+        self.in_combat = np.asarray(in_combat, dtype=bool)
+        rows = len(self.power)
+        self.buffs = np.zeros((rows, AURA_WORDS), np.uint64) if buffs is None else buffs
+        self.debuffs = np.zeros((rows, AURA_WORDS), np.uint64) if debuffs is None else debuffs
+        self.stacks = {"buffs": {}, "debuffs": {}}
+        for table, columns in (stacks or {}).items():
+            for aura_id, column in columns.items():
+                self.set_stacks(table, aura_id, column)
+
+    def set_stacks(self, table: str, aura_id: int, stacks):
+        """Set an aura's stack count column, keeping the bitset in step (active while non-zero)"""
+        stacks = np.asarray(stacks, np.int64)
+        self.stacks[table][aura_id] = stacks
+        words = getattr(self, table)
+        bit = np.uint64(1) << np.uint64(aura_id & 63)
+        words[:, aura_id >> 6] &= ~bit
+        words[:, aura_id >> 6] |= (stacks != 0).astype(np.uint64) << np.uint64(aura_id & 63)
+
+    def __len__(self):
+        return len(self.power)
+
+    @classmethod
+    def from_states(cls, states: List[GameState]) -> "StateBatch":
+        """Build columns from GameState snapshots"""
+        _require_numpy()
+
+        def masks(tables):
+            data = b"".join(table.mask.to_bytes(AURA_WORDS * 8, "little") for table in tables)
+            return np.frombuffer(data, dtype="<u8").reshape(len(states), AURA_WORDS).astype(np.uint64)
+
+        def stacks(tables):
+            aura_ids = set().union(*(table.active for table in tables))
+            return {aura_id: np.fromiter((table.stacks[aura_id] for table in tables), np.int64, len(tables))
+                    for aura_id in aura_ids}
+
+        return cls(
+            power=np.fromiter((s.power for s in states), np.int64, len(states)),
+            max_power=np.fromiter((s.max_power for s in states), np.int64, len(states)),
+            health_percent=np.fromiter((s.health_percent for s in states), np.int64, len(states)),
+            target_health_percent=np.fromiter((s.target_health_percent for s in states), np.int64, len(states)),
+            in_combat=np.fromiter((s.in_combat for s in states), bool, len(states)),
+            buffs=masks([s.buffs for s in states]),
+            debuffs=masks([s.debuffs for s in states]),
+            stacks={"buffs": stacks([s.buffs for s in states]),
+                    "debuffs": stacks([s.debuffs for s in states])},
+        )
+
+
+def _has_aura(words, aura_id: int):
+    return ((words[:, aura_id >> 6] >> np.uint64(aura_id & 63)) & np.uint64(1)).astype(bool)
+
+
+def _aura_stacks(batch: StateBatch, table: str, aura_id: int):
+    stacks = batch.stacks[table].get(aura_id)
+    if stacks is None:
+        return _has_aura(getattr(batch, table), aura_id).astype(np.int64)
+    return stacks
+
+
+_OPERATORS = {
+    ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul,
+    ast.USub: operator.neg,
+    ast.Eq: operator.eq, ast.NotEq: operator.ne, ast.Lt: operator.lt,
+    ast.LtE: operator.le, ast.Gt: operator.gt, ast.GtE: operator.ge,
+}
+
+
+def _truth(values):
+    return values if values.dtype == bool else values != 0
+
+
+def _evaluate(node: ast.expr, batch: StateBatch):
+    """A condition expression (see core.conditions) as a column"""
+    if isinstance(node, ast.Constant):
+        return np.full(len(batch), node.value)
+    if isinstance(node, ast.Name):
+        return getattr(batch, FIELDS[node.id])
+    if isinstance(node, ast.Attribute):
+        return getattr(batch, ATTRIBUTES[(node.value.id, node.attr)])
+    if isinstance(node, ast.Call):
+        return _aura_stacks(batch, AURA_FUNCTIONS[node.func.id], REGISTRY.intern(node.args[0].value))
+    if isinstance(node, ast.BoolOp):
+        # Python semantics: and/or yield an operand, which matters inside arithmetic
+        is_and = isinstance(node.op, ast.And)
+        result = _evaluate(node.values[0], batch)
+        for value in node.values[1:]:
+            other = _evaluate(value, batch)
+            truth = _truth(result)
+            result = np.where(truth, other, result) if is_and else np.where(truth, result, other)
+        return result
+    if isinstance(node, ast.UnaryOp):
+        operand = _evaluate(node.operand, batch)
+        if isinstance(node.op, ast.Not):
+            return ~_truth(operand)
+        return _OPERATORS[type(node.op)](operand)
+    if isinstance(node, ast.BinOp):
+        return _OPERATORS[type(node.op)](_evaluate(node.left, batch), _evaluate(node.right, batch))
+    # Chained comparison: a < b < c is a < b and b < c
+    result = np.ones(len(batch), bool)
+    left = _evaluate(node.left, batch)
+    for op, comparator in zip(node.ops, node.comparators):
+        right = _evaluate(comparator, batch)
+        result &= _OPERATORS[type(op)](left, right)
+        left = right
+    return result
+
+
+class BatchEvaluator:
+    """
+    Vectorized equivalent of the engine's decision for one rotation
+    Args:
+        rotation: Rotation list, as passed to compile_rotation
+        combat_protect: Skip rows that are out of combat, as the engine does
+    """
+
+    def __init__(self, rotation: List[dict], combat_protect: bool = True):
+        _require_numpy()
+        self.rotation = rotation
+        self.combat_protect = combat_protect
+        self.conditions = [spell_conditions(spell) for spell in rotation]
+        self.spell_ids = np.array([REGISTRY.intern(spell["name"]) for spell in rotation], np.int32)
+        self.off_gcd = np.array([spell.get("off_gcd", False) for spell in rotation], bool)
+
+    def condition_mask(self, index: int, batch: StateBatch):
+        """Rows passing every condition of the spell at a priority index"""
+        mask = np.ones(len(batch), bool)
+        for condition in self.conditions[index]:
+            mask &= _truth(_evaluate(condition.expr, batch))
+        return mask
+
+    def evaluate(self, batch: StateBatch, gcd_active=None, ready=None):
+        """
+        Choose a spell for every row
+        Args:
+            batch: State columns
+            gcd_active: Optional bool column, the GCD is running
+            ready: Optional (rows, priorities) bool array, the spell at each
+                priority is off cooldown (entries of the same spell must agree)
+        Returns:
+            int32 column of priority indices, NO_CHOICE or SELF_HEAL_CHOICE
+        """
+        rows = len(batch)
+        count = len(self.rotation)
+        # The extra always-true column makes argmax land there when nothing passes
+        passing = np.ones((rows, count + 1), bool)
+        for index in range(count):
+            column = self.condition_mask(index, batch)
+            if gcd_active is not None and not self.off_gcd[index]:
+                column &= ~gcd_active
+            if ready is not None:
+                column &= ready[:, index]
+            passing[:, index] = column
+
+        choice = passing.argmax(axis=1).astype(np.int32)
+        choice[choice == count] = NO_CHOICE
+
+        heal = batch.health_percent < 20
+        if gcd_active is not None:
+            heal &= ~gcd_active
+        choice[heal] = SELF_HEAL_CHOICE
+        if self.combat_protect:
+            choice[~batch.in_combat] = NO_CHOICE
+        return choice
+
+    def to_spell_ids(self, choice):
+        """Map evaluate's priority indices to spell IDs (NO_SPELL when none)"""
+        ids = np.full(len(choice), NO_SPELL, np.int32)
+        picked = choice >= 0
+        ids[picked] = self.spell_ids[choice[picked]]
+        ids[choice == SELF_HEAL_CHOICE] = SELF_HEAL.spell_id
+        return ids
+
+
+def random_batch(rotation: List[dict], rows: int, seed: int = 0,
+                 max_power: int = 100) -> StateBatch:
+    """
+    Uniformly random states over the ranges and auras the rotation looks at
+    Each aura is active in half the rows, with 1 to MAX_RANDOM_STACKS stacks.
+    """
+    _require_numpy()
+    rng = np.random.default_rng(seed)
+    batch = StateBatch(
+        power=rng.integers(0, max_power + 1, rows),
+        health_percent=rng.integers(1, 101, rows),
+        target_health_percent=rng.integers(0, 101, rows),
+        in_combat=rng.random(rows) < 0.9,
+        max_power=np.full(rows, max_power),
+    )
+    for spell in rotation:
+        for condition in spell_conditions(spell):
+            for table, name in condition.auras:
+                aura_id = REGISTRY.intern(name)
+                if aura_id not in batch.stacks[table]:
+                    stacks = rng.integers(1, MAX_RANDOM_STACKS + 1, rows) * (rng.random(rows) < 0.5)
+                    batch.set_stacks(table, aura_id, stacks)
+    return batch
+
+
+class _DecisionLog:
+    """Stands in for the engine's TraceRecorder, keeping only the last decision"""
+
+    def __init__(self):
+        self.enabled = True
+        self.spell_id = NO_SPELL
+
+    def record(self, now: float, state, spell_id: int, reject: int, flags: int):
+        self.spell_id = spell_id
+
+
+def verify_against_engine(class_name: str, rows: int = 20000, seed: int = 0,
+                          rotation: Optional[List[dict]] = None) -> int:
+    """
+    Randomized differential check of BatchEvaluator against RotationEngine
+    Runs the same random states, GCD flags and cooldown readiness through
+    both and returns the number of rows where the chosen spell differs.
+    rotation replaces the class's built-in rotation when given.
+    """
+    _require_numpy()
+    clock = VirtualClock(1000.0)
+    engine = RotationEngine(None, NullKeySink(), clock=clock)
+    engine.set_class(class_name)
+    if rotation is not None:
+        engine.set_rotation(rotation)
+    engine.set_keybinds({})
+    engine.set_options(combat_protect=True)
+    engine.action_cooldown = 0
+    log = _DecisionLog()
+    engine.trace = log
+    engine.is_running = True
+
+    evaluator = BatchEvaluator(engine.rotation)
+    batch = random_batch(engine.rotation, rows, seed)
+
+    rng = random.Random(seed)
+    gcd_active = np.array([rng.random() < 0.3 for _ in range(rows)], bool)
+    unique_ids = sorted(set(evaluator.spell_ids.tolist()))
+    ready_by_id: Dict[int, list] = {spell_id: [rng.random() < 0.7 for _ in range(rows)]
+                                    for spell_id in unique_ids}
+    ready = np.array([ready_by_id[spell_id] for spell_id in evaluator.spell_ids.tolist()], bool).T
+
+    expected = evaluator.to_spell_ids(evaluator.evaluate(batch, gcd_active, ready))
+
+    state = GameState()
+    buffs = batch.buffs.astype("<u8").tobytes()
+    debuffs = batch.debuffs.astype("<u8").tobytes()
+    width = AURA_WORDS * 8
+    now = clock()
+    cooldowns = engine.cooldowns
+    mismatches = 0
+    for row in range(rows):
+        state.power = int(batch.power[row])
+        state.max_power = int(batch.max_power[row])
+        state.health_percent = int(batch.health_percent[row])
+        state.target_health_percent = int(batch.target_health_percent[row])
+        state.in_combat = bool(batch.in_combat[row])
+        for name, table, data in (("buffs", state.buffs, buffs), ("debuffs", state.debuffs, debuffs)):
+            table.clear()
+            stacks = batch.stacks[name]
+            mask = int.from_bytes(data[row * width:(row + 1) * width], "little")
+            while mask:
+                low = mask & -mask
+                aura_id = low.bit_length() - 1
+                table.set(aura_id, 0.0, int(stacks[aura_id][row]) if aura_id in stacks else 1)
+                mask ^= low
+
+        cooldowns.gcd_ready_at = now + 1.0 if gcd_active[row] else 0.0
+        for spell_id in unique_ids:
+            cooldowns.ready_at[spell_id] = 0.0 if ready_by_id[spell_id][row] else now + 10.0
+
+        log.spell_id = NO_SPELL
+        engine.update(state)
+        if log.spell_id != expected[row]:
+            mismatches += 1
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate a rotation over random state batches")
+    parser.add_argument("--class", dest="class_name", default="death_knight")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--verify", action="store_true",
+                        help="Check the batch choices against RotationEngine instead")
+    args = parser.parse_args()
+
+    if args.verify:
+        rows = min(args.rows, 20000)
+        mismatches = verify_against_engine(args.class_name, rows, args.seed)
+        print(f"{args.class_name}: {rows} rows, {mismatches} mismatches")
+        return 1 if mismatches else 0
+
+    from config.rotations import get_rotation
+    rotation = get_rotation(args.class_name)
+    evaluator = BatchEvaluator(rotation)
+    batch = random_batch(rotation, args.rows, args.seed)
+    started = time.perf_counter()
+    choice = evaluator.evaluate(batch)
+    elapsed = time.perf_counter() - started
+
+    counts = Counter(choice.tolist())
+    print(f"{args.class_name}: {args.rows:,} rows in {elapsed * 1000:.1f}ms "
+          f"({args.rows / elapsed:,.0f} rows/s)")
+    for index, count in counts.most_common():
+        if index == NO_CHOICE:
+            name = "-"
+        elif index == SELF_HEAL_CHOICE:
+            name = SELF_HEAL.name
+        else:
+            name = f"#{index + 1} {rotation[index]['name']}"
+        print(f"  {name}: {count / args.rows:.1%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
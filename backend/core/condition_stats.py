@@ -0,0 +1,175 @@
+"""
+Condition Stats
+Sampled per-condition rejection counters for a compiled rotation, and the
+adaptive reordering of each spell's conditions they drive
+
+Every sample_every-th decision (counted by the engine), each spell the
+engine's scan reached is re-evaluated one condition at a time, timing each
+and counting how often it rejects. Sampled ticks cost a few hundred ns, so
+they are kept rare. Every reorder_every samples a spell's conditions are
+reordered by expected cost per rejection (mean time / reject rate), so the
+cheap, selective ones run first. Conditions have no side effects, so the order never
+changes whether a spell is cast, only which reason a rejection reports;
+spells keep their priority order.
+"""
+import time
+from typing import Dict, List, Tuple
+
+from core.conditions import compile_predicate
+from core.rotation_program import CompiledSpell
+from core.spell_registry import REGISTRY
+
+
+def _timer_overhead(clock) -> int:
+    """Smallest back-to-back clock delta, subtracted from every timing"""
+    best = None
+    for _ in range(1000):
+        start = clock()
+        delta = clock() - start
+        if best is None or delta < best:
+            best = delta
+    return best
+
+
+class ConditionStats:
+    """
+    Counters for one program, indexed [spell][condition] in the program's
+    original condition order
+    """
+
+    def __init__(self, program: Tuple[CompiledSpell, ...], sample_every: int = 32,
+                 reorder_every: int = 32, adaptive: bool = True):
+        self.sample_every = sample_every
+        self.reorder_every = reorder_every
+        self.adaptive = adaptive
+        self.clock = time.perf_counter_ns
+        self.overhead = _timer_overhead(self.clock)
+        self.reset(program)
+
+    def reset(self, program: Tuple[CompiledSpell, ...]):
+        """Start over for a new program (class switch, keybind change, reload)"""
+        # The program as installed in the engine, reordered or not
+        self.program = program
+        self.original = program
+        # One single-condition check per condition, returning its reject bits
+        self.tests = [tuple(compile_predicate((condition,), REGISTRY, spell.name)
+                            for condition in spell.conditions) for spell in program]
+        self.evaluations = [[0] * len(spell.conditions) for spell in program]
+        self.rejections = [[0] * len(spell.conditions) for spell in program]
+        self.time_ns = [[0] * len(spell.conditions) for spell in program]
+        # Counts since the last reorder, which is what the order is chosen from
+        self._window = [[[0, 0, 0] for _ in spell.conditions] for spell in program]
+        # Current evaluation order, as indices into the original conditions
+        self.order = [tuple(range(len(spell.conditions))) for spell in program]
+        self.samples = 0
+        self.reorders = 0
+
+    def sample(self, state, now: float, gcd_active: bool, ready_at) -> bool:
+        """
+        Evaluate each condition of every spell the scan reached, separately
+        Returns whether the program was reordered (the caller installs self.program).
+        """
+        clock = self.clock
+        overhead = self.overhead
+        for index, spell in enumerate(self.original):
+            if gcd_active and not spell.off_gcd:
+                continue
+            if ready_at[spell.spell_id] > now:
+                continue
+            window = self._window[index]
+            evaluations = self.evaluations[index]
+            rejections = self.rejections[index]
+            time_ns = self.time_ns[index]
+            passed = True
+            for position, test in enumerate(self.tests[index]):
+                start = clock()
+                rejected = test(state)
+                elapsed = max(0, clock() - start - overhead)
+                evaluations[position] += 1
+                time_ns[position] += elapsed
+                counts = window[position]
+                counts[0] += 1
+                counts[2] += elapsed
+                if rejected:
+                    rejections[position] += 1
+                    counts[1] += 1
+                    passed = False
+            if passed:
+                # The scan stops at the first castable spell
+                break
+
+        self.samples += 1
+        if self.adaptive and self.samples % self.reorder_every == 0:
+            return self.reorder()
+        return False
+
+    def reorder(self) -> bool:
+        """Reorder every spell's conditions by the window's cost per rejection"""
+        changed = False
+        program = list(self.program)
+        for index, spell in enumerate(self.original):
+            window = self._window[index]
+            if len(window) > 1:
+                order = tuple(sorted(range(len(window)), key=lambda position: self._rank(
+                    window[position], spell.conditions[position].cost)))
+                if order != self.order[index]:
+                    self.order[index] = order
+                    program[index] = _with_conditions(
+                        spell, tuple(spell.conditions[position] for position in order))
+                    changed = True
+            for counts in window:
+                counts[0] = counts[1] = counts[2] = 0
+        if changed:
+            self.program = tuple(program)
+            self.reorders += 1
+        return changed
+
+    @staticmethod
+    def _rank(counts: List[int], static_cost: int) -> float:
+        evaluations, rejections, time_ns = counts
+        if not evaluations:
+            # Not reached in this window, fall back to the static estimate
+            return float(static_cost)
+        if not rejections:
+            return float("inf")
+        return (time_ns / evaluations) / (rejections / evaluations)
+
+    def snapshot(self) -> List[Dict]:
+        """One row per condition, in each spell's current evaluation order"""
+        rows = []
+        # Zipped rather than indexed, since the metrics thread may read mid-reset
+        spells = zip(self.original, self.order, self.evaluations, self.rejections, self.time_ns)
+        for index, (spell, order, evaluations, rejections, time_ns) in enumerate(spells):
+            for rank, position in enumerate(order):
+                count = evaluations[position]
+                rows.append({
+                    "priority": index + 1,
+                    "spell": spell.name,
+                    "condition": spell.conditions[position].source,
+                    "order": rank + 1,
+                    "evaluations": count,
+                    "rejections": rejections[position],
+                    "reject_rate": rejections[position] / count if count else 0.0,
+                    "time_ns": time_ns[position],
+                    "mean_ns": time_ns[position] / count if count else 0.0,
+                })
+        return rows
+
+    def format(self) -> str:
+        """Snapshot as a text table, most total time first"""
+        rows = sorted(self.snapshot(), key=lambda row: -row["time_ns"])
+        total = sum(row["time_ns"] for row in rows) or 1
+        lines = [f"{'#':>3} {'spell':<10} {'evals':>7} {'reject':>7} {'mean':>8} {'time':>6}  condition"]
+        for row in rows:
+            lines.append(f"{row['priority']:>3} {row['spell']:<10} {row['evaluations']:>7} "
+                         f"{row['reject_rate'] * 100:>6.1f}% {row['mean_ns']:>6.0f}ns "
+                         f"{row['time_ns'] / total * 100:>5.1f}%  {row['condition']}")
+        return "\n".join(lines)
+
+
+def _with_conditions(spell: CompiledSpell, conditions) -> CompiledSpell:
+    return CompiledSpell(
+        spell_id=spell.spell_id, name=spell.name, key=spell.key, modifier=spell.modifier,
+        gcd=spell.gcd, cooldown=spell.cooldown, off_gcd=spell.off_gcd,
+        power_cost=spell.power_cost, conditions=conditions,
+    )
@@ -0,0 +1,298 @@
+"""
+Conditions
+A small expression language for rotation conditions, compiled with ast into
+one Python function per spell
+
+    when = "power >= 40 and target.hp > 30 and not debuff(割裂)"
+
+Names:
+    power, max_power, health (player health %), in_combat, target.hp (target health %)
+    buff(NAME), debuff(NAME)   stack count of an aura on the player / target,
+                               NAME is a bare name or a quoted string
+Operators: and, or, not, comparisons (chainable), + - *, numbers, True/False
+
+Expressions are constant folded, and the operands of every and/or whose
+truth value is all that's used are ordered cheapest first since they have
+no side effects. The top-level
+conjuncts are kept apart as Conditions so a failing spell can report which
+kind of check rejected it.
+"""
+import ast
+import copy
+from typing import Callable, List, Sequence, Tuple
+
+# DSL name -> GameState attribute
+FIELDS = {
+    "power": "power",
+    "max_power": "max_power",
+    "health": "health_percent",
+    "in_combat": "in_combat",
+}
+# DSL object.attribute -> GameState attribute
+ATTRIBUTES = {
+    ("target", "hp"): "target_health_percent",
+}
+# DSL function -> GameState aura table
+AURA_FUNCTIONS = {
+    "buff": "buffs",
+    "debuff": "debuffs",
+}
+
+_BOOL_OPS = (ast.And, ast.Or)
+_UNARY_OPS = (ast.Not, ast.USub)
+_BIN_OPS = (ast.Add, ast.Sub, ast.Mult)
+_COMPARE_OPS = (ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE)
+
+# Relative evaluation cost, for short-circuit ordering
+_FIELD_COST = 1
+_AURA_COST = 3
+
+
+class ConditionError(ValueError):
+    """Raised when a condition expression doesn't parse or uses unknown names"""
+
+
+class Condition:
+    """One top-level conjunct of a spell's conditions"""
+    __slots__ = ("expr", "source", "fields", "auras", "cost", "reject")
+
+    def __init__(self, expr: ast.expr, reject: int = 0):
+        self.expr = expr  # folded DSL expression
+        self.source = ast.unparse(expr)
+        # GameState attributes read, e.g. {"power", "debuffs"}
+        self.fields = frozenset(_fields(expr))
+        # (aura table, aura name) pairs referenced
+        self.auras = tuple(_auras(expr))
+        self.cost = _cost(expr)
+        # REJECT_* bits reported when this condition fails, set by the compiler
+        self.reject = reject
+
+    def __repr__(self):
+        return f"Condition({self.source!r})"
+
+
+def _error(node: ast.AST, message: str) -> ConditionError:
+    column = getattr(node, "col_offset", None)
+    where = f" at column {column + 1}" if column is not None else ""
+    return ConditionError(f"{message}{where}")
+
+
+def _check(node: ast.AST) -> ast.expr:
+    """Validate a parsed expression against the DSL, normalizing aura names to strings"""
+    if isinstance(node, ast.Constant):
+        if isinstance(node.value, (bool, int, float)):
+            return node
+        raise _error(node, f"unexpected constant {node.value!r}")
+    if isinstance(node, ast.Name):
+        if node.id not in FIELDS:
+            raise _error(node, f"unknown name '{node.id}'")
+        return node
+    if isinstance(node, ast.Attribute):
+        if not isinstance(node.value, ast.Name) or (node.value.id, node.attr) not in ATTRIBUTES:
+            raise _error(node, f"unknown name '{ast.unparse(node)}'")
+        return node
+    if isinstance(node, ast.Call):
+        if not isinstance(node.func, ast.Name) or node.func.id not in AURA_FUNCTIONS:
+            raise _error(node, f"unknown function '{ast.unparse(node.func)}'")
+        if len(node.args) != 1 or node.keywords:
+            raise _error(node, f"{node.func.id}() takes one aura name")
+        arg = node.args[0]
+        if isinstance(arg, ast.Name):
+            name = arg.id
+        elif isinstance(arg, ast.Constant) and isinstance(arg.value, str) and arg.value:
+            name = arg.value
+        else:
+            raise _error(arg, f"{node.func.id}() takes one aura name")
+        node.args = [ast.Constant(name)]
+        return node
+    if isinstance(node, ast.BoolOp) and isinstance(node.op, _BOOL_OPS):
+        node.values = [_check(value) for value in node.values]
+        return node
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, _UNARY_OPS):
+        node.operand = _check(node.operand)
+        return node
+    if isinstance(node, ast.BinOp) and isinstance(node.op, _BIN_OPS):
+        node.left = _check(node.left)
+        node.right = _check(node.right)
+        return node
+    if isinstance(node, ast.Compare) and all(isinstance(op, _COMPARE_OPS) for op in node.ops):
+        node.left = _check(node.left)
+        node.comparators = [_check(value) for value in node.comparators]
+        return node
+    raise _error(node, f"unsupported syntax '{ast.unparse(node)}'")
+
+
+def _is_constant(node: ast.AST) -> bool:
+    return isinstance(node, ast.Constant)
+
+
+def _evaluate(node: ast.expr) -> ast.Constant:
+    """Fold a node over constants into a constant, keeping its position"""
+    # Only reached for whitelisted operators over numeric constants
+    expression = ast.fix_missing_locations(ast.Expression(node))
+    value = eval(compile(expression, "<condition>", "eval"), {"__builtins__": {}})
+    return ast.copy_location(ast.Constant(value), node)
+
+
+def _fold(node: ast.expr, boolean: bool = True) -> ast.expr:
+    """
+    Constant fold, and order and/or operands cheapest first
+    boolean is whether only the node's truth value is used (the top level, under
+    not, or an and/or operand there); elsewhere and/or yield an operand's value,
+    so they are neither simplified nor reordered.
+    """
+    if isinstance(node, ast.BoolOp):
+        values = [_fold(value, boolean) for value in node.values]
+        if not boolean:
+            node.values = values
+            if all(_is_constant(value) for value in values):
+                return _evaluate(node)
+            return node
+        is_and = isinstance(node.op, ast.And)
+        kept = []
+        for value in values:
+            if _is_constant(value):
+                if bool(value.value) == is_and:
+                    # True in an and / False in an or never decides the result
+                    continue
+                return ast.copy_location(ast.Constant(not is_and), node)
+            kept.append(value)
+        if not kept:
+            return ast.copy_location(ast.Constant(is_and), node)
+        if len(kept) == 1:
+            return kept[0]
+        node.values = sorted(kept, key=_cost)
+        return node
+    if isinstance(node, ast.UnaryOp):
+        node.operand = _fold(node.operand, isinstance(node.op, ast.Not))
+        if _is_constant(node.operand):
+            return _evaluate(node)
+        return node
+    if isinstance(node, ast.BinOp):
+        node.left = _fold(node.left, False)
+        node.right = _fold(node.right, False)
+        if _is_constant(node.left) and _is_constant(node.right):
+            return _evaluate(node)
+        return node
+    if isinstance(node, ast.Compare):
+        node.left = _fold(node.left, False)
+        node.comparators = [_fold(value, False) for value in node.comparators]
+        if _is_constant(node.left) and all(_is_constant(value) for value in node.comparators):
+            return _evaluate(node)
+        return node
+    return node
+
+
+def _conjuncts(node: ast.expr) -> List[ast.expr]:
+    if isinstance(node, ast.BoolOp) and isinstance(node.op, ast.And):
+        return [part for value in node.values for part in _conjuncts(value)]
+    return [node]
+
+
+def _fields(node: ast.expr):
+    for child in ast.walk(node):
+        if isinstance(child, ast.Name) and child.id in FIELDS:
+            yield FIELDS[child.id]
+        elif isinstance(child, ast.Attribute):
+            yield ATTRIBUTES[(child.value.id, child.attr)]
+        elif isinstance(child, ast.Call):
+            yield AURA_FUNCTIONS[child.func.id]
+
+
+def _auras(node: ast.expr):
+    for child in ast.walk(node):
+        if isinstance(child, ast.Call):
+            yield AURA_FUNCTIONS[child.func.id], child.args[0].value
+
+
+def _cost(node: ast.expr) -> int:
+    cost = 0
+    for child in ast.walk(node):
+        if isinstance(child, ast.Call):
+            cost += _AURA_COST
+        elif isinstance(child, ast.Attribute) or (isinstance(child, ast.Name) and child.id in FIELDS):
+            cost += _FIELD_COST
+    return cost
+
+
+def parse_conditions(text: str) -> List[Condition]:
+    """
+    Parse and fold an expression into its top-level conjuncts
+    A conjunct that folds to True is dropped; one that folds to False is kept,
+    so the spell can never be cast.
+    """
+    try:
+        tree = ast.parse(text.strip(), mode="eval")
+    except SyntaxError as e:
+        raise ConditionError(f"invalid syntax in {text!r}: {e.msg}") from None
+    expr = _fold(_check(tree.body))
+    conditions = [Condition(part) for part in _conjuncts(expr)]
+    return [condition for condition in conditions
+            if not (_is_constant(condition.expr) and condition.expr.value)]
+
+
+class _Lower(ast.NodeTransformer):
+    """Rewrite DSL names into reads of the GameState argument"""
+
+    def __init__(self, registry):
+        self.registry = registry
+
+    def visit_Name(self, node):
+        return _state_attribute(FIELDS[node.id])
+
+    def visit_Attribute(self, node):
+        return _state_attribute(ATTRIBUTES[(node.value.id, node.attr)])
+
+    def visit_Call(self, node):
+        # state.<table>.stacks[<aura ID>]
+        table = _state_attribute(AURA_FUNCTIONS[node.func.id])
+        stacks = ast.Attribute(table, "stacks", ast.Load())
+        aura_id = self.registry.intern(node.args[0].value)
+        return ast.Subscript(stacks, ast.Constant(aura_id), ast.Load())
+
+
+def _state_attribute(name: str) -> ast.Attribute:
+    return ast.Attribute(ast.Name("state", ast.Load()), name, ast.Load())
+
+
+def compile_predicate(conditions: Sequence[Condition], registry,
+                      name: str = "spell") -> Callable:
+    """
+    Compile conditions into one function of the game state
+    The function returns 0 when every condition passes, otherwise the reject
+    bits of the first one that fails:
+
+        def check(state):
+            if not (state.power >= 40): return REJECT_POWER
+            ...
+            return 0
+    """
+    module = ast.parse("def check(state):\n    return 0")
+    function = module.body[0]
+    lower = _Lower(registry)
+    tests = []
+    for condition in conditions:
+        test = lower.visit(copy.deepcopy(condition.expr))
+        tests.append(ast.If(
+            test=ast.UnaryOp(ast.Not(), test),
+            body=[ast.Return(ast.Constant(condition.reject))],
+            orelse=[],
+        ))
+    function.body[:0] = tests
+    ast.fix_missing_locations(module)
+
+    namespace = {}
+    exec(compile(module, f"<conditions of {name}>", "exec"), namespace)
+    check = namespace["check"]
+    check.__qualname__ = check.__name__ = f"check_{name}"
+    return check
+
+
+def condition_auras(conditions: Sequence[Condition]) -> List[Tuple[str, str]]:
+    """(aura table, aura name) pairs referenced by any condition, in order"""
+    seen = []
+    for condition in conditions:
+        for aura in condition.auras:
+            if aura not in seen:
+                seen.append(aura)
+    return seen
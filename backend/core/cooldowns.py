@@ -0,0 +1,82 @@
+"""
+Cooldown Tracker
+Tracks the global cooldown and per-spell cooldowns as absolute ready times
+"""
+import heapq
+from array import array
+from typing import Dict, Optional, Tuple
+
+from core.spell_registry import REGISTRY_CAPACITY
+
+
+class CooldownTracker:
+    """
+    Ready timestamps for the GCD and every spell cast
+    ready_at is an array indexed by spell ID. A heap of (ready time, spell ID)
+    answers "which spell comes off cooldown first" in O(log n); entries that
+    are already ready or superseded by a later cast are popped lazily, on
+    every cast and sync as well as in earliest_ready, so the heap stays
+    bounded when nothing asks for the next ready time.
+    """
+
+    def __init__(self, capacity: int = REGISTRY_CAPACITY):
+        self.gcd_ready_at = 0.0
+        self.ready_at = array("d", bytes(8 * capacity))
+        self._heap = []
+
+    def reset(self):
+        self.gcd_ready_at = 0.0
+        for spell_id in range(len(self.ready_at)):
+            self.ready_at[spell_id] = 0.0
+        self._heap.clear()
+
+    def record_cast(self, spell: int, now: float, cooldown: float = 0.0, gcd: float = 0.0):
+        """
+        Record a cast
+        Args:
+            spell: Spell ID
+            now: Cast time
+            cooldown: Spell cooldown in seconds (0 if none)
+            gcd: Global cooldown triggered by the spell
+        """
+        if gcd > 0:
+            self.gcd_ready_at = max(self.gcd_ready_at, now + gcd)
+        if cooldown > 0:
+            self.set_ready_at(spell, now + cooldown)
+            self._prune(now)
+
+    def set_ready_at(self, spell: int, ready_at: float):
+        self.ready_at[spell] = ready_at
+        heapq.heappush(self._heap, (ready_at, spell))
+
+    def sync(self, remaining: Dict[int, float], now: float):
+        """Apply cooldowns reported by the game (spell ID -> seconds remaining)"""
+        for spell, seconds in remaining.items():
+            ready_at = now + seconds
+            if abs(self.ready_at[spell] - ready_at) > 0.05:
+                self.set_ready_at(spell, ready_at)
+        self._prune(now)
+
+    def gcd_remaining(self, now: float) -> float:
+        return max(0.0, self.gcd_ready_at - now)
+
+    def is_ready(self, spell: int, now: float) -> bool:
+        """Whether the spell's own cooldown has expired (ignores the GCD)"""
+        return self.ready_at[spell] <= now
+
+    def remaining(self, spell: int, now: float) -> float:
+        return max(0.0, self.ready_at[spell] - now)
+
+    def earliest_ready(self, now: float) -> Optional[Tuple[float, int]]:
+        """Next spell to come off cooldown after now, as (ready time, spell ID)"""
+        self._prune(now)
+        return self._heap[0] if self._heap else None
+
+    def _prune(self, now: float):
+        heap = self._heap
+        while heap:
+            ready_at, spell = heap[0]
+            if ready_at > now and self.ready_at[spell] == ready_at:
+                return
+            # Already ready or superseded by a later cast
+            heapq.heappop(heap)
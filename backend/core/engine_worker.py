@@ -0,0 +1,103 @@
+"""
+Engine Worker
+Runs state polling and the rotation engine on a dedicated thread
+"""
+import threading
+import time
+
+
+class EngineWorker:
+    """
+    Owns the reader + engine loop at its own tick rate
+    Every tick the reader's live game state is handed to on_state, called from
+    the worker thread; it must copy what it keeps (the UI's StateBridge copies
+    into preallocated buffers)
+    """
+
+    def __init__(self, memory_reader, rotation_engine, interval: float = 0.1, on_state=None,
+                 event_driven: bool = False, min_interval: float = 0.005):
+        self.memory_reader = memory_reader
+        self.rotation_engine = rotation_engine
+        # Fixed tick interval, or the polling ceiling when event driven
+        self.interval = interval
+        self.on_state = on_state
+        # Sleep until the engine's predicted next action instead of a fixed tick
+        self.event_driven = event_driven
+        self.min_interval = min_interval
+
+        self.ticks = 0
+        # Intervals missed: overruns at a fixed rate; when event driven, how
+        # far past its predicted wake-up a decision was made, in whole intervals
+        self.dropped_ticks = 0
+
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    @property
+    def is_alive(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Start the worker thread"""
+        if self.is_alive:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="EngineWorker", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 1.0):
+        """Stop the worker thread and wait for it to exit"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def tick(self):
+        """Read the game state once and run the engine on it"""
+        state = self.memory_reader.get_game_state()
+        if self.on_state:
+            self.on_state(state)
+        self.rotation_engine.update(state)
+        self.ticks += 1
+        return state
+
+    def _run(self):
+        if self.event_driven:
+            self._run_event_driven()
+            return
+
+        next_tick = time.monotonic()
+        while not self._stop_event.is_set():
+            try:
+                self.tick()
+            except Exception as e:
+                print(f"Error in engine worker: {e}")
+
+            next_tick += self.interval
+            delay = next_tick - time.monotonic()
+            if delay < 0:
+                # Overran one or more ticks, skip them instead of bursting
+                missed = int(-delay / self.interval) + 1
+                self.dropped_ticks += missed
+                next_tick += missed * self.interval
+                delay = next_tick - time.monotonic()
+            self._stop_event.wait(max(0.0, delay))
+
+    def _run_event_driven(self):
+        due = time.monotonic()
+        while not self._stop_event.is_set():
+            delay = self.interval
+            try:
+                state = self.tick()
+                delay = self.rotation_engine.time_until_next_action(state, ceiling=self.interval)
+            except Exception as e:
+                print(f"Error in engine worker: {e}")
+
+            now = time.monotonic()
+            late = now - due
+            if late >= self.interval:
+                # A slow read or a late wake-up; the engine acted that much after it could have
+                self.dropped_ticks += int(late / self.interval)
+            delay = max(self.min_interval, delay)
+            due = now + delay
+            self._stop_event.wait(delay)
@@ -0,0 +1,116 @@
+"""
+Game State
+Typed snapshot of the game state, filled in place by the readers every tick
+"""
+import threading
+from typing import Optional
+
+from core.auras import AuraTable
+
+
+class GameState:
+    """
+    Game state snapshot
+    Readers own one instance and refill it on every get_game_state call, so
+    consumers that keep a snapshot across ticks must take a copy()
+    """
+    __slots__ = ("health_percent", "health", "max_health", "power", "max_power",
+                 "in_combat", "target_name", "target_health_percent", "spells",
+                 "buffs", "debuffs")
+
+    def __init__(self):
+        self.spells = {}  # spell ID -> cooldown remaining (seconds)
+        self.buffs = AuraTable()  # on the player
+        self.debuffs = AuraTable()  # on the target
+        self.reset()
+
+    def reset(self):
+        """Restore the defaults reported when no game data is available"""
+        self.health_percent = 100
+        self.health = 0
+        self.max_health = 0
+        self.power = 0
+        self.max_power = 100
+        self.in_combat = False
+        self.target_name = ""
+        self.target_health_percent = 100
+        self.spells.clear()
+        self.buffs.clear()
+        self.debuffs.clear()
+
+    def copy(self) -> "GameState":
+        state = GameState()
+        state.copy_from(self)
+        return state
+
+    def copy_from(self, other: "GameState"):
+        """Overwrite this snapshot with other's fields, without allocating"""
+        self.health_percent = other.health_percent
+        self.health = other.health
+        self.max_health = other.max_health
+        self.power = other.power
+        self.max_power = other.max_power
+        self.in_combat = other.in_combat
+        self.target_name = other.target_name
+        self.target_health_percent = other.target_health_percent
+        self.spells.clear()
+        self.spells.update(other.spells)
+        self.buffs.copy_from(other.buffs)
+        self.debuffs.copy_from(other.debuffs)
+
+    def to_dict(self) -> dict:
+        """Legacy dict form (for logging and display)"""
+        return {
+            "healthPercent": self.health_percent,
+            "health": self.health,
+            "maxHealth": self.max_health,
+            "power": self.power,
+            "maxPower": self.max_power,
+            "inCombat": self.in_combat,
+            "targetName": self.target_name,
+            "targetHealthPercent": self.target_health_percent,
+            "spells": dict(self.spells),
+            "buffs": self.buffs.items(),
+            "debuffs": self.debuffs.items()
+        }
+
+    def __repr__(self):
+        return f"GameState({self.to_dict()!r})"
+
+
+class SnapshotBuffer:
+    """
+    Triple-buffered GameState hand-off from one producer thread to one consumer
+    publish() copies into a preallocated back buffer and swaps it with the ready
+    one; take() swaps the ready buffer to the front. Nothing is allocated per
+    tick, and the snapshot take() returns stays valid until the next take().
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._back = GameState()
+        self._ready = GameState()
+        self._front = GameState()
+        self._fresh = False
+        # Snapshots replaced by a newer one before they were taken
+        self.replaced = 0
+
+    def publish(self, state: GameState):
+        """Copy state in (producer thread); the previous untaken snapshot is dropped"""
+        back = self._back
+        back.copy_from(state)
+        with self._lock:
+            self._back = self._ready
+            self._ready = back
+            if self._fresh:
+                self.replaced += 1
+            self._fresh = True
+
+    def take(self) -> Optional[GameState]:
+        """The latest snapshot (consumer thread), None if nothing new was published"""
+        with self._lock:
+            if not self._fresh:
+                return None
+            self._front, self._ready = self._ready, self._front
+            self._fresh = False
+            return self._front
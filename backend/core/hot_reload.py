@@ -0,0 +1,146 @@
+"""
+Hot Reload
+Watches the rotation and keybind files and swaps the rebuilt rotation into a
+running RotationEngine between ticks
+"""
+import os
+import threading
+import time
+from typing import Dict
+
+from config.keybinds import (DEFAULT_KEYBINDS, KEYBINDS_FILE, keybind_changes,
+                             load_keybind_overrides, merge_keybinds)
+from config.rotations import ROTATION_DIR, ROTATION_LOADER
+from core.rotation_loader import RotationError, RotationLoader
+from core.spell_registry import REGISTRY
+
+try:
+    from watchdog.observers import Observer
+except ImportError:
+    Observer = None
+
+
+class _ChangeHandler:
+    """watchdog event handler that debounces bursts of file events"""
+
+    def __init__(self, callback, delay: float):
+        self.callback = callback
+        self.delay = delay
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def dispatch(self, event):
+        if event.is_directory:
+            return
+        if not event.src_path.endswith((".toml", ".json")):
+            return
+        # Editors often write a file in several steps, reload once they settle
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(self.delay, self.callback)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def cancel(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+
+class ConfigWatcher:
+    """
+    Rebuilds the engine's rotation when config files change
+    The rotation is re-parsed and compiled on the watcher thread and handed to
+    RotationEngine.queue_reload, so the engine swaps it in between ticks.
+    A file that fails to parse or validate leaves the previous program live.
+
+    Keybinds are merged into the engine's live keybind dict (the one the UI
+    edits) rather than replacing it: only spells whose key in the keybinds
+    file changed since it was last read are updated, so keys edited in the UI
+    survive a reload of the rotation.
+    """
+
+    def __init__(self, rotation_engine, directory: str = ROTATION_DIR,
+                 keybinds_file: str = KEYBINDS_FILE, debounce: float = 0.2):
+        self.rotation_engine = rotation_engine
+        self.directory = directory
+        # Rotations are loaded from the watched directory
+        if os.path.abspath(directory) == os.path.abspath(ROTATION_DIR):
+            self.loader = ROTATION_LOADER
+        else:
+            self.loader = RotationLoader(directory)
+        self.keybinds_file = keybinds_file
+        self.handler = _ChangeHandler(self.reload, debounce)
+        self.observer = None
+        # Overrides as of the last read, to tell file edits from UI edits
+        try:
+            self._overrides = load_keybind_overrides(keybinds_file)
+        except (OSError, ValueError):
+            # load_keybinds ignores a bad file too, so the engine has the defaults
+            self._overrides = {}
+
+        self.reloads = 0
+        self.failures = 0
+        self.last_reload_ms = 0.0
+        self.last_error = None
+
+    def start(self) -> bool:
+        if Observer is None:
+            print("watchdog not installed, rotation hot reload disabled")
+            return False
+        if self.observer is not None:
+            return True
+        self.observer = Observer()
+        self.observer.schedule(self.handler, self.directory, recursive=False)
+        self.observer.daemon = True
+        self.observer.start()
+        return True
+
+    def stop(self):
+        self.handler.cancel()
+        if self.observer is not None:
+            self.observer.stop()
+            self.observer.join(1.0)
+            self.observer = None
+
+    def reload(self) -> bool:
+        """Rebuild the current class's rotation and queue it on the engine"""
+        engine = self.rotation_engine
+        class_name = engine.current_class
+        if class_name is None or engine._custom_rotation:
+            return False
+
+        started = time.perf_counter()
+        try:
+            rotation = self.loader.load(class_name)
+            # Not load_keybinds, which ignores a bad file instead of failing the reload
+            overrides = load_keybind_overrides(self.keybinds_file)
+            changes = keybind_changes(self._file_keybinds(self._overrides, class_name),
+                                      self._file_keybinds(overrides, class_name),
+                                      engine.keybinds)
+            keybinds = dict(engine.keybinds)
+            merge_keybinds(keybinds, changes)
+            keybind_ids = {REGISTRY.intern(name): key for name, key in keybinds.items()}
+            program = self.loader.load_compiled(class_name, keybind_ids)
+        except (RotationError, OSError, ValueError) as e:
+            self.failures += 1
+            self.last_error = str(e)
+            print(f"Rotation reload failed, keeping previous rotation:\n{e}")
+            return False
+
+        self._overrides = overrides
+        engine.queue_reload(class_name, rotation, changes, keybind_ids, program)
+        self.last_reload_ms = (time.perf_counter() - started) * 1000
+        self.last_error = None
+        self.reloads += 1
+        print(f"Reloaded {class_name} rotation in {self.last_reload_ms:.2f} ms")
+        return True
+
+    @staticmethod
+    def _file_keybinds(overrides: dict, class_name: str) -> Dict[str, str]:
+        keybinds = DEFAULT_KEYBINDS.get(class_name, {}).copy()
+        keybinds.update(overrides.get(class_name, {}))
+        return keybinds
+
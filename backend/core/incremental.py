@@ -0,0 +1,226 @@
+"""
+Incremental Evaluation
+Reuses each spell's condition result until a state field it depends on
+changes in a way that can change the result
+
+Conditions mostly compare a field against constants (power >= 40, target.hp
+<= 35, not debuff(割裂)). For such a field only the side of each constant it
+is on matters, so power ticking from 41 to 43 changes nothing when no
+condition's threshold lies between them. The cache compiles one function per
+program that reduces every field the program reads to that position (the
+number of threshold comparisons that hold), or to the value itself where a
+field is used in arithmetic or compared with another field. The tuple of
+positions is the dependency key: states with the same key give every spell
+the same check(state) result, so the results are computed once per key and
+decisions and trace reasons stay identical to a full evaluation.
+
+Checks are compiled and mostly a comparison or two, so the key only pays off
+over the several checks a typical decision runs: on the built-in rotations
+a cached decision is 5-20% cheaper than a full one (the decide and
+decide_full columns of benchmarks/bench_rotation).
+"""
+import ast
+from bisect import bisect_left, bisect_right
+from typing import Dict, Optional, Tuple
+
+from core.conditions import ATTRIBUTES, AURA_FUNCTIONS, FIELDS
+from core.rotation_program import REJECT_COOLDOWN, REJECT_GCD
+from core.spell_registry import REGISTRY
+
+# Keys kept per program before starting over; a rotation normally needs a few dozen
+MAX_KEYS = 4096
+
+# Comparison op -> (op with the operands swapped)
+_SWAPPED = {ast.Lt: ast.Gt, ast.LtE: ast.GtE, ast.Gt: ast.Lt, ast.GtE: ast.LtE,
+            ast.Eq: ast.Eq, ast.NotEq: ast.NotEq}
+# Comparison of a read against a constant -> the monotone tests deciding it:
+# ">=" for value >= constant, ">" for value > constant
+_TESTS = {ast.Lt: (">=",), ast.GtE: (">=",), ast.Gt: (">",), ast.LtE: (">",),
+          ast.Eq: (">=", ">"), ast.NotEq: (">=", ">")}
+
+
+def _read(node: ast.expr) -> Optional[str]:
+    """The GameState read a DSL operand stands for, None if it isn't one"""
+    if isinstance(node, ast.Name):
+        return f"state.{FIELDS[node.id]}"
+    if isinstance(node, ast.Attribute):
+        return f"state.{ATTRIBUTES[(node.value.id, node.attr)]}"
+    if isinstance(node, ast.Call):
+        aura_id = REGISTRY.intern(node.args[0].value)
+        return f"state.{AURA_FUNCTIONS[node.func.id]}.stacks[{aura_id}]"
+    return None
+
+
+class _Dependencies:
+    """
+    The reads of a set of conditions, each with the threshold tests deciding
+    every use of it, or marked raw where a use depends on more than that
+    """
+
+    def __init__(self):
+        self.tests: Dict[str, set] = {}
+        self.truth = set()
+        self.raw = set()
+
+    def add(self, expr: ast.expr):
+        self._visit(expr, truth=True)
+
+    def _visit(self, node: ast.expr, truth: bool):
+        read = _read(node)
+        if read is not None:
+            self.tests.setdefault(read, set())
+            if truth:
+                self.truth.add(read)
+            else:
+                self.raw.add(read)
+            return
+        if isinstance(node, ast.Compare):
+            self._visit_compare(node)
+        elif isinstance(node, ast.BoolOp):
+            # and/or yield an operand: only its truth matters when theirs does
+            for value in node.values:
+                self._visit(value, truth)
+        elif isinstance(node, ast.UnaryOp):
+            self._visit(node.operand, isinstance(node.op, ast.Not))
+        else:
+            for child in ast.iter_child_nodes(node):
+                if isinstance(child, ast.expr):
+                    self._visit(child, truth=False)
+
+    def _visit_compare(self, node: ast.Compare):
+        operands = [node.left] + node.comparators
+        for index, operand in enumerate(operands):
+            read = _read(operand)
+            if read is None:
+                self._visit(operand, truth=False)
+                continue
+            tests = self.tests.setdefault(read, set())
+            # Every comparison the read takes part in must be against a constant
+            for op, other, swap in ((node.ops[index - 1] if index else None,
+                                     operands[index - 1] if index else None, True),
+                                    (node.ops[index] if index < len(node.ops) else None,
+                                     operands[index + 1] if index < len(node.ops) else None, False)):
+                if op is None:
+                    continue
+                if not isinstance(other, ast.Constant):
+                    self.raw.add(read)
+                    continue
+                # Normalize to "read OP constant"
+                kind = _SWAPPED[type(op)] if swap else type(op)
+                tests.update((test, other.value) for test in _TESTS[kind])
+
+    def key_expression(self, read: str, name: str) -> str:
+        """
+        An expression of the read that decides every use of it, evaluating
+        the read once (name is a free local for its value)
+        """
+        if read in self.raw:
+            return read
+        tests = self.tests[read]
+        if not tests:
+            return f"not {read}"
+        if read in self.truth:
+            # Truthiness is value != 0
+            tests = tests | {(">=", 0), (">", 0)}
+        kinds = {kind for kind, _ in tests}
+        if len(tests) >= 3 and len(kinds) == 1:
+            # How many thresholds the value is at or past (">="), or past (">")
+            search = "bisect_right" if kinds == {">="} else "bisect_left"
+            return f"{search}({tuple(sorted(constant for _, constant in tests))!r}, {read})"
+        tests = sorted(tests, key=lambda test: (test[1], test[0]))
+        if len(tests) == 1:
+            kind, constant = tests[0]
+            return f"{read} {kind} {constant!r}"
+        # Each test is monotone in the value, so the number that hold tells them all apart
+        (kind, constant), rest = tests[0], tests[1:]
+        return " + ".join([f"(({name} := {read}) {kind} {constant!r})"]
+                          + [f"({name} {kind} {constant!r})" for kind, constant in rest])
+
+
+def dependency_key_source(conditions) -> str:
+    """
+    Source of the dependency key expression over 'state', see the module
+    docstring, preceded by assignments of the aura stack arrays it reads
+    """
+    dependencies = _Dependencies()
+    for condition in conditions:
+        dependencies.add(condition.expr)
+    reads = sorted(dependencies.tests)
+    parts = [dependencies.key_expression(read, f"v{index}") for index, read in enumerate(reads)]
+    lines = []
+    for table in ("buffs", "debuffs"):
+        array = f"state.{table}.stacks["
+        if sum(read.startswith(array) for read in reads) > 1:
+            # Looked up once rather than per aura
+            lines.append(f"{table} = {array[:-1]}")
+            parts = [part.replace(array, f"{table}[") for part in parts]
+    lines.append(f"key = ({''.join(part + ', ' for part in parts)})")
+    return "\n".join(lines)
+
+
+class DecisionCache:
+    """
+    Decisions of one program, with check results memoized by dependency key
+    decide(state, now, gcd_active, ready_at) returns the same (spell or None,
+    reject bits) as the engine's full scan. It is compiled per program by
+    reset(): the key is computed inline and the priority scan is unrolled
+    over the memoized results, so a known key calls no check at all.
+    """
+
+    def __init__(self):
+        self.program = None
+        self.misses = 0
+        self.decide = None
+        self._results: Dict[tuple, Tuple[int, ...]] = {}
+        self._source = None
+        self._namespace = {"results": self._results, "evaluate": self._evaluate,
+                           "bisect_left": bisect_left, "bisect_right": bisect_right}
+
+    def reset(self, program: Tuple):
+        """Start over for a new program"""
+        self.program = program
+        self._results.clear()
+        source = _decide_source(program)
+        # Reordering a spell's conditions (condition stats) changes the reject
+        # bits its check reports but not this source, which is kept compiled
+        if source != self._source:
+            exec(compile(source, "<decision cache>", "exec"), self._namespace)
+            self._source = source
+            self.decide = self._namespace["decide"]
+        for index, spell in enumerate(program):
+            self._namespace[f"spell{index}"] = spell
+
+    def _evaluate(self, state, key: tuple) -> Tuple[int, ...]:
+        self.misses += 1
+        if len(self._results) >= MAX_KEYS:
+            self._results.clear()
+        failed = self._results[key] = tuple(spell.check(state) for spell in self.program)
+        return failed
+
+    def __len__(self):
+        return len(self._results)
+
+
+def _decide_source(program: Tuple) -> str:
+    """Source of DecisionCache.decide for program, reading spell<index> globals"""
+    lines = ["def decide(state, now, gcd_active, ready_at, get=results.get, evaluate=evaluate,"
+             " bisect_left=bisect_left, bisect_right=bisect_right):"]
+    if program:
+        lines += dependency_key_source(
+            condition for spell in program for condition in spell.conditions).splitlines()
+        lines += ["failed = get(key)",
+                  "if failed is None:",
+                  "    failed = evaluate(state, key)",
+                  "".join(f"f{index}, " for index in range(len(program))) + "= failed"]
+    lines.append("reject = 0")
+    for index, spell in enumerate(program):
+        # Same order of reasons as RotationEngine._decide
+        test = "if"
+        if not spell.off_gcd:
+            lines += ["if gcd_active:", f"    reject |= {REJECT_GCD}"]
+            test = "elif"
+        lines += [f"{test} ready_at[{spell.spell_id}] > now:", f"    reject |= {REJECT_COOLDOWN}",
+                  f"elif f{index}:", f"    reject |= f{index}",
+                  "else:", f"    return spell{index}, reject"]
+    lines.append("return None, reject")
+    return "\n    ".join(lines) + "\n"
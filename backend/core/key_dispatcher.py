@@ -0,0 +1,147 @@
+"""
+Key Dispatcher
+Emits key down/up events at their due times from a scheduler thread, so
+callers of KeySimulator return immediately instead of sleeping
+"""
+import heapq
+import itertools
+import sys
+import threading
+import time
+
+
+class Win32KeyBackend:
+    """Sends key events through keybd_event"""
+
+    def __init__(self):
+        # Imported here so pywin32 is only loaded when keys are really sent
+        import win32api
+        import win32con
+        self._keybd_event = win32api.keybd_event
+        self._keyup = win32con.KEYEVENTF_KEYUP
+
+    def key_down(self, vk_code: int):
+        self._keybd_event(vk_code, 0, 0, 0)
+
+    def key_up(self, vk_code: int):
+        self._keybd_event(vk_code, 0, self._keyup, 0)
+
+
+class RecordingKeyBackend:
+    """Records key events instead of sending them (for tests off Windows)"""
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.events = []  # (time, vk_code, is_down)
+
+    def key_down(self, vk_code: int):
+        self.events.append((self.clock(), vk_code, True))
+
+    def key_up(self, vk_code: int):
+        self.events.append((self.clock(), vk_code, False))
+
+
+class KeyDispatcher:
+    """
+    Timer heap of pending key events drained by a scheduler thread
+    Events scheduled together keep their relative order and spacing.
+    """
+
+    def __init__(self, backend, clock=time.monotonic):
+        self.backend = backend
+        self.clock = clock
+        self._heap = []  # (due, seq, vk_code, is_down)
+        self._seq = itertools.count()
+        self._condition = threading.Condition()
+        self._closed = False
+        # Events popped off the heap and still being sent
+        self._in_flight = 0
+        self._thread = threading.Thread(target=self._run, name="KeyDispatcher", daemon=True)
+        self._thread.start()
+
+    def schedule(self, events):
+        """
+        Queue key events and return immediately
+        Args:
+            events: Iterable of (delay in seconds, vk_code, is_down)
+        """
+        now = self.clock()
+        with self._condition:
+            for delay, vk_code, is_down in events:
+                heapq.heappush(self._heap, (now + delay, next(self._seq), vk_code, is_down))
+            # wait_idle callers share the condition with the scheduler thread
+            self._condition.notify_all()
+
+    @property
+    def pending(self) -> int:
+        """Events not yet sent, including any being sent right now"""
+        with self._condition:
+            return len(self._heap) + self._in_flight
+
+    def wait_idle(self, timeout: float = 1.0) -> bool:
+        """Block until every queued event has been emitted"""
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while self._heap or self._in_flight:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+            return True
+
+    def close(self):
+        """Release every held key and stop the scheduler thread"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join(1.0)
+
+    def _run(self):
+        closing = False
+        while not closing:
+            with self._condition:
+                while not self._closed:
+                    if not self._heap:
+                        self._condition.wait()
+                        continue
+                    wait = self._heap[0][0] - self.clock()
+                    if wait <= 0:
+                        break
+                    self._condition.wait(wait)
+                closing = self._closed
+                if closing:
+                    # Flush key ups so nothing stays held down, including the
+                    # up of a down sent while close() was being called
+                    pending = sorted(e for e in self._heap if not e[3])
+                    self._heap.clear()
+                else:
+                    pending = [heapq.heappop(self._heap)]
+                self._in_flight = len(pending)
+
+            for _, _, vk_code, is_down in pending:
+                try:
+                    if is_down:
+                        self.backend.key_down(vk_code)
+                    else:
+                        self.backend.key_up(vk_code)
+                except Exception as e:
+                    print(f"Error sending key {vk_code:#x}: {e}")
+
+            with self._condition:
+                self._in_flight = 0
+                self._condition.notify_all()
+
+
+def create_key_backend():
+    """Key backend for the current platform (None where keys are only logged)"""
+    if sys.platform == "win32":
+        return Win32KeyBackend()
+    return None
+
+
+def create_key_dispatcher():
+    """Create a dispatcher for the current platform (None where keys are only logged)"""
+    backend = create_key_backend()
+    if backend is not None:
+        return KeyDispatcher(backend)
+    return None
@@ -5,16 +5,19 @@ Simulates key presses using Windows API
 import time
 import sys
 
-# Only import win32 on Windows
-if sys.platform == "win32":
-    import win32api
-    import win32con
-    import ctypes
+
+MODIFIER_CODES = {
+    'ctrl': 0x11,
+    'alt': 0x12,
+    'shift': 0x10
+}
 
 
 class KeySimulator:
-    def __init__(self):
+    def __init__(self, dispatcher=None):
         self.key_map = self._init_key_map()
+        # Optional KeyDispatcher: presses are queued and return immediately
+        self.dispatcher = dispatcher
 
     def _init_key_map(self) -> dict:
         """Initialize key code mapping"""
@@ -36,7 +39,7 @@ class KeySimulator:
             key: Key to press (e.g., '1', 'q', 'w')
             duration: How long to hold the key in seconds
         """
-        if sys.platform != "win32":
+        if self.dispatcher is None and sys.platform != "win32":
             print(f"[模拟按键] {key}")
             return
 
@@ -47,7 +50,18 @@ class KeySimulator:
 
         vk_code = self.key_map[key]
 
+        if self.dispatcher is not None:
+            self.dispatcher.schedule([
+                (0, vk_code, True),
+                (duration, vk_code, False),
+            ])
+            return
+
         try:
+            # Imported on first use so headless and non-Windows runs never load pywin32
+            import win32api
+            import win32con
+
             # Key down
             win32api.keybd_event(vk_code, 0, 0, 0)
             time.sleep(duration)
@@ -64,27 +78,34 @@ class KeySimulator:
             key: Key to press
             duration: How long to hold the keys
         """
-        if sys.platform != "win32":
+        if self.dispatcher is None and sys.platform != "win32":
             print(f"[模拟按键] {modifier}+{key}")
             return
 
         modifier = modifier.lower()
         key = key.lower()
 
-        modifier_codes = {
-            'ctrl': 0x11,
-            'alt': 0x12,
-            'shift': 0x10
-        }
-
-        if modifier not in modifier_codes or key not in self.key_map:
+        if modifier not in MODIFIER_CODES or key not in self.key_map:
             print(f"Unknown modifier or key: {modifier}, {key}")
             return
 
-        mod_vk = modifier_codes[modifier]
+        mod_vk = MODIFIER_CODES[modifier]
         key_vk = self.key_map[key]
 
+        if self.dispatcher is not None:
+            # Same spacing as the blocking path below
+            self.dispatcher.schedule([
+                (0, mod_vk, True),
+                (0.02, key_vk, True),
+                (0.02 + duration, key_vk, False),
+                (0.04 + duration, mod_vk, False),
+            ])
+            return
+
         try:
+            import win32api
+            import win32con
+
             # Modifier down
             win32api.keybd_event(mod_vk, 0, 0, 0)
             time.sleep(0.02)
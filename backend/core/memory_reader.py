@@ -2,9 +2,13 @@
 Memory Reader - Reads game data directly from memory
 WARNING: This may trigger anti-cheat systems
 """
+import struct
 import sys
 import time
 
+from core.game_state import GameState
+from core.metrics import ThreadCounters
+
 if sys.platform == "win32":
     import ctypes
     from ctypes import wintypes
@@ -14,13 +18,121 @@ if sys.platform == "win32":
 PROCESS_QUERY_INFORMATION = 0x0400
 PROCESS_VM_READ = 0x0010
 
+# Snapshot layouts - each unit region is read in one call and decoded at once.
+# Offsets are the same placeholders used by the per-field readers below.
+UNIT_POINTERS_OFFSET = 0xC98  # local player at +0xC98, target at +0xCA0
+UNIT_POINTERS_STRUCT = struct.Struct("<I4xI")
+
+PLAYER_REGION_OFFSET = 0x94  # flags 0x94, health 0xF8/0xFC, power 0x104/0x108
+PLAYER_STRUCT = struct.Struct("<I96xII4xII")
+
+TARGET_REGION_OFFSET = 0xF8  # health 0xF8/0xFC, name 0x200 (12 x int32)
+TARGET_STRUCT = struct.Struct("<II256x12I")
+
+COMBAT_FLAG = 0x80000
+
+# Client connection pointer chain (dynamic, changes on login/zone)
+CLIENT_POINTER_BASE = 0x00DDF704
+CLIENT_POINTER_OFFSETS = (0x78, 0x18C, 0x228)
+
+
+class PointerCache:
+    """
+    Memoizes resolved pointer chains
+    A cached chain is checked each tick by re-reading only its last link from
+    the cached parent address (the sentinel). The full chain is re-walked when
+    the sentinel changes, and every revalidate_interval hits as a safety net.
+    """
+
+    def __init__(self, revalidate_interval: int = 100):
+        self.revalidate_interval = revalidate_interval
+        # (base, offsets) -> [parent address, resolved pointer, hits since walk]
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+
+    def invalidate(self, base=None, offsets=None):
+        """Drop one chain, or every chain when called without arguments"""
+        if base is None:
+            self.entries.clear()
+        else:
+            self.entries.pop((base, tuple(offsets)), None)
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "revalidations": self.revalidations,
+            "entries": len(self.entries),
+        }
+
+
+class Win32ProcessBackend:
+    """Reads memory of the WoW process through ReadProcessMemory"""
+
+    def __init__(self, process_handle):
+        self.process_handle = process_handle
+        self.reads = 0
+
+    def read(self, address, size):
+        self.reads += 1
+        buffer = ctypes.create_string_buffer(size)
+        bytes_read = ctypes.c_size_t()
+
+        result = ctypes.windll.kernel32.ReadProcessMemory(
+            self.process_handle,
+            ctypes.c_void_p(address),
+            buffer,
+            size,
+            ctypes.byref(bytes_read)
+        )
+
+        if result:
+            return buffer.raw[:bytes_read.value]
+        return None
+
+    def close(self):
+        ctypes.windll.kernel32.CloseHandle(self.process_handle)
+
+
+class BytearrayProcessBackend:
+    """Fake process that serves reads from a bytearray (for testing off Windows)"""
+
+    def __init__(self, memory: bytearray, base_address: int = 0):
+        self.memory = memory
+        self.base_address = base_address
+        self.reads = 0
+
+    def read(self, address, size):
+        self.reads += 1
+        start = address - self.base_address
+        if start < 0 or start + size > len(self.memory):
+            return None
+        return bytes(self.memory[start:start + size])
+
+    def close(self):
+        pass
+
 
 class MemoryReader:
-    def __init__(self):
+    # Slots of self.counters
+    COUNT_READ_FAILURES = 0
+    COUNT_STATE_ERRORS = 1
+
+    def __init__(self, backend=None, snapshot_mode: bool = True, cache_pointers: bool = True):
         self.process_handle = None
         self.base_address = None
         self.wow_window = None
-        self.find_wow_process()
+        self.backend = backend
+        # Read each unit region in one call instead of field by field
+        self.snapshot_mode = snapshot_mode
+        self.pointer_cache = PointerCache() if cache_pointers else None
+        self.state = GameState()
+        # Failure counts for the metrics endpoint
+        self.counters = ThreadCounters(2)
+        if backend is None:
+            self.find_wow_process()
 
     def find_wow_process(self):
         """Find World of Warcraft process"""
@@ -53,6 +165,7 @@ class MemoryReader:
                 print("Failed to open process")
                 return False
 
+            self.backend = Win32ProcessBackend(self.process_handle)
             print(f"Connected to WoW process: {pid.value}")
             return True
 
@@ -62,27 +175,23 @@ class MemoryReader:
 
     def read_memory(self, address, size=4):
         """Read memory at address"""
-        if not self.process_handle:
+        if not self.backend:
             return None
 
         try:
-            buffer = ctypes.create_string_buffer(size)
-            bytes_read = ctypes.c_size_t()
-
-            result = ctypes.windll.kernel32.ReadProcessMemory(
-                self.process_handle,
-                ctypes.c_void_p(address),
-                buffer,
-                size,
-                ctypes.byref(bytes_read)
-            )
-
-            if result:
-                return buffer.raw[:bytes_read.value]
-            return None
-
+            data = self.backend.read(address, size)
         except Exception as e:
-            return None
+            data = None
+        if data is None:
+            self.counters.shard()[self.COUNT_READ_FAILURES] += 1
+        return data
+
+    def read_struct(self, address, layout: struct.Struct):
+        """Read a region in one call and decode it with a precompiled struct"""
+        data = self.read_memory(address, layout.size)
+        if data and len(data) == layout.size:
+            return layout.unpack_from(data)
+        return None
 
     def read_int(self, address):
         """Read integer from memory"""
@@ -95,7 +204,6 @@ class MemoryReader:
         """Read float from memory"""
         data = self.read_memory(address, 4)
         if data and len(data) == 4:
-            import struct
             return struct.unpack('f', data)[0]
         return 0.0
 
@@ -118,6 +226,46 @@ class MemoryReader:
                 return 0
         return addr
 
+    def _walk_pointer(self, base, offsets):
+        """Follow pointer chain, also returning the address of the last link"""
+        addr = base
+        parent = 0
+        for offset in offsets:
+            parent = addr
+            addr = self.read_int(addr + offset)
+            if addr == 0:
+                return 0, 0
+        return parent, addr
+
+    def get_cached_pointer(self, base, offsets):
+        """Follow pointer chain, reusing the cached result while it is unchanged"""
+        cache = self.pointer_cache
+        if cache is None:
+            return self.get_pointer(base, offsets)
+
+        key = (base, offsets)
+        entry = cache.entries.get(key)
+        if entry is not None:
+            parent, resolved, uses = entry
+            if uses < cache.revalidate_interval:
+                # Sentinel: re-read only the last link
+                if self.read_int(parent + offsets[-1]) == resolved:
+                    entry[2] = uses + 1
+                    cache.hits += 1
+                    return resolved
+                cache.misses += 1
+            else:
+                cache.revalidations += 1
+        else:
+            cache.misses += 1
+
+        parent, resolved = self._walk_pointer(base, offsets)
+        if resolved:
+            cache.entries[key] = [parent, resolved, 0]
+        else:
+            cache.entries.pop(key, None)
+        return resolved
+
     def get_player_health(self, player_ptr):
         """Get player health"""
         # Offset to health - varies by game version
@@ -168,80 +316,102 @@ class MemoryReader:
 
         return cooldowns
 
-    def get_game_state(self):
+    def get_player_snapshot(self, player_ptr):
+        """Read health, power and combat flag of the player in one call"""
+        fields = self.read_struct(player_ptr + PLAYER_REGION_OFFSET, PLAYER_STRUCT)
+        if fields is None:
+            fields = (0, 0, 0, 0, 0)
+        flags, health, max_health, power, max_power = fields
+
+        health_pct = 100
+        if max_health > 0:
+            health_pct = int(health / max_health * 100)
+        in_combat = (flags & COMBAT_FLAG) != 0
+        return health_pct, health, max_health, power, max_power, in_combat
+
+    def get_target_snapshot(self, target_ptr):
+        """Read target health and name in one call"""
+        if target_ptr == 0:
+            return "", 100, 0
+
+        fields = self.read_struct(target_ptr + TARGET_REGION_OFFSET, TARGET_STRUCT)
+        if fields is None:
+            return "", 0, 0
+
+        health, max_health = fields[0], fields[1]
+        name = "".join(chr(c) for c in fields[2:] if 0 < c <= 0x10FFFF)
+        health_pct = 0
+        if max_health > 0:
+            health_pct = int(health / max_health * 100)
+        return name, health_pct, max_health
+
+    def get_game_state(self) -> GameState:
         """
         Get complete game state from memory
+        The returned GameState is reused and refilled on the next call
         Note: Offsets need to be adjusted for specific game version
         """
-        if not self.process_handle:
-            return {
-                "healthPercent": 100,
-                "power": 0,
-                "maxPower": 100,
-                "inCombat": False,
-                "targetName": "",
-                "targetHealthPercent": 100,
-                "spells": {}
-            }
+        state = self.state
+        if not self.backend:
+            state.reset()
+            return state
 
         # These offsets need to be updated for each game version
         # They're just placeholders
 
         try:
             # Get client connection (dynamic, changes on login)
-            client_ptr = self.get_pointer(0x00DDF704, [0x78, 0x18C, 0x228])  # Example
+            client_ptr = self.get_cached_pointer(CLIENT_POINTER_BASE, CLIENT_POINTER_OFFSETS)
 
             if client_ptr == 0:
-                return {
-                    "healthPercent": 100,
-                    "power": 0,
-                    "maxPower": 100,
-                    "inCombat": False,
-                    "targetName": "",
-                    "targetHealthPercent": 100,
-                    "spells": {}
-                }
-
-            # Player and target pointers
-            player_ptr = self.read_int(client_ptr + 0xC98)  # Local player
-            target_ptr = self.read_int(client_ptr + 0xCA0)  # Current target
-
-            # Read player data
-            health_pct, health, max_health = self.get_player_health(player_ptr)
-            power, max_power = self.get_player_power(player_ptr)
-            in_combat = self.get_combat_status(player_ptr)
-
-            # Read target data
-            target_name, target_hp, _ = self.get_target_info(target_ptr)
-
-            return {
-                "healthPercent": health_pct,
-                "health": health,
-                "maxHealth": max_health,
-                "power": power,
-                "maxPower": max_power,
-                "inCombat": in_combat,
-                "targetName": target_name,
-                "targetHealthPercent": target_hp,
-                "spells": {}
-            }
+                state.reset()
+                return state
+
+            if self.snapshot_mode:
+                # Player and target pointers share one read
+                pointers = self.read_struct(client_ptr + UNIT_POINTERS_OFFSET, UNIT_POINTERS_STRUCT)
+                player_ptr, target_ptr = pointers if pointers else (0, 0)
+                if player_ptr == 0 and self.pointer_cache:
+                    # Client object is gone (logout/loading screen), re-walk next tick
+                    self.pointer_cache.invalidate()
+
+                (health_pct, health, max_health,
+                 power, max_power, in_combat) = self.get_player_snapshot(player_ptr)
+                target_name, target_hp, _ = self.get_target_snapshot(target_ptr)
+            else:
+                # Player and target pointers
+                player_ptr = self.read_int(client_ptr + 0xC98)  # Local player
+                target_ptr = self.read_int(client_ptr + 0xCA0)  # Current target
+
+                # Read player data
+                health_pct, health, max_health = self.get_player_health(player_ptr)
+                power, max_power = self.get_player_power(player_ptr)
+                in_combat = self.get_combat_status(player_ptr)
+
+                # Read target data
+                target_name, target_hp, _ = self.get_target_info(target_ptr)
+
+            state.health_percent = health_pct
+            state.health = health
+            state.max_health = max_health
+            state.power = power
+            state.max_power = max_power
+            state.in_combat = in_combat
+            state.target_name = target_name
+            state.target_health_percent = target_hp
+            return state
 
         except Exception as e:
             print(f"Error reading game state: {e}")
-            return {
-                "healthPercent": 100,
-                "power": 0,
-                "maxPower": 100,
-                "inCombat": False,
-                "targetName": "",
-                "targetHealthPercent": 100,
-                "spells": {}
-            }
+            self.counters.shard()[self.COUNT_STATE_ERRORS] += 1
+            state.reset()
+            return state
 
     def close(self):
         """Close process handle"""
-        if self.process_handle:
-            ctypes.windll.kernel32.CloseHandle(self.process_handle)
+        if self.backend:
+            self.backend.close()
+            self.backend = None
             self.process_handle = None
 
 
@@ -249,19 +419,19 @@ class MemoryReader:
 class MockMemoryReader:
     """Mock memory reader for testing"""
 
-    def __init__(self):
+    def __init__(self, aura_source=None, clock=time.time):
         print("Using mock memory reader (no WoW connected)")
-
-    def get_game_state(self):
-        return {
-            "healthPercent": 85,
-            "power": 50,
-            "maxPower": 100,
-            "inCombat": False,
-            "targetName": "",
-            "targetHealthPercent": 100,
-            "spells": {}
-        }
+        self.state = GameState()
+        self.state.health_percent = 85
+        self.state.power = 50
+        # Optional MockAuraSource providing buffs/debuffs
+        self.aura_source = aura_source
+        self.clock = clock
+
+    def get_game_state(self) -> GameState:
+        if self.aura_source:
+            self.aura_source.fill(self.state, self.clock())
+        return self.state
 
     def close(self):
         pass
@@ -271,7 +441,7 @@ def create_memory_reader():
     """Create appropriate memory reader based on platform"""
     if sys.platform == "win32":
         reader = MemoryReader()
-        if reader.process_handle:
+        if reader.backend:
             return reader
         else:
             print("Failed to connect to WoW, using mock reader")
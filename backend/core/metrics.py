@@ -0,0 +1,175 @@
+"""
+Metrics
+Lock-free per-thread counters and a loopback HTTP endpoint exporting them
+in the Prometheus text format, for watching long sessions
+
+    curl http://127.0.0.1:9108/metrics
+"""
+import threading
+import time
+from array import array
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List
+
+from core.spell_registry import REGISTRY
+
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = 9108
+
+
+class ThreadCounters:
+    """
+    A fixed set of counters with one array per writing thread
+    Writers bump slots in their own thread's array, so the hot path never
+    locks; collect() sums every shard. Shards of finished threads are kept
+    so the totals never go backwards.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self._local = threading.local()
+        self._shards = []
+        self._lock = threading.Lock()  # only taken when a thread first writes
+
+    def shard(self) -> array:
+        """This thread's counters"""
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = array("Q", bytes(8 * self.size))
+            with self._lock:
+                self._shards.append(shard)
+            self._local.shard = shard
+            return shard
+
+    def collect(self) -> List[int]:
+        with self._lock:
+            shards = list(self._shards)
+        totals = [0] * self.size
+        for shard in shards:
+            for slot, value in enumerate(shard):
+                totals[slot] += value
+        return totals
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+class MetricsServer:
+    """
+    Serves /metrics on loopback from a background thread
+    Counters are read at scrape time from the engine, the memory reader (if
+    it keeps counters) and the engine worker; rates are left to Prometheus.
+    """
+
+    def __init__(self, rotation_engine, memory_reader=None, engine_worker=None,
+                 host: str = METRICS_HOST, port: int = METRICS_PORT):
+        self.rotation_engine = rotation_engine
+        self.memory_reader = memory_reader
+        self.engine_worker = engine_worker
+        self.host = host
+        self.port = port
+        self.started_at = time.time()
+        self._server = None
+        self._thread = None
+
+    def start(self) -> bool:
+        if self._server is not None:
+            return True
+        try:
+            self._server = ThreadingHTTPServer((self.host, self.port), _MetricsHandler)
+        except OSError as e:
+            print(f"Metrics endpoint disabled, cannot bind {self.host}:{self.port}: {e}")
+            return False
+        self._server.daemon_threads = True
+        self._server.metrics = self
+        # Port 0 picks a free port
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        name="MetricsServer", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+            self._thread = None
+
+    def render(self) -> str:
+        """Current counters in the Prometheus text exposition format"""
+        lines = []
+
+        def metric(name: str, kind: str, help_text: str, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{name}{labels} {value}")
+
+        worker = self.engine_worker
+        if worker is not None:
+            metric("wowassist_ticks_total", "counter", "Engine worker ticks",
+                   [("", worker.ticks)])
+            metric("wowassist_dropped_ticks_total", "counter",
+                   "Tick intervals missed: overruns at a fixed rate, or decisions made "
+                   "an interval or more after their predicted wake-up when event driven",
+                   [("", worker.dropped_ticks)])
+
+        engine = self.rotation_engine
+        counts = engine.counters.collect()
+        metric("wowassist_decisions_total", "counter", "Rotation decisions evaluated",
+               [("", counts[engine.COUNT_DECISIONS])])
+        casts = counts[engine.COUNT_CASTS:]
+        metric("wowassist_casts_total", "counter", "Key presses sent per spell",
+               [(f'{{spell="{_escape(REGISTRY.name(spell_id))}"}}', count)
+                for spell_id, count in enumerate(casts) if count])
+        metric("wowassist_engine_running", "gauge", "Whether the rotation is started",
+               [("", int(engine.is_running))])
+
+        stats = engine.condition_stats
+        if stats is not None:
+            rows = stats.snapshot()
+            labels = [f'{{priority="{row["priority"]}",spell="{_escape(row["spell"])}",'
+                      f'condition="{_escape(row["condition"])}"}}' for row in rows]
+            metric("wowassist_condition_evaluations_total", "counter",
+                   "Sampled evaluations of each spell condition",
+                   [(label, row["evaluations"]) for label, row in zip(labels, rows)])
+            metric("wowassist_condition_rejections_total", "counter",
+                   "Sampled evaluations that rejected the spell",
+                   [(label, row["rejections"]) for label, row in zip(labels, rows)])
+            metric("wowassist_condition_seconds_total", "counter",
+                   "Time spent in sampled evaluations",
+                   [(label, f"{row['time_ns'] / 1e9:.9f}") for label, row in zip(labels, rows)])
+
+        reader_counters = getattr(self.memory_reader, "counters", None)
+        if reader_counters is not None:
+            reader = self.memory_reader
+            counts = reader_counters.collect()
+            metric("wowassist_read_failures_total", "counter", "Failed process memory reads",
+                   [("", counts[reader.COUNT_READ_FAILURES])])
+            metric("wowassist_state_errors_total", "counter",
+                   "Game state reads that raised and fell back to defaults",
+                   [("", counts[reader.COUNT_STATE_ERRORS])])
+
+        metric("wowassist_start_time_seconds", "gauge", "Unix time the exporter started",
+               [("", f"{self.started_at:.3f}")])
+        return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.server.metrics.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Scrapes every few seconds would flood the console
+        pass
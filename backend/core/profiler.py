@@ -0,0 +1,167 @@
+"""
+Profiler
+Per-stage latency histograms for the update loop
+
+Stages are timed by swapping a timing wrapper onto the instance in place of
+the method (and removing it again), so a disabled profiler costs nothing.
+Stages nest: decide includes cast.
+"""
+import time
+from typing import Dict, Optional, Tuple
+
+# Log-linear buckets: values below 2**SUB_BITS are exact, above that every
+# power of two is split into 2**(SUB_BITS - 1) buckets (under 1.6% error)
+SUB_BITS = 7
+HALF = 1 << (SUB_BITS - 1)
+BUCKETS = (64 - SUB_BITS + 2) * HALF
+
+
+def _bucket(value: int) -> int:
+    if value < (1 << SUB_BITS):
+        return value
+    shift = value.bit_length() - SUB_BITS
+    return (shift << (SUB_BITS - 1)) + (value >> shift)
+
+
+def _bucket_high(index: int) -> int:
+    """Largest value that lands in a bucket"""
+    if index < (1 << SUB_BITS):
+        return index
+    shift = (index >> (SUB_BITS - 1)) - 1
+    mantissa = index - (shift << (SUB_BITS - 1))
+    return ((mantissa + 1) << shift) - 1
+
+
+class LatencyHistogram:
+    """HDR-style histogram of nanosecond latencies with fixed relative precision"""
+
+    def __init__(self):
+        self.counts = [0] * BUCKETS
+        self.reset()
+
+    def reset(self):
+        for index in range(BUCKETS):
+            self.counts[index] = 0
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def record(self, value: int):
+        self.counts[_bucket(value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, percent: float) -> int:
+        """Value at or below which percent of the samples fall (bucket upper bound)"""
+        if not self.count:
+            return 0
+        target = max(1, int(self.count * percent / 100 + 0.5))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return min(_bucket_high(index), self.max)
+        return self.max
+
+    def snapshot(self) -> Dict[str, float]:
+        """Summary in nanoseconds"""
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+            "max": self.max,
+        }
+
+
+def _timed(method, histogram: LatencyHistogram):
+    clock = time.perf_counter_ns
+    record = histogram.record
+
+    def wrapper(*args, **kwargs):
+        start = clock()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            record(clock() - start)
+    return wrapper
+
+
+class Profiler:
+    """
+    Named stages, each an (object, method name) pair with its own histogram
+    enable() and disable() may be called from any thread; a call already
+    running when the wrapper is swapped in or out is simply not timed.
+    """
+
+    def __init__(self):
+        self.stages: Dict[str, Tuple[object, str]] = {}
+        self.histograms: Dict[str, LatencyHistogram] = {}
+        self.enabled = False
+
+    def add_stage(self, name: str, target, method: str):
+        self.stages[name] = (target, method)
+        self.histograms[name] = LatencyHistogram()
+        if self.enabled:
+            self._hook(name)
+
+    def _hook(self, name: str):
+        target, method = self.stages[name]
+        setattr(target, method, _timed(getattr(target, method), self.histograms[name]))
+
+    def _unhook(self, name: str):
+        target, method = self.stages[name]
+        if method in vars(target):
+            delattr(target, method)
+
+    def enable(self):
+        if self.enabled:
+            return
+        self.enabled = True
+        for name in self.stages:
+            self._hook(name)
+
+    def disable(self):
+        if not self.enabled:
+            return
+        self.enabled = False
+        for name in self.stages:
+            self._unhook(name)
+
+    def reset(self):
+        for histogram in self.histograms.values():
+            histogram.reset()
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """Per-stage summaries in nanoseconds"""
+        return {name: histogram.snapshot() for name, histogram in self.histograms.items()}
+
+    def format(self, labels: Optional[Dict[str, str]] = None) -> str:
+        """Snapshot as a text table, latencies in microseconds"""
+        lines = [f"{'stage':<12}{'count':>9}{'mean':>10}{'p50':>10}{'p90':>10}{'p99':>10}{'max':>10}"]
+        for name, stats in self.snapshot().items():
+            label = (labels or {}).get(name, name)
+            lines.append(f"{label:<12}{stats['count']:>9}" + "".join(
+                f"{stats[key] / 1000:>10.1f}" for key in ("mean", "p50", "p90", "p99", "max")))
+        return "\n".join(lines)
+
+
+def create_engine_profiler(memory_reader, rotation_engine) -> Profiler:
+    """Profiler with the reader and engine stages registered (not enabled)"""
+    profiler = Profiler()
+    profiler.add_stage("read", memory_reader, "get_game_state")
+    profiler.add_stage("decide", rotation_engine, "_execute_rotation")
+    profiler.add_stage("cast", rotation_engine, "_cast_spell")
+    return profiler
+
+
+# Display names for the built-in stages
+STAGE_LABELS: Dict[str, str] = {
+    "read": "读取内存",
+    "decide": "循环决策",
+    "cast": "按键",
+    "ui": "界面刷新",
+}
@@ -0,0 +1,261 @@
+"""
+Replay
+Feeds recorded decision traces back through a RotationEngine on a virtual
+clock and diffs its decisions against the original run, so rotation changes
+can be regression-tested against real sessions
+
+Usage (from backend/):
+    python -m core.replay traces/*.bin
+    python -m core.replay traces/*.bin --rotation my_druid.toml
+"""
+import argparse
+import mmap
+import sys
+import time
+from typing import List, Optional
+
+from core.game_state import GameState
+from core.rotation_engine import RotationEngine
+from core.simulator import NullKeySink, VirtualClock
+from core.spell_registry import REGISTRY
+from core.trace import (FLAG_IN_COMBAT, FLAG_PRESSED, NO_SPELL, RECORD_SIZE, iter_records,
+                        mask_ids, parse_trace)
+
+
+class TraceFile:
+    """
+    A trace dump mapped into memory
+    Records are unpacked one at a time while iterating, so sessions of any
+    length replay without being read into RAM.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.meta, self.records, self.auras = parse_trace(self._map)
+        self.count = len(self.records) // RECORD_SIZE
+
+    def __iter__(self):
+        return iter_records(self.records, self.auras)
+
+    def close(self):
+        self.records.release()
+        self.auras.release()
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class _DecisionLog:
+    """Stands in for the engine's TraceRecorder, keeping only the last decision"""
+
+    def __init__(self):
+        self.enabled = True
+        self.count = 0
+        self.spell_id = NO_SPELL
+        self.flags = 0
+
+    def record(self, now: float, state, spell_id: int, reject: int, flags: int):
+        self.count += 1
+        self.spell_id = spell_id
+        self.flags = flags
+
+
+class ReplayMismatch:
+    """A tick where the replayed engine acted differently"""
+    __slots__ = ("index", "time", "expected", "actual")
+
+    def __init__(self, index: int, time: float, expected: str, actual: str):
+        self.index = index
+        self.time = time  # seconds since the start of the trace
+        self.expected = expected
+        self.actual = actual
+
+    def __str__(self):
+        return f"#{self.index} {self.time:9.3f}s: recorded {self.expected}, replayed {self.actual}"
+
+
+class ReplayResult:
+    """Outcome of replaying one trace"""
+
+    def __init__(self, path: str, class_name: str, ticks: int, casts: int,
+                 mismatch_count: int, mismatches: List[ReplayMismatch], wall_time: float,
+                 warmup_ticks: int = 0):
+        self.path = path
+        self.class_name = class_name
+        self.ticks = ticks
+        self.casts = casts
+        self.mismatch_count = mismatch_count
+        self.mismatches = mismatches  # the first few, for display
+        self.wall_time = wall_time
+        self.warmup_ticks = warmup_ticks  # followed the recording instead of comparing
+
+    @property
+    def ticks_per_second(self) -> float:
+        if self.wall_time <= 0:
+            return 0.0
+        return (self.ticks + self.warmup_ticks) / self.wall_time
+
+    def summary(self) -> str:
+        status = "OK" if not self.mismatch_count else f"{self.mismatch_count} 处不同"
+        warmup = f" (+{self.warmup_ticks} 预热)" if self.warmup_ticks else ""
+        lines = [f"{self.path} ({self.class_name}): {self.ticks} ticks{warmup}, {self.casts} 次施法, "
+                 f"{self.ticks_per_second:,.0f} ticks/s - {status}"]
+        for mismatch in self.mismatches:
+            lines.append(f"  {mismatch}")
+        if self.mismatch_count > len(self.mismatches):
+            lines.append(f"  ... {self.mismatch_count - len(self.mismatches)} more")
+        return "\n".join(lines)
+
+
+def _describe(spell_id: int, pressed: bool, keys: dict) -> str:
+    if spell_id == NO_SPELL:
+        return "-"
+    name = REGISTRY.name(spell_id)
+    key = keys.get(spell_id)
+    if not pressed:
+        return f"{name} (no key)"
+    return f"{name} [{key}]" if key else name
+
+
+def _load_auras(table, mask: bytes, ids: List[int]):
+    table.clear()
+    for aura_id in mask_ids(mask):
+        # Conditions only look at stacks; remaining time isn't traced
+        table.set(ids[aura_id], 0.0)
+
+
+def replay_trace(path: str, class_name: Optional[str] = None, rotation: Optional[List[dict]] = None,
+                 keybinds: Optional[dict] = None, max_mismatches: int = 20) -> ReplayResult:
+    """
+    Replay a trace dump and diff the decisions
+    Every recorded tick already passed the original engine's rate limit and
+    combat check, so the replay engine runs with no action cooldown. Once a
+    decision differs, later ticks still see the recorded power and auras, so
+    one change usually shows up as a short run of mismatches.
+    If the ring buffer wrapped before the dump, the cooldowns of casts before
+    the first record are unknown; the replay then follows the recorded casts
+    for the longest cooldown in the rotation before it starts comparing.
+    Args:
+        path: Trace dump from RotationEngine.dump_trace
+        class_name: Class to replay as, defaults to the recorded class
+        rotation: Modified rotation to evaluate instead of the class rotation
+        keybinds: Keybinds (spell name -> key), defaults to the recorded ones
+        max_mismatches: How many mismatches to keep for display
+    """
+    with TraceFile(path) as trace:
+        meta = trace.meta
+        clock = VirtualClock()
+        engine = RotationEngine(None, NullKeySink(), clock=clock)
+        engine.set_class(class_name or meta.get("class") or "death_knight")
+        if rotation is not None:
+            engine.set_rotation(rotation)
+        engine.set_keybinds(keybinds if keybinds is not None else meta.get("keybinds", {}))
+        engine.set_options(combat_protect=meta.get("combat_protect", True))
+        engine.action_cooldown = 0
+        log = _DecisionLog()
+        engine.trace = log
+        keys = {spell.spell_id: spell.key for spell in engine.program}
+        spells = {spell.spell_id: spell for spell in engine.program}
+        warmup = 0.0
+        if meta.get("dropped"):
+            warmup = max((spell.cooldown for spell in engine.program), default=0.0)
+
+        # The recording process may have interned names in a different order
+        ids = [REGISTRY.intern(name) for name in meta["names"]]
+
+        state = GameState()
+        last_buffs = last_debuffs = None
+        start = None
+        ticks = casts = mismatch_count = skipped = 0
+        mismatches = []
+
+        engine.is_running = True
+        started = time.perf_counter()
+        for (timestamp, power, max_power, health, target_health, flags,
+             spell_id, reject, buffs, debuffs) in trace:
+            if start is None:
+                start = timestamp
+            clock.now = timestamp
+            state.power = power
+            state.max_power = max_power
+            state.health_percent = health
+            state.target_health_percent = target_health
+            state.in_combat = bool(flags & FLAG_IN_COMBAT)
+            if buffs != last_buffs:
+                _load_auras(state.buffs, buffs, ids)
+                last_buffs = buffs
+            if debuffs != last_debuffs:
+                _load_auras(state.debuffs, debuffs, ids)
+                last_debuffs = debuffs
+
+            expected = NO_SPELL if spell_id == NO_SPELL else ids[spell_id]
+            expected_pressed = bool(flags & FLAG_PRESSED)
+            if timestamp - start < warmup:
+                # Rebuild cooldown history from the recorded casts
+                spell = spells.get(expected)
+                if expected_pressed and spell is not None:
+                    engine.cooldowns.record_cast(spell.spell_id, timestamp, spell.cooldown, spell.gcd)
+                    engine.last_action_time = timestamp
+                skipped += 1
+                continue
+
+            decisions = log.count
+            engine.update(state)
+            if log.count == decisions:
+                actual = NO_SPELL
+                pressed = False
+            else:
+                actual = log.spell_id
+                pressed = bool(log.flags & FLAG_PRESSED)
+
+            if actual != expected or pressed != expected_pressed:
+                mismatch_count += 1
+                if len(mismatches) < max_mismatches:
+                    mismatches.append(ReplayMismatch(
+                        ticks, timestamp - start,
+                        _describe(expected, expected_pressed, keys),
+                        _describe(actual, pressed, keys)))
+            if pressed:
+                casts += 1
+            ticks += 1
+        wall_time = time.perf_counter() - started
+        engine.is_running = False
+
+    return ReplayResult(path, engine.current_class, ticks, casts,
+                        mismatch_count, mismatches, wall_time, skipped)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay decision traces and diff the decisions")
+    parser.add_argument("traces", nargs="+")
+    parser.add_argument("--class", dest="class_name", default=None,
+                        help="Class to replay as (default: the recorded class)")
+    parser.add_argument("--rotation", metavar="FILE",
+                        help="Rotation file (TOML/JSON) to test instead of the class rotation")
+    parser.add_argument("--max-mismatches", type=int, default=20)
+    args = parser.parse_args()
+
+    rotation = None
+    if args.rotation:
+        from core.rotation_loader import RotationLoader
+        rotation = RotationLoader(".").load_file(args.rotation)
+
+    status = 0
+    for path in args.traces:
+        result = replay_trace(path, args.class_name, rotation,
+                              max_mismatches=args.max_mismatches)
+        print(result.summary())
+        if result.mismatch_count:
+            status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
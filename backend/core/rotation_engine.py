@@ -2,23 +2,59 @@
 Rotation Engine
 Manages the combat rotation logic - works with screenshot reader
 """
+import threading
 import time
 from typing import Dict, List, Optional
 
+from core.condition_stats import ConditionStats
+from core.cooldowns import CooldownTracker
+from core.game_state import GameState
+from core.incremental import DecisionCache
 from core.key_simulator import KeySimulator
-from config.rotations import get_rotation
+from core.metrics import ThreadCounters
+from core.rotation_program import (REJECT_COOLDOWN, REJECT_GCD, CompiledSpell,
+                                   compile_rotation)
+from core.spell_registry import REGISTRY, REGISTRY_CAPACITY
+from core.trace import FLAG_GCD_ACTIVE, FLAG_PRESSED, NO_SPELL, TraceRecorder
+from config.keybinds import merge_keybinds
+from config.rotations import get_compiled_rotation, get_rotation
+
+# Slack for comparing clock differences, well below any tick interval
+TIME_EPSILON = 1e-9
+
+# Healthstone / self-heal used below 20% health, ahead of the rotation
+SELF_HEAL = CompiledSpell(
+    spell_id=REGISTRY.intern("治疗石"), name="治疗石", key="7", modifier=None,
+    gcd=0.0, cooldown=0.0, off_gcd=True, power_cost=0,
+)
 
 
 class RotationEngine:
-    def __init__(self, memory_reader, key_simulator: KeySimulator):
+    # Slots of self.counters; casts are counted per spell ID from COUNT_CASTS
+    COUNT_DECISIONS = 0
+    COUNT_CASTS = 1
+
+    def __init__(self, memory_reader, key_simulator: KeySimulator, clock=time.time):
         self.memory_reader = memory_reader
         self.key_simulator = key_simulator
+        # Time source, replaced by a virtual clock in the simulator
+        self.clock = clock
         self.is_running = False
 
         # Current class and settings
         self.current_class = None
         self.rotation = None
 
+        # Compiled rotation, rebuilt only when its inputs change
+        self.program = ()
+        self._program_signature = None
+        # Set by set_rotation; otherwise the class rotation is compiled by the loader
+        self._custom_rotation = False
+        # Program rebuilt by the config watcher, installed at the start of the next tick
+        self._pending_reload = None
+        self._reload_lock = threading.Lock()
+        self._has_off_gcd = False
+
         # Options
         self.combat_protect = True
         self.auto_trinket = False
@@ -27,17 +63,36 @@ class RotationEngine:
         self.manual_interrupt = False
 
         # State tracking
+        # Time of the last key press; decisions that press nothing don't count
         self.last_action_time = 0
         self.action_cooldown = 0.1  # 100ms between actions
-        self.gcd_remaining = 0
-        self.last_gcd_time = 0
+        # GCD and per-spell cooldowns as absolute ready times
+        self.cooldowns = CooldownTracker()
+
+        # Observed power regeneration (per second), used to predict wake-ups
+        self.power_regen_rate = 0.0
+        self._last_power_sample = None
 
-        # Keybinds: spell name -> key
+        # Keybinds: spell name -> key, and the same keyed by spell ID
         self.keybinds = {}
+        self.keybind_ids = {}
+
+        # Every decision is logged here; dump it with dump_trace(path)
+        self.trace = TraceRecorder()
+        # Decision and cast counts for the metrics endpoint
+        self.counters = ThreadCounters(self.COUNT_CASTS + REGISTRY_CAPACITY)
+        # Sampled per-condition rejection counters; reorders each spell's
+        # conditions cheapest-selective first unless adaptive is cleared
+        self.condition_stats = ConditionStats(self.program)
+        # Spell check results reused while no threshold the rotation tests
+        # has been crossed; None evaluates every check each decision
+        self.decision_cache = DecisionCache()
 
     def set_keybinds(self, keybinds: dict):
         """Set the keybinds (spell name -> key)"""
         self.keybinds = keybinds
+        self.keybind_ids = {REGISTRY.intern(name): key for name, key in keybinds.items()}
+        self._rebuild_program()
 
     def set_class(self, class_name: str):
         """Set the current class and load its rotation"""
@@ -49,8 +104,22 @@ class RotationEngine:
             "萨满": "shaman",
             "德鲁伊": "druid"
         }
-        self.current_class = class_map.get(class_name, "death_knight")
-        self.rotation = get_rotation(self.current_class)
+        if class_name in class_map.values():
+            current_class = class_name
+        else:
+            current_class = class_map.get(class_name, "death_knight")
+        # Cache hit unless the rotation file changed
+        self.current_class = current_class
+        self.rotation = get_rotation(current_class)
+        self._custom_rotation = False
+        self._rebuild_program()
+
+    def set_rotation(self, rotation: list):
+        """Replace the current rotation with a custom list (e.g. a tuned variant)"""
+        self.rotation = rotation
+        self._custom_rotation = True
+        self._program_signature = None
+        self._rebuild_program()
 
     def set_options(self, combat_protect: bool = True, auto_trinket: bool = False,
                    auto_potion: bool = False, auto_follow: bool = False,
@@ -61,6 +130,82 @@ class RotationEngine:
         self.auto_potion = auto_potion
         self.auto_follow = auto_follow
         self.manual_interrupt = manual_interrupt
+        self._rebuild_program()
+
+    def _rebuild_program(self):
+        """Recompile the rotation if the class, keybinds or options changed"""
+        if self.rotation is None:
+            return
+
+        signature = self._signature()
+        if signature == self._program_signature:
+            return
+
+        if self._custom_rotation:
+            self.program = compile_rotation(self.rotation, self.keybind_ids)
+        else:
+            self.program = get_compiled_rotation(self.current_class, self.keybind_ids)
+        self._program_signature = signature
+        self._has_off_gcd = any(spell.off_gcd for spell in self.program)
+
+    def _signature(self) -> tuple:
+        # Keybinds are copied into the signature since callers mutate the dict in place
+        return (
+            self.current_class,
+            id(self.rotation),
+            tuple(self.keybind_ids.items()),
+            (self.combat_protect, self.auto_trinket, self.auto_potion,
+             self.auto_follow, self.manual_interrupt),
+        )
+
+    def queue_reload(self, class_name: str, rotation: list, keybind_changes: dict,
+                     keybind_ids: dict, program: tuple):
+        """
+        Install a rebuilt rotation at the start of the next tick
+        Safe to call from another thread; GCD and cooldown state are kept.
+        Args:
+            class_name: Class the rotation was rebuilt for
+            rotation: Reloaded rotation list
+            keybind_changes: Spell name -> key (None to remove), merged into self.keybinds
+            keybind_ids: The keybinds program was compiled with
+            program: Compiled rotation
+        """
+        with self._reload_lock:
+            self._pending_reload = (class_name, rotation, keybind_changes, keybind_ids, program)
+
+    def _apply_pending_reload(self):
+        with self._reload_lock:
+            pending = self._pending_reload
+            self._pending_reload = None
+        if pending is None:
+            return
+        class_name, rotation, keybind_changes, keybind_ids, program = pending
+        if class_name != self.current_class or self._custom_rotation:
+            # Class switched since the reload was built
+            return
+
+        # Merged in place: the UI holds the same dict
+        merge_keybinds(self.keybinds, keybind_changes)
+        self.keybind_ids = {REGISTRY.intern(name): key for name, key in self.keybinds.items()}
+        self.rotation = rotation
+        if self.keybind_ids != keybind_ids:
+            # Keybinds edited since the program was compiled
+            program = compile_rotation(rotation, self.keybind_ids)
+        self.program = program
+        self._program_signature = self._signature()
+        self._has_off_gcd = any(spell.off_gcd for spell in program)
+
+    def dump_trace(self, path: str) -> int:
+        """Dump the decision trace with the settings needed to replay it"""
+        return self.trace.dump(path, meta={
+            "class": self.current_class,
+            "keybinds": self.keybinds,
+            "combat_protect": self.combat_protect,
+        })
+
+    @property
+    def gcd_remaining(self) -> float:
+        return self.cooldowns.gcd_remaining(self.clock())
 
     def start(self):
         """Start the rotation engine"""
@@ -72,99 +217,183 @@ class RotationEngine:
         self.is_running = False
         print("Rotation stopped")
 
-    def update(self):
-        """Main update loop called every tick"""
-        if not self.is_running or not self.rotation:
+    def update(self, state: Optional[GameState] = None):
+        """
+        Main update loop called every tick
+        Args:
+            state: Game state already read this tick, read from memory_reader if omitted
+        """
+        if self._pending_reload is not None:
+            self._apply_pending_reload()
+
+        if not self.is_running or not self.program:
             return
 
-        # Rate limiting
-        current_time = time.time()
-        if current_time - self.last_action_time < self.action_cooldown:
+        # Rate limiting after a key press, tolerating float rounding when ticks
+        # are exactly action_cooldown apart
+        current_time = self.clock()
+        if current_time - self.last_action_time < self.action_cooldown - TIME_EPSILON:
             return
 
         # Get game state from memory reader
-        state = self.memory_reader.get_game_state()
+        if state is None:
+            state = self.memory_reader.get_game_state()
 
         # Check if we should be in combat
-        in_combat = state.get("inCombat", False)
-
-        if self.combat_protect and not in_combat:
+        if self.combat_protect and not state.in_combat:
             return
 
         # Execute rotation
         self._execute_rotation(state)
 
-        self.last_action_time = current_time
+    def time_until_next_action(self, state: GameState, ceiling: float = 0.1) -> float:
+        """
+        Estimate how long until the engine could next act, for event-driven scheduling
+        Args:
+            state: Latest game state
+            ceiling: Upper bound on the returned delay (polling fallback)
+        """
+        now = self.clock()
+        self._observe_power(state.power, now)
+
+        if not self.is_running or not self.program:
+            return ceiling
+        if self.combat_protect and not state.in_combat:
+            return ceiling
+
+        # Rate limit and GCD expiry
+        wait = max(self.last_action_time + self.action_cooldown - now,
+                   self.cooldowns.gcd_ready_at - now)
+        if wait <= 0 and state.health_percent >= 20:
+            wait = self._time_until_castable(state, now)
+
+        return min(max(wait, 0.0), ceiling)
+
+    def _time_until_castable(self, state: GameState, now: float) -> float:
+        """Time until the first spell could be cast, from cooldowns and power regen"""
+        best = float("inf")
+        cooldowns = self.cooldowns
+        for spell in self.program:
+            if not cooldowns.is_ready(spell.spell_id, now):
+                continue
+            if self._should_cast_spell(spell, state):
+                return 0.0
+            missing = spell.power_cost - state.power
+            if missing > 0 and self.power_regen_rate > 0:
+                best = min(best, missing / self.power_regen_rate)
+
+        next_ready = cooldowns.earliest_ready(now)
+        if next_ready is not None:
+            best = min(best, next_ready[0] - now)
+        return best
+
+    def _observe_power(self, power: int, now: float):
+        """Track power regeneration as a moving average of observed gains"""
+        sample = self._last_power_sample
+        self._last_power_sample = (now, power)
+        if sample is None:
+            return
+        elapsed = now - sample[0]
+        gained = power - sample[1]
+        if elapsed <= 0 or gained <= 0:
+            # Spending or no change - not a regen sample
+            return
+        rate = gained / elapsed
+        if self.power_regen_rate <= 0:
+            self.power_regen_rate = rate
+        else:
+            self.power_regen_rate += (rate - self.power_regen_rate) * 0.2
 
-    def _execute_rotation(self, state: dict):
+    def _execute_rotation(self, state: GameState):
         """Execute the rotation based on current state"""
-        if not self.rotation:
+        if not self.program:
             return
 
-        # Check GCD
-        if self.gcd_remaining > 0:
-            current_time = time.time()
-            self.gcd_remaining = max(0, self.gcd_remaining - (current_time - self.last_gcd_time))
-            self.last_gcd_time = current_time
-            return
+        now = self.clock()
+        spell, reject = self._decide(state, now)
+        flags = FLAG_GCD_ACTIVE if self.cooldowns.gcd_ready_at > now else 0
+
+        counts = self.counters.shard()
+        decisions = counts[self.COUNT_DECISIONS] = counts[self.COUNT_DECISIONS] + 1
+
+        stats = self.condition_stats
+        if stats is not None and not decisions % stats.sample_every and spell is not SELF_HEAL:
+            # Sampled before the cast changes the cooldowns the scan saw
+            if stats.program is not self.program:
+                # Rebuilt or reloaded since the last sample
+                stats.reset(self.program)
+            if stats.sample(state, now, bool(flags), self.cooldowns.ready_at):
+                self.program = stats.program
+
+        if spell is not None and self._cast_spell(spell):
+            flags |= FLAG_PRESSED
+            counts[self.COUNT_CASTS + spell.spell_id] += 1
+
+        trace = self.trace
+        if trace.enabled:
+            trace.record(now, state, NO_SPELL if spell is None else spell.spell_id, reject, flags)
+
+    def _decide(self, state: GameState, now: float):
+        """
+        Pick the spell to cast
+        Returns (spell or None, REJECT_* bits of every reason a spell was passed over)
+        """
+        cooldowns = self.cooldowns
+        if state.spells:
+            cooldowns.sync(state.spells, now)
+
+        # Check GCD - only off-GCD spells may be used while it runs
+        gcd_active = cooldowns.gcd_ready_at > now
+        if gcd_active and not self._has_off_gcd:
+            return None, REJECT_GCD
 
         # Check health for self-preservation
-        health_percent = state.get("healthPercent", 100)
-        if health_percent < 20:
+        if not gcd_active and state.health_percent < 20:
             # Use healthstone or self-heal
-            self.key_simulator.press_key('7', 0.05)
-            return
-
-        # Execute each spell in priority
-        for spell in self.rotation:
-            if self._should_cast_spell(spell, state):
-                self._cast_spell(spell)
-                return
-
-    def _should_cast_spell(self, spell: dict, state: dict) -> bool:
-        """Check if a spell should be cast based on conditions"""
-        spell_name = spell.get("name")
-        key = spell.get("key")
-        conditions = spell.get("conditions", {})
-
-        # Check power requirement
-        power = state.get("power", 0)
-        power_cost = conditions.get("power", 0)
-        if power < power_cost:
-            return False
-
-        # Check target health
-        if "target_health_above" in conditions:
-            if state.get("targetHealthPercent", 0) < conditions["target_health_above"]:
-                return False
-
-        if "target_health_below" in conditions:
-            if state.get("targetHealthPercent", 100) > conditions["target_health_below"]:
-                return False
-
-        return True
-
-    def _cast_spell(self, spell: dict):
-        """Cast a spell using configured keybind"""
-        spell_name = spell.get("name")
-
-        # Look up the key from our keybinds config
-        key = self.keybinds.get(spell_name)
+            return SELF_HEAL, 0
+
+        # Execute each spell in priority, skipping spells that aren't ready
+        # before evaluating any of their conditions
+        ready_at = cooldowns.ready_at
+        cache = self.decision_cache
+        if cache is not None:
+            if cache.program is not self.program:
+                cache.reset(self.program)
+            return cache.decide(state, now, gcd_active, ready_at)
+
+        reject = 0
+        for spell in self.program:
+            if gcd_active and not spell.off_gcd:
+                reject |= REJECT_GCD
+                continue
+            if ready_at[spell.spell_id] > now:
+                reject |= REJECT_COOLDOWN
+                continue
+            failed = spell.check(state)
+            if failed:
+                reject |= failed
+                continue
+            return spell, reject
+        return None, reject
+
+    def _should_cast_spell(self, spell: CompiledSpell, state: GameState) -> bool:
+        """Check if a spell should be cast based on its compiled conditions"""
+        return not spell.check(state)
+
+    def _cast_spell(self, spell: CompiledSpell) -> bool:
+        """Cast a spell using its resolved keybind, returns whether a key was sent"""
+        key = spell.key
         if not key:
-            # Fallback to spell key if not in keybinds
-            key = spell.get("key")
-
-        if not key:
-            return
+            return False
 
         # Check if it's a modifier key combo
-        modifier = spell.get("modifier")
-        if modifier:
-            self.key_simulator.press_key_with_modifier(modifier, key)
+        if spell.modifier:
+            self.key_simulator.press_key_with_modifier(spell.modifier, key)
         else:
             self.key_simulator.press_key(key)
 
-        # Set GCD
-        gcd = spell.get("gcd", 1.5)
-        self.gcd_remaining = gcd
-        self.last_gcd_time = time.time()
+        # Start GCD and spell cooldown
+        now = self.clock()
+        self.cooldowns.record_cast(spell.spell_id, now, spell.cooldown, spell.gcd)
+        self.last_action_time = now
+        return True
@@ -0,0 +1,316 @@
+"""
+Rotation Loader
+Loads declarative rotation files (TOML or JSON), validates them and caches
+the parsed and compiled results keyed by file mtime and content hash
+"""
+import hashlib
+import json
+import os
+import sys
+import tomllib
+from typing import Dict, List, Optional, Tuple
+
+from core.conditions import ConditionError, parse_conditions
+
+ROTATION_EXTENSIONS = (".toml", ".json")
+
+DOCUMENT_FIELDS = {"class", "title", "spells"}
+SPELL_FIELDS = {"name", "key", "modifier", "gcd", "cooldown", "off_gcd", "conditions", "when"}
+NUMERIC_CONDITIONS = {"power", "target_health_above", "target_health_below"}
+AURA_CONDITIONS = {"has_buff", "has_not_buff", "has_debuff", "has_not_debuff"}
+KNOWN_CONDITIONS = NUMERIC_CONDITIONS | AURA_CONDITIONS
+
+
+class RotationIssue:
+    """A problem found while validating a rotation"""
+
+    def __init__(self, severity: str, message: str, index: Optional[int] = None):
+        self.severity = severity  # "error" or "warning"
+        self.message = message
+        self.index = index  # priority index of the spell entry, if any
+
+    def __str__(self):
+        where = f"#{self.index + 1} " if self.index is not None else ""
+        return f"[{self.severity}] {where}{self.message}"
+
+
+class RotationError(ValueError):
+    """Raised when a rotation file fails to parse or validate"""
+
+    def __init__(self, path: str, issues: List[RotationIssue]):
+        self.path = path
+        self.issues = issues
+        details = "\n".join(f"  {issue}" for issue in issues)
+        super().__init__(f"Invalid rotation {path}:\n{details}")
+
+
+def _reject_duplicate_keys(pairs):
+    """json object_pairs_hook that records duplicate keys instead of overwriting"""
+    result = {}
+    duplicates = []
+    for key, value in pairs:
+        if key in result:
+            duplicates.append(key)
+        result[key] = value
+    if duplicates:
+        result["__duplicate_keys__"] = duplicates
+    return result
+
+
+def parse_rotation(data: bytes, path: str) -> Tuple[dict, List[RotationIssue]]:
+    """Parse rotation file contents, reporting syntax errors and duplicate keys"""
+    issues = []
+    try:
+        if path.endswith(".json"):
+            document = json.loads(data.decode("utf-8"), object_pairs_hook=_reject_duplicate_keys)
+        else:
+            # tomllib already refuses duplicate keys
+            document = tomllib.loads(data.decode("utf-8"))
+    except (ValueError, UnicodeDecodeError) as e:
+        message = str(e)
+        if "Duplicate" in message or "overwrite" in message:
+            message = f"duplicate key: {message}"
+        issues.append(RotationIssue("error", message))
+        return {}, issues
+    return document, issues
+
+
+def _aura_names(value) -> List[str]:
+    return [value] if isinstance(value, str) else list(value)
+
+
+def _when_sources(spell: dict) -> set:
+    """The folded top-level conjuncts of a spell's 'when' expression"""
+    if not spell.get("when"):
+        return set()
+    return {condition.source for condition in parse_conditions(spell["when"])}
+
+
+def _implies(later_spell: dict, earlier_spell: dict) -> bool:
+    """Whether every state passing later's conditions also passes earlier's"""
+    # Expressions are only compared conjunct by conjunct
+    if not _when_sources(earlier_spell) <= _when_sources(later_spell):
+        return False
+    later = later_spell.get("conditions", {})
+    earlier = earlier_spell.get("conditions", {})
+    for condition, value in earlier.items():
+        if condition not in later:
+            return False
+        other = later[condition]
+        if condition in ("power", "target_health_above"):
+            if other < value:
+                return False
+        elif condition == "target_health_below":
+            if other > value:
+                return False
+        elif not set(_aura_names(value)) <= set(_aura_names(other)):
+            return False
+    return True
+
+
+def validate_rotation(document: dict, class_name: Optional[str] = None) -> List[RotationIssue]:
+    """
+    Validate a parsed rotation document
+    Flags duplicate keys, unknown fields and conditions, bad values and
+    priorities that can never be reached
+    Args:
+        document: Parsed rotation file
+        class_name: Class the file is loaded for, checked against its 'class'
+    """
+    issues = []
+    for key in document.pop("__duplicate_keys__", []):
+        issues.append(RotationIssue("error", f"duplicate key '{key}'"))
+    for field in document:
+        if field not in DOCUMENT_FIELDS:
+            issues.append(RotationIssue("error", f"unknown field '{field}'"))
+    for field in ("class", "title"):
+        if field in document and (not isinstance(document[field], str) or not document[field]):
+            issues.append(RotationIssue("error", f"'{field}' must be a non-empty string"))
+    if class_name is not None and isinstance(document.get("class"), str) \
+            and document["class"] != class_name:
+        issues.append(RotationIssue(
+            "error", f"'class' is '{document['class']}' but the file is loaded for '{class_name}'"))
+
+    spells = document.get("spells")
+    if not isinstance(spells, list) or not spells:
+        return issues + [RotationIssue("error", "rotation has no [[spells]] entries")]
+
+    for index, spell in enumerate(spells):
+        if not isinstance(spell, dict):
+            issues.append(RotationIssue("error", "spell entry is not a table", index))
+            continue
+
+        for key in spell.pop("__duplicate_keys__", []):
+            issues.append(RotationIssue("error", f"duplicate key '{key}'", index))
+        if not isinstance(spell.get("name"), str) or not spell["name"]:
+            issues.append(RotationIssue("error", "spell has no name", index))
+        for field in spell:
+            if field not in SPELL_FIELDS:
+                issues.append(RotationIssue("error", f"unknown field '{field}'", index))
+        for field in ("gcd", "cooldown"):
+            if field in spell and (not isinstance(spell[field], (int, float)) or spell[field] < 0):
+                issues.append(RotationIssue("error", f"'{field}' must be a non-negative number", index))
+
+        when = spell.get("when")
+        if when is not None:
+            if not isinstance(when, str):
+                issues.append(RotationIssue("error", "'when' must be an expression string", index))
+            else:
+                try:
+                    parsed = parse_conditions(when)
+                except ConditionError as e:
+                    issues.append(RotationIssue("error", f"'when': {e}", index))
+                else:
+                    if any(condition.source == "False" for condition in parsed):
+                        issues.append(RotationIssue("warning", "'when' is always false", index))
+
+        conditions = spell.get("conditions", {})
+        if not isinstance(conditions, dict):
+            issues.append(RotationIssue("error", "'conditions' must be a table", index))
+            continue
+        for key in conditions.pop("__duplicate_keys__", []):
+            issues.append(RotationIssue("error", f"duplicate condition '{key}'", index))
+        for condition, value in conditions.items():
+            if condition not in KNOWN_CONDITIONS:
+                issues.append(RotationIssue("error", f"unknown condition '{condition}'", index))
+            elif condition in NUMERIC_CONDITIONS and not isinstance(value, (int, float)):
+                issues.append(RotationIssue("error", f"'{condition}' must be a number", index))
+            elif condition in AURA_CONDITIONS and not (
+                    isinstance(value, str) or
+                    (isinstance(value, list) and all(isinstance(v, str) for v in value))):
+                issues.append(RotationIssue("error", f"'{condition}' must be a name or list of names", index))
+
+    if any(issue.severity == "error" for issue in issues):
+        return issues
+
+    # Unreachable priorities
+    for index, spell in enumerate(spells):
+        for earlier_index in range(index):
+            earlier = spells[earlier_index]
+            earlier_conditions = earlier.get("conditions", {}) or earlier.get("when")
+            blocks_gcd = earlier.get("off_gcd", False) or not spell.get("off_gcd", False)
+            if (not earlier_conditions and not earlier.get("cooldown", 0)
+                    and earlier.get("key") and blocks_gcd):
+                issues.append(RotationIssue(
+                    "warning",
+                    f"unreachable: '{earlier['name']}' (#{earlier_index + 1}) has no conditions "
+                    f"or cooldown and is always cast first", index))
+                break
+            if earlier["name"] == spell["name"] and _implies(spell, earlier):
+                issues.append(RotationIssue(
+                    "warning",
+                    f"unreachable: shadowed by '{earlier['name']}' (#{earlier_index + 1})", index))
+                break
+
+    return issues
+
+
+class _CacheEntry:
+    __slots__ = ("mtime", "size", "digest", "rotation", "issues")
+
+    def __init__(self, mtime, size, digest, rotation, issues):
+        self.mtime = mtime
+        self.size = size
+        self.digest = digest
+        self.rotation = rotation
+        self.issues = issues
+
+
+class RotationLoader:
+    """
+    Loads <class>.toml / <class>.json rotations from a directory
+    Parsed rotations are cached by (mtime, size) and by content hash, and
+    compiled programs by (content hash, keybinds), so repeated loads of an
+    unchanged file are a dict lookup plus a stat.
+    The returned rotation lists are shared and must not be modified.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._cache: Dict[str, _CacheEntry] = {}
+        self._compiled = {}
+        self.hits = 0
+        self.misses = 0
+
+    def path_for(self, class_name: str) -> str:
+        for extension in ROTATION_EXTENSIONS:
+            path = os.path.join(self.directory, class_name + extension)
+            if os.path.exists(path):
+                return path
+        raise FileNotFoundError(f"No rotation file for {class_name} in {self.directory}")
+
+    def load_file(self, path: str, class_name: Optional[str] = None) -> List[dict]:
+        """Load, validate and cache one rotation file, optionally checking its 'class'"""
+        stat = os.stat(path)
+        entry = self._cache.get(path)
+        if entry is not None and entry.mtime == stat.st_mtime_ns and entry.size == stat.st_size:
+            self.hits += 1
+            return entry.rotation
+
+        with open(path, "rb") as f:
+            data = f.read()
+        digest = hashlib.sha1(data).hexdigest()
+        if entry is not None and entry.digest == digest:
+            # Touched but unchanged
+            entry.mtime = stat.st_mtime_ns
+            entry.size = stat.st_size
+            self.hits += 1
+            return entry.rotation
+
+        self.misses += 1
+        document, issues = parse_rotation(data, path)
+        if not issues:
+            issues = validate_rotation(document, class_name)
+        errors = [issue for issue in issues if issue.severity == "error"]
+        if errors:
+            raise RotationError(path, errors)
+        for issue in issues:
+            print(f"{os.path.basename(path)}: {issue}")
+
+        rotation = document["spells"]
+        self._cache[path] = _CacheEntry(stat.st_mtime_ns, stat.st_size, digest, rotation, issues)
+        return rotation
+
+    def load(self, class_name: str) -> List[dict]:
+        return self.load_file(self.path_for(class_name), class_name)
+
+    def load_compiled(self, class_name: str, keybind_ids: Dict[int, str]):
+        """Load a rotation and compile it, reusing the compiled program if cached"""
+        from core.rotation_program import compile_rotation
+
+        path = self.path_for(class_name)
+        rotation = self.load_file(path, class_name)
+        key = (path, self._cache[path].digest, tuple(keybind_ids.items()))
+        program = self._compiled.get(key)
+        if program is None:
+            if len(self._compiled) >= 64:
+                # Keybind edits create new keys; don't grow without bound
+                self._compiled.clear()
+            program = compile_rotation(rotation, keybind_ids)
+            self._compiled[key] = program
+        return program
+
+    def issues(self, class_name: str) -> List[RotationIssue]:
+        """Warnings reported when the class's rotation was last loaded"""
+        entry = self._cache.get(self.path_for(class_name))
+        return entry.issues if entry else []
+
+
+def main():
+    """Validate rotation files: python -m core.rotation_loader FILE..."""
+    status = 0
+    for path in sys.argv[1:]:
+        with open(path, "rb") as f:
+            document, issues = parse_rotation(f.read(), path)
+        if not issues:
+            issues = validate_rotation(document)
+        if any(issue.severity == "error" for issue in issues):
+            status = 1
+        print(f"{path}: {'OK' if not issues else ''}")
+        for issue in issues:
+            print(f"  {issue}")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
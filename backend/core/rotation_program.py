@@ -0,0 +1,159 @@
+"""
+Rotation Program
+Compiles rotation configs into a flat list of precompiled spells
+"""
+import ast
+from typing import Dict, List, Optional, Tuple
+
+from core.conditions import Condition, compile_predicate, parse_conditions
+from core.spell_registry import REGISTRY
+
+# Why a spell was passed over, as bits of the decision trace's reject mask
+REJECT_GCD = 1 << 0
+REJECT_COOLDOWN = 1 << 1
+REJECT_POWER = 1 << 2
+REJECT_TARGET_HEALTH = 1 << 3
+REJECT_BUFF = 1 << 4
+REJECT_DEBUFF = 1 << 5
+# A condition expression over other state (health, in_combat)
+REJECT_CONDITION = 1 << 6
+
+REJECT_NAMES = {
+    REJECT_GCD: "gcd",
+    REJECT_COOLDOWN: "cooldown",
+    REJECT_POWER: "power",
+    REJECT_TARGET_HEALTH: "target_health",
+    REJECT_BUFF: "buff",
+    REJECT_DEBUFF: "debuff",
+    REJECT_CONDITION: "condition",
+}
+
+
+class CompiledSpell:
+    """A rotation entry with its conditions compiled to one function"""
+    __slots__ = ("spell_id", "name", "key", "modifier", "gcd", "cooldown", "off_gcd",
+                 "power_cost", "conditions", "check")
+
+    def __init__(self, spell_id: int, name: str, key: Optional[str], modifier: Optional[str],
+                 gcd: float, cooldown: float, off_gcd: bool, power_cost: int,
+                 conditions: Tuple[Condition, ...] = ()):
+        self.spell_id = spell_id
+        self.name = name  # display only
+        self.key = key
+        self.modifier = modifier
+        self.gcd = gcd
+        self.cooldown = cooldown
+        self.off_gcd = off_gcd  # usable while the GCD is running
+        self.power_cost = power_cost
+        self.conditions = conditions
+        # check(state) -> 0 if castable, else the REJECT_* bits of the first failing condition
+        self.check = compile_predicate(conditions, REGISTRY, name)
+
+    def __repr__(self):
+        return f"CompiledSpell({self.name!r}, key={self.key!r})"
+
+
+# GameState attribute -> reject bit of the conditions reading it
+FIELD_REJECT = {
+    "power": REJECT_POWER,
+    "max_power": REJECT_POWER,
+    "target_health_percent": REJECT_TARGET_HEALTH,
+    "buffs": REJECT_BUFF,
+    "debuffs": REJECT_DEBUFF,
+}
+
+# Aura condition name -> expression
+AURA_CONDITIONS = {
+    "has_buff": "buff({!r})",
+    "has_not_buff": "not buff({!r})",
+    "has_debuff": "debuff({!r})",
+    "has_not_debuff": "not debuff({!r})",
+}
+
+
+def _reject_bits(condition: Condition) -> int:
+    bits = 0
+    for field in condition.fields:
+        bits |= FIELD_REJECT.get(field, REJECT_CONDITION)
+    return bits or REJECT_CONDITION
+
+
+def condition_expressions(conditions: dict) -> List[str]:
+    """Express a conditions dict in the condition language, one expression per check"""
+    expressions = []
+
+    power_cost = conditions.get("power", 0)
+    if power_cost > 0:
+        expressions.append(f"power >= {power_cost}")
+
+    if "target_health_above" in conditions:
+        expressions.append(f"target.hp >= {conditions['target_health_above']}")
+
+    if "target_health_below" in conditions:
+        expressions.append(f"target.hp <= {conditions['target_health_below']}")
+
+    # Aura conditions take a name or a list of names
+    for condition, template in AURA_CONDITIONS.items():
+        auras = conditions.get(condition)
+        if isinstance(auras, str):
+            auras = [auras]
+        for aura in auras or ():
+            expressions.append(template.format(aura))
+
+    return expressions
+
+
+def spell_conditions(spell: dict) -> Tuple[Condition, ...]:
+    """
+    Parse a rotation entry's conditions table and 'when' expression
+    Raises ConditionError if the expression is invalid.
+    """
+    conditions = []
+    for expression in condition_expressions(spell.get("conditions", {})):
+        conditions.extend(parse_conditions(expression))
+    if spell.get("when"):
+        conditions.extend(parse_conditions(spell["when"]))
+    for condition in conditions:
+        condition.reject = _reject_bits(condition)
+    return tuple(conditions)
+
+
+def spell_power_cost(spell: dict, conditions: Tuple[Condition, ...]) -> int:
+    """The power a spell needs: its 'power' condition, or a 'power >= N' in its expression"""
+    cost = spell.get("conditions", {}).get("power", 0)
+    for condition in conditions:
+        expr = condition.expr
+        if (isinstance(expr, ast.Compare) and len(expr.ops) == 1
+                and isinstance(expr.ops[0], ast.GtE)
+                and isinstance(expr.left, ast.Name) and expr.left.id == "power"
+                and isinstance(expr.comparators[0], ast.Constant)):
+            cost = max(cost, expr.comparators[0].value)
+    return cost
+
+
+def compile_rotation(rotation: List[dict], keybinds: Dict[int, str]) -> Tuple[CompiledSpell, ...]:
+    """
+    Compile a rotation into a program
+    Args:
+        rotation: Rotation list from config.rotations.get_rotation
+        keybinds: Spell ID -> key overrides
+    """
+    program = []
+    for spell in rotation:
+        name = spell.get("name")
+        spell_id = REGISTRY.intern(name)
+        # Keybinds take precedence over the key in the rotation config
+        key = keybinds.get(spell_id) or spell.get("key")
+        conditions = spell_conditions(spell)
+        program.append(CompiledSpell(
+            spell_id=spell_id,
+            name=name,
+            key=key,
+            modifier=spell.get("modifier"),
+            gcd=spell.get("gcd", 1.5),
+            cooldown=spell.get("cooldown", 0),
+            off_gcd=spell.get("off_gcd", False),
+            power_cost=spell_power_cost(spell, conditions),
+            conditions=conditions,
+        ))
+    return tuple(program)
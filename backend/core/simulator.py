@@ -0,0 +1,357 @@
+"""
+Combat Simulator
+Drives RotationEngine offline with a virtual clock, a scripted game state
+and a recording key sink, so encounters run faster than real time
+"""
+import argparse
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+from core.auras import MockAuraSource, effects_from_rotation
+from core.game_state import GameState
+from core.profiler import STAGE_LABELS, create_engine_profiler
+from core.rotation_engine import RotationEngine
+
+
+class VirtualClock:
+    """Manually advanced clock, used in place of time.time()"""
+
+    def __init__(self, start: float = 0.0):
+        self.now = start
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+class ScriptedStateSource:
+    """
+    Scripted game state standing in for MemoryReader
+    Power regenerates, the target loses health over time and is replaced
+    when it dies, and combat is active between combat_start and combat_end
+    """
+
+    def __init__(self, clock: VirtualClock, max_power: int = 100,
+                 power_regen: float = 10.0, start_power: float = 100.0,
+                 target_decay: float = 1.0, combat_start: float = 0.0,
+                 combat_end: Optional[float] = None, health_percent: int = 100):
+        self.clock = clock
+        self.max_power = max_power
+        self.power_regen = power_regen  # power per second
+        self.target_decay = target_decay  # target health percent per second
+        self.combat_start = combat_start
+        self.combat_end = combat_end
+        self.health_percent = health_percent
+
+        self.power = float(start_power)
+        self.target_health = 100.0
+        self.targets_killed = 0
+        self.power_wasted = 0.0
+        self.last_update = clock()
+        # Auras applied by casts, set up by CombatSimulator from the rotation
+        self.auras = None
+        self.state = GameState()
+        self.state.health_percent = health_percent
+
+    def in_combat(self) -> bool:
+        now = self.clock()
+        if now < self.combat_start:
+            return False
+        return self.combat_end is None or now < self.combat_end
+
+    def _advance(self):
+        """Apply regen and target decay up to the current virtual time"""
+        now = self.clock()
+        elapsed = now - self.last_update
+        if elapsed <= 0:
+            return
+        self.last_update = now
+
+        power = self.power + self.power_regen * elapsed
+        if power > self.max_power:
+            self.power_wasted += power - self.max_power
+            power = self.max_power
+        self.power = power
+
+        if self.in_combat():
+            self.target_health -= self.target_decay * elapsed
+            if self.target_health <= 0:
+                # Next target
+                self.targets_killed += 1
+                self.target_health = 100.0
+                if self.auras:
+                    self.auras.clear_debuffs()
+
+    def spend(self, amount: float) -> bool:
+        """Spend power for a cast, returns False if there isn't enough"""
+        self._advance()
+        if self.power < amount:
+            return False
+        self.power -= amount
+        return True
+
+    def get_game_state(self) -> GameState:
+        self._advance()
+        in_combat = self.in_combat()
+        state = self.state
+        state.health_percent = self.health_percent
+        state.power = int(self.power)
+        state.max_power = self.max_power
+        state.in_combat = in_combat
+        state.target_name = "训练假人" if in_combat else ""
+        state.target_health_percent = int(self.target_health) if in_combat else 100
+        if self.auras:
+            self.auras.fill(state, self.clock())
+        return state
+
+    def close(self):
+        pass
+
+
+class RecordingKeySink:
+    """Records key presses instead of sending them (KeySimulator interface)"""
+
+    def __init__(self, clock, on_press=None):
+        self.clock = clock
+        self.on_press = on_press
+        self.presses = []  # (time, key, modifier)
+
+    def press_key(self, key: str, duration: float = 0.05):
+        self.presses.append((self.clock(), key, None))
+        if self.on_press:
+            self.on_press(key, None)
+
+    def press_key_with_modifier(self, modifier: str, key: str, duration: float = 0.05):
+        self.presses.append((self.clock(), key, modifier))
+        if self.on_press:
+            self.on_press(key, modifier)
+
+
+class NullKeySink:
+    """Key simulator that discards every press"""
+
+    def press_key(self, key: str, duration: float = 0.05):
+        pass
+
+    def press_key_with_modifier(self, modifier: str, key: str, duration: float = 0.05):
+        pass
+
+
+class SimulatedEngine(RotationEngine):
+    """RotationEngine that reports the spell behind every key it sends"""
+
+    def __init__(self, memory_reader, key_simulator, clock, on_cast):
+        super().__init__(memory_reader, key_simulator, clock=clock)
+        self.on_cast = on_cast
+
+    def _cast_spell(self, spell) -> bool:
+        if not super()._cast_spell(spell):
+            return False
+        self.on_cast(spell)
+        return True
+
+
+class SimulationResult:
+    """Summary of a simulated encounter"""
+
+    def __init__(self, sim_time: float, wall_time: float, ticks: int,
+                 casts: Counter, power_spent: float, power_wasted: float,
+                 targets_killed: int, failed_casts: int = 0, decisions: int = 0):
+        self.sim_time = sim_time
+        self.wall_time = wall_time
+        self.ticks = ticks
+        # Ticks that reached the rotation (not rate limited or out of combat)
+        self.decisions = decisions
+        self.casts = casts
+        self.power_spent = power_spent
+        self.power_wasted = power_wasted
+        self.targets_killed = targets_killed
+        self.failed_casts = failed_casts  # pressed without enough power for the spell's cost
+
+    @property
+    def total_casts(self) -> int:
+        return sum(self.casts.values())
+
+    @property
+    def ticks_per_second(self) -> float:
+        """Engine ticks run per wall-clock second"""
+        if self.wall_time <= 0:
+            return 0.0
+        return self.ticks / self.wall_time
+
+    @property
+    def decisions_per_second(self) -> float:
+        """Rotation decisions made per wall-clock second"""
+        if self.wall_time <= 0:
+            return 0.0
+        return self.decisions / self.wall_time
+
+    @property
+    def speedup(self) -> float:
+        """How much faster than real time the encounter ran"""
+        if self.wall_time <= 0:
+            return 0.0
+        return self.sim_time / self.wall_time
+
+    def summary(self) -> str:
+        lines = [
+            f"模拟时长: {self.sim_time:.1f}s (实际 {self.wall_time * 1000:.1f}ms, {self.speedup:.0f}x)",
+            f"决策: {self.ticks} ticks, {self.ticks_per_second:,.0f}/s, "
+            f"{self.decisions} 次决策 {self.decisions_per_second:,.0f}/s",
+            f"施法: {self.total_casts}, 消耗能量 {self.power_spent:.0f}, 溢出能量 {self.power_wasted:.0f}",
+        ]
+        if self.failed_casts:
+            lines.append(f"能量不足的施法: {self.failed_casts}")
+        for name, count in self.casts.most_common():
+            lines.append(f"  {name}: {count}")
+        return "\n".join(lines)
+
+
+class CombatSimulator:
+    """
+    Runs a RotationEngine against a ScriptedStateSource on a virtual clock
+    A cast spends the spell's power cost, which is its power condition unless
+    costs gives it explicitly (when tuning the condition as a pooling
+    threshold). Casting without enough power fails and has no effect.
+    """
+
+    def __init__(self, class_name: str, keybinds: Optional[Dict[str, str]] = None,
+                 rotation: Optional[List[dict]] = None, tick: float = 0.1,
+                 action_cooldown: float = 0.1, gcd: Optional[float] = None,
+                 aura_duration: float = 15.0, costs: Optional[Dict[str, float]] = None,
+                 **state_options):
+        self.clock = VirtualClock()
+        self.tick = tick
+        self.state = ScriptedStateSource(self.clock, **state_options)
+        self.sink = RecordingKeySink(self.clock)
+
+        self.engine = SimulatedEngine(self.state, self.sink, self.clock, self._on_cast)
+        self.engine.action_cooldown = action_cooldown
+        self.engine.set_class(class_name)
+        if rotation is not None:
+            self.engine.set_rotation(rotation)
+        if gcd is not None:
+            # Override every spell that triggers the GCD
+            self.engine.set_rotation([
+                dict(spell, gcd=gcd) if spell.get("gcd", 1.5) > 0 else spell
+                for spell in self.engine.rotation
+            ])
+        self.engine.set_keybinds(keybinds or {})
+        self.engine.set_options(combat_protect=True)
+
+        # Spells refreshing their own (de)buff apply it for aura_duration
+        self.state.auras = MockAuraSource(effects_from_rotation(self.engine.rotation, aura_duration))
+
+        self.costs = costs or {}
+        self.casts = Counter()
+        self.power_spent = 0.0
+        self.failed_casts = 0
+
+    def _on_cast(self, spell):
+        # Credited to the spell the engine chose; keys can be shared (and 治疗石 isn't in the program)
+        cost = self.costs.get(spell.name, spell.power_cost)
+        if not self.state.spend(cost):
+            self.failed_casts += 1
+            return
+        self.power_spent += cost
+        self.casts[spell.name] += 1
+        self.state.auras.on_cast(spell.spell_id, self.clock())
+
+    def run(self, duration: float = 300.0, event_driven: bool = False,
+            min_interval: float = 0.005) -> SimulationResult:
+        """
+        Run the encounter
+        Args:
+            duration: Simulated seconds
+            event_driven: Advance to the engine's predicted next action instead
+                of a fixed tick (tick becomes the polling ceiling)
+            min_interval: Smallest step in event driven mode
+        """
+        engine = self.engine
+        clock = self.clock
+        tick = self.tick
+        source = self.state
+        start = clock()
+        end = start + duration
+        ticks = 0
+        decisions = engine.counters.collect()[engine.COUNT_DECISIONS]
+
+        engine.start()
+        started = time.perf_counter()
+        if event_driven:
+            while clock() < end:
+                state = source.get_game_state()
+                engine.update(state)
+                delay = engine.time_until_next_action(state, ceiling=tick)
+                clock.advance(max(min_interval, delay))
+                ticks += 1
+        else:
+            ticks = int(round(duration / tick))
+            for index in range(1, ticks + 1):
+                engine.update()
+                # Multiplied rather than summed, so float error doesn't accumulate
+                clock.now = start + index * tick
+        wall_time = time.perf_counter() - started
+        engine.stop()
+        decisions = engine.counters.collect()[engine.COUNT_DECISIONS] - decisions
+
+        return SimulationResult(
+            sim_time=duration,
+            wall_time=wall_time,
+            ticks=ticks,
+            casts=self.casts,
+            power_spent=self.power_spent,
+            power_wasted=self.state.power_wasted,
+            targets_killed=self.state.targets_killed,
+            failed_casts=self.failed_casts,
+            decisions=decisions,
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline rotation simulator")
+    parser.add_argument("--class", dest="class_name", default="death_knight")
+    parser.add_argument("--duration", type=float, default=300.0)
+    parser.add_argument("--tick", type=float, default=0.1)
+    parser.add_argument("--action-cooldown", type=float, default=0.1)
+    parser.add_argument("--gcd", type=float, default=None)
+    parser.add_argument("--power-regen", type=float, default=10.0)
+    parser.add_argument("--target-decay", type=float, default=1.0)
+    parser.add_argument("--aura-duration", type=float, default=15.0)
+    parser.add_argument("--event-driven", action="store_true",
+                        help="Wake at predicted action times instead of every tick")
+    parser.add_argument("--trace", metavar="PATH",
+                        help="Dump the engine's decision trace here (read with python -m core.trace)")
+    parser.add_argument("--profile", action="store_true", help="Print per-stage latency histograms")
+    parser.add_argument("--conditions", action="store_true",
+                        help="Print sampled per-condition rejection rates and timings")
+    args = parser.parse_args()
+
+    simulator = CombatSimulator(
+        args.class_name,
+        tick=args.tick,
+        action_cooldown=args.action_cooldown,
+        gcd=args.gcd,
+        power_regen=args.power_regen,
+        target_decay=args.target_decay,
+        aura_duration=args.aura_duration,
+    )
+    profiler = create_engine_profiler(simulator.state, simulator.engine)
+    if args.profile:
+        profiler.enable()
+    result = simulator.run(args.duration, event_driven=args.event_driven)
+    print(result.summary())
+    if args.profile:
+        print(profiler.format(STAGE_LABELS))
+    if args.conditions:
+        print(simulator.engine.condition_stats.format())
+    if args.trace:
+        count = simulator.engine.dump_trace(args.trace)
+        print(f"决策记录: {count} 条 -> {args.trace}")
+
+
+if __name__ == "__main__":
+    main()
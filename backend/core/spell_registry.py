@@ -0,0 +1,73 @@
+"""
+Spell Registry
+Interns spell and aura names into small integer IDs
+The engine, keybinds, cooldowns and aura tables work on IDs; names are only
+used for display. Spells and auras share one ID space since many spells
+apply an aura of the same name.
+"""
+from typing import Dict, List, Optional
+
+REGISTRY_CAPACITY = 256
+
+
+class SpellRegistry:
+    def __init__(self, capacity: int = REGISTRY_CAPACITY):
+        self.capacity = capacity
+        self.ids: Dict[str, int] = {}
+        self.names: List[str] = []
+
+    def intern(self, name: str) -> int:
+        """Get the ID for a name, assigning the next free one if it's new"""
+        spell_id = self.ids.get(name)
+        if spell_id is None:
+            if len(self.names) >= self.capacity:
+                raise ValueError(f"Spell registry full ({self.capacity}), cannot add {name}")
+            spell_id = len(self.names)
+            self.ids[name] = spell_id
+            self.names.append(name)
+        return spell_id
+
+    def lookup(self, name: str) -> Optional[int]:
+        """Get the ID for a name without interning it"""
+        return self.ids.get(name)
+
+    def name(self, spell_id: int) -> str:
+        return self.names[spell_id]
+
+    def __len__(self):
+        return len(self.names)
+
+
+def _condition_names(spell: dict):
+    conditions = spell.get("conditions", {})
+    for key in ("has_buff", "has_not_buff", "has_debuff", "has_not_debuff"):
+        names = conditions.get(key)
+        if isinstance(names, str):
+            yield names
+        elif names:
+            yield from names
+    if spell.get("when"):
+        from core.conditions import condition_auras, parse_conditions
+        for _, name in condition_auras(parse_conditions(spell["when"])):
+            yield name
+
+
+def load_default_names(registry: "SpellRegistry"):
+    """Intern every spell and aura named by the built-in rotations and keybinds"""
+    from config.keybinds import DEFAULT_KEYBINDS
+    from config.rotations import CLASSES, get_rotation
+
+    for class_name in CLASSES:
+        for spell in get_rotation(class_name):
+            registry.intern(spell["name"])
+            for aura in _condition_names(spell):
+                registry.intern(aura)
+
+    for keybinds in DEFAULT_KEYBINDS.values():
+        for name in keybinds:
+            registry.intern(name)
+
+
+# Shared registry, filled at import with the built-in names
+REGISTRY = SpellRegistry()
+load_default_names(REGISTRY)
@@ -0,0 +1,269 @@
+"""
+Parameter Sweep
+Tunes rotation condition values by simulating every variant of a grid (or a
+seeded random sample of it) across all cores and ranking the results
+
+Spell power costs stay fixed at the base rotation's values, so a sweep of a
+power condition tunes it as a pooling threshold. Variants are scored by
+power spent (a damage proxy) or by power wasted to overcapping.
+
+Usage (from backend/):
+    python -m core.sweep --class druid
+    python -m core.sweep --class warrior --mode random --samples 500 --seed 7
+    python -m core.sweep --class hunter --param 2.power=20,30,40 --output hunter.csv
+"""
+import argparse
+import contextlib
+import csv
+import io
+import itertools
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from core.rotation_program import spell_conditions, spell_power_cost
+from core.simulator import CombatSimulator
+
+# A power condition below the spell's cost only produces failed casts
+POWER_FACTORS = (1.0, 1.25, 1.5, 2.0)
+HEALTH_STEPS = (-20, -10, 0, 10, 20)
+OBJECTIVES = ("damage", "waste")
+
+
+class Parameter:
+    """One tunable value: a condition of the spell at a priority index, or the global GCD"""
+    __slots__ = ("index", "field", "values", "label")
+
+    def __init__(self, index: Optional[int], field: str, values: List[float], label: str):
+        self.index = index  # priority index, None for the global GCD
+        self.field = field
+        self.values = values
+        self.label = label
+
+    @property
+    def name(self) -> str:
+        return self.field if self.index is None else f"{self.index + 1}.{self.field}"
+
+    @property
+    def display(self) -> str:
+        return self.field if self.index is None else f"{self.label}.{self.field}"
+
+
+def rotation_parameters(rotation: List[dict], max_power: int = 100) -> List[Parameter]:
+    """Derive a default grid around every numeric condition of a rotation"""
+    parameters = []
+    for index, spell in enumerate(rotation):
+        conditions = spell.get("conditions", {})
+        label = spell["name"]
+        power = conditions.get("power", 0)
+        if power > 0:
+            values = sorted({min(max_power, max(1, round(power * f))) for f in POWER_FACTORS})
+            parameters.append(Parameter(index, "power", values, label))
+        for field in ("target_health_above", "target_health_below"):
+            if field in conditions:
+                base = conditions[field]
+                values = sorted({min(100, max(0, base + step)) for step in HEALTH_STEPS})
+                parameters.append(Parameter(index, field, values, label))
+    return parameters
+
+
+def parse_param(text: str, rotation: List[dict]) -> Parameter:
+    """Parse an explicit grid like '3.power=30,40,50' or 'gcd=1.0,1.5'"""
+    name, _, values = text.partition("=")
+    if not values:
+        raise ValueError(f"expected NAME=V1,V2,... got {text!r}")
+    values = [float(v) if "." in v else int(v) for v in values.split(",")]
+    if name == "gcd":
+        return Parameter(None, "gcd", values, "")
+    position, _, field = name.partition(".")
+    index = int(position) - 1
+    if not 0 <= index < len(rotation):
+        raise ValueError(f"no spell at priority {position}")
+    if field not in ("power", "target_health_above", "target_health_below"):
+        raise ValueError(f"cannot sweep {field!r}")
+    return Parameter(index, field, values, rotation[index]["name"])
+
+
+def apply_values(rotation: List[dict], parameters: List[Parameter], values: tuple) -> List[dict]:
+    """Copy of the rotation with the parameters set to values"""
+    variant = list(rotation)
+    for parameter, value in zip(parameters, values):
+        if parameter.index is None:
+            # Global GCD, for every spell that triggers it
+            variant = [dict(spell, gcd=value) if spell.get("gcd", 1.5) > 0 else spell
+                       for spell in variant]
+            continue
+        spell = dict(variant[parameter.index])
+        conditions = dict(spell.get("conditions", {}))
+        if value is None:
+            # Baseline of a condition the spell doesn't have
+            conditions.pop(parameter.field, None)
+        else:
+            conditions[parameter.field] = value
+        spell["conditions"] = conditions
+        variant[parameter.index] = spell
+    return variant
+
+
+def _base_value(rotation: List[dict], parameter: Parameter):
+    if parameter.index is None:
+        return rotation[0].get("gcd", 1.5)
+    return rotation[parameter.index].get("conditions", {}).get(parameter.field)
+
+
+def _simulate(job: Tuple) -> Dict[str, float]:
+    """Worker: run one variant (module level so it pickles to the pool)"""
+    class_name, rotation, costs, duration, options = job
+    # The engine logs start/stop on every run
+    with contextlib.redirect_stdout(io.StringIO()):
+        simulator = CombatSimulator(class_name, rotation=rotation, costs=costs, **options)
+        result = simulator.run(duration)
+    return {
+        "power_spent": result.power_spent,
+        "power_wasted": result.power_wasted,
+        "casts": result.total_casts,
+        "failed_casts": result.failed_casts,
+    }
+
+
+def score(metrics: Dict[str, float], objective: str) -> float:
+    """Higher is better"""
+    if objective == "waste":
+        return -metrics["power_wasted"]
+    return metrics["power_spent"]
+
+
+def _rank_key(row: dict):
+    # Ties go to fewer failed casts (lost GCDs), then less overcapping
+    return -row["score"], row["failed_casts"], row["power_wasted"]
+
+
+def variant_values(parameters: List[Parameter], mode: str, samples: int, seed: int,
+                   max_variants: int) -> List[tuple]:
+    """The value combinations to simulate, in a deterministic order"""
+    size = 1
+    for parameter in parameters:
+        size *= len(parameter.values)
+
+    if mode == "auto":
+        mode = "grid" if size <= max_variants else "random"
+    if mode == "grid":
+        if size > max_variants:
+            raise ValueError(f"grid has {size} variants (limit {max_variants}); "
+                             f"use --mode random or fewer --param grids")
+        return list(itertools.product(*(parameter.values for parameter in parameters)))
+
+    rng = random.Random(seed)
+    if size <= samples:
+        return list(itertools.product(*(parameter.values for parameter in parameters)))
+    seen = set()
+    while len(seen) < samples:
+        seen.add(tuple(rng.choice(parameter.values) for parameter in parameters))
+    return sorted(seen)
+
+
+def sweep(class_name: str, parameters: Optional[List[Parameter]] = None, mode: str = "auto",
+          samples: int = 200, seed: int = 0, duration: float = 300.0,
+          objective: str = "damage", workers: Optional[int] = None,
+          max_variants: int = 5000, **sim_options) -> List[dict]:
+    """
+    Simulate the variants of a class rotation and rank them
+    Returns one row per variant, best first, with the parameter values,
+    metrics and score; the unmodified rotation is included as "baseline".
+    """
+    from config.rotations import get_rotation
+    rotation = get_rotation(class_name)
+    if parameters is None:
+        parameters = rotation_parameters(rotation)
+    costs = {spell["name"]: spell_power_cost(spell, spell_conditions(spell)) for spell in rotation}
+
+    combos = variant_values(parameters, mode, samples, seed, max_variants)
+    base = tuple(_base_value(rotation, parameter) for parameter in parameters)
+    if base not in combos:
+        combos.insert(0, base)
+    jobs = [(class_name, apply_values(rotation, parameters, values), costs, duration, sim_options)
+            for values in combos]
+
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(_simulate, jobs, chunksize=max(1, len(jobs) // (4 * workers))))
+
+    rows = []
+    for values, metrics in zip(combos, results):
+        row = {parameter.name: value for parameter, value in zip(parameters, values)}
+        row.update(metrics)
+        row["score"] = score(metrics, objective)
+        row["baseline"] = values == base
+        rows.append(row)
+    # Stable sort keeps the deterministic combo order among ties
+    rows.sort(key=_rank_key)
+    return rows
+
+
+def format_table(rows: List[dict], parameters: List[Parameter], base: tuple, limit: int) -> str:
+    lines = [f"{'rank':>4} {'score':>9} {'spent':>7} {'wasted':>7} {'casts':>6} {'failed':>6}  changes"]
+    for rank, row in enumerate(rows[:limit], 1):
+        changes = [f"{parameter.display}={row[parameter.name]}"
+                   for parameter, value in zip(parameters, base) if row[parameter.name] != value]
+        note = "baseline" if row["baseline"] else ", ".join(changes)
+        lines.append(f"{rank:>4} {row['score']:>9.0f} {row['power_spent']:>7.0f} "
+                     f"{row['power_wasted']:>7.0f} {row['casts']:>6} {row['failed_casts']:>6}  {note}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep rotation thresholds with the simulator")
+    parser.add_argument("--class", dest="class_name", default="death_knight")
+    parser.add_argument("--mode", choices=("auto", "grid", "random"), default="auto",
+                        help="auto: full grid unless it exceeds --max-variants")
+    parser.add_argument("--samples", type=int, default=200, help="Variants to draw in random mode")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--param", action="append", default=[], metavar="NAME=V1,V2",
+                        help="Explicit grid, e.g. 3.power=30,40,50 or gcd=1.0,1.5 (repeatable); "
+                             "replaces the default grid")
+    parser.add_argument("--objective", choices=OBJECTIVES, default="damage")
+    parser.add_argument("--duration", type=float, default=300.0)
+    parser.add_argument("--power-regen", type=float, default=10.0)
+    parser.add_argument("--target-decay", type=float, default=1.0)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--max-variants", type=int, default=5000)
+    parser.add_argument("--top", type=int, default=20, help="Rows to print")
+    parser.add_argument("--output", help="Write the full ranked table as CSV")
+    args = parser.parse_args()
+
+    from config.rotations import get_rotation
+    rotation = get_rotation(args.class_name)
+    try:
+        parameters = ([parse_param(text, rotation) for text in args.param]
+                      or rotation_parameters(rotation))
+        started = time.perf_counter()
+        rows = sweep(args.class_name, parameters, args.mode, args.samples, args.seed,
+                     args.duration, args.objective, args.workers, args.max_variants,
+                     power_regen=args.power_regen, target_decay=args.target_decay)
+    except ValueError as e:
+        print(f"error: {e}")
+        return 2
+    elapsed = time.perf_counter() - started
+
+    base = tuple(_base_value(rotation, parameter) for parameter in parameters)
+    print(f"{args.class_name}: {len(rows)} variants of {len(parameters)} parameters "
+          f"in {elapsed:.1f}s, objective {args.objective}")
+    print(format_table(rows, parameters, base, args.top))
+
+    if args.output:
+        fields = ["rank"] + [parameter.name for parameter in parameters] + [
+            "score", "power_spent", "power_wasted", "casts", "failed_casts", "baseline"]
+        with open(args.output, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=fields)
+            writer.writeheader()
+            for rank, row in enumerate(rows, 1):
+                writer.writerow(dict(row, rank=rank))
+        print(f"wrote {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
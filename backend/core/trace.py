@@ -0,0 +1,303 @@
+"""
+Decision Trace
+Always-on recorder of the rotation's per-tick decisions, kept in a
+preallocated ring buffer of fixed-width binary records
+
+Auras change a few times per GCD, not every tick, so their bitsets are kept
+out of the per-tick record: a second ring holds one entry per change, and
+readers merge them back into full rows (iter_records).
+
+Dump the buffer with RotationEngine.dump_trace and read it back with:
+    python -m core.trace trace.bin [--casts] [--tail N]
+"""
+import argparse
+import json
+import struct
+import sys
+import time
+from typing import Iterator, List, Optional, Tuple
+
+from core.rotation_program import REJECT_NAMES
+from core.spell_registry import REGISTRY, SpellRegistry
+
+# timestamp, power, max power, health %, target health %, flags, chosen spell
+# ID (-1 for none), reject mask
+RECORD = struct.Struct("<d i i h h B h H")
+RECORD_SIZE = RECORD.size
+# Index of the first record with these auras, buff and debuff bitsets (one
+# bit per aura ID). The index counts every record written in memory and from
+# the first record in a dump.
+AURA_CHANGE = struct.Struct("<Q 32s 32s")
+AURA_MASK_BYTES = 32
+NO_AURAS = bytes(AURA_MASK_BYTES)
+
+# magic, version, record size, record count, aura change count, metadata length
+# The metadata is JSON holding the registry's name table and the engine settings
+HEADER = struct.Struct("<4s H H I I I")
+MAGIC = b"WRTR"
+VERSION = 2
+
+FLAG_IN_COMBAT = 1 << 0
+FLAG_GCD_ACTIVE = 1 << 1
+FLAG_PRESSED = 1 << 2  # a key was actually sent for the chosen spell
+
+NO_SPELL = -1
+
+# Ranges of the record's power and health fields
+INT32 = (-(1 << 31), (1 << 31) - 1)
+INT16 = (-(1 << 15), (1 << 15) - 1)
+
+
+def _clamp(value, bounds: Tuple[int, int]) -> int:
+    low, high = bounds
+    return min(max(int(value), low), high)
+
+
+class TraceRecorder:
+    """
+    Ring buffer of decision records
+    Recording is one struct.pack_into into a bytearray allocated up front; once
+    full the oldest records are overwritten. Aura bitsets are kept out of the
+    records: a second ring of the same capacity holds them only when they
+    differ from the previous record's, so it always reaches back to the auras
+    of the oldest record kept. Only the aura IDs that fit the bitsets (the
+    registry's capacity) are traced.
+    """
+
+    def __init__(self, capacity: int = 32768, registry: SpellRegistry = REGISTRY):
+        self.capacity = capacity
+        self.registry = registry
+        self.buffer = bytearray(RECORD_SIZE * capacity)
+        self.count = 0  # records written since the last clear, including overwritten ones
+        self.aura_count = 0
+        self.enabled = True
+        self._pack = RECORD.pack_into
+        self._offset = 0
+        self._end = len(self.buffer)
+        # Aura change ring: the record index each change starts at and the
+        # AuraTable masks as they were (ints are immutable, so no copy); encoded
+        # into AURA_CHANGE entries only by snapshot()
+        self._aura_at = [0] * capacity
+        self._aura_buffs = [0] * capacity
+        self._aura_debuffs = [0] * capacity
+        self._aura_slot = 0
+        self._buff_mask = 0
+        self._debuff_mask = 0
+
+    def record(self, now: float, state, spell_id: int, reject: int, flags: int):
+        """Append one decision"""
+        buffs = state.buffs.mask
+        debuffs = state.debuffs.mask
+        if buffs != self._buff_mask or debuffs != self._debuff_mask:
+            self._record_auras(buffs, debuffs)
+        if state.in_combat:
+            flags |= FLAG_IN_COMBAT
+
+        offset = self._offset
+        try:
+            self._pack(self.buffer, offset, now, state.power, state.max_power,
+                       state.health_percent, state.target_health_percent, flags, spell_id, reject)
+        except struct.error:
+            # A garbage memory read out of the record's range; traced clamped
+            self._pack(self.buffer, offset, now, _clamp(state.power, INT32), _clamp(state.max_power, INT32),
+                       _clamp(state.health_percent, INT16), _clamp(state.target_health_percent, INT16),
+                       flags, spell_id, reject)
+        offset += RECORD_SIZE
+        self._offset = offset if offset != self._end else 0
+        self.count += 1
+
+    def _record_auras(self, buffs: int, debuffs: int):
+        self._buff_mask = buffs
+        self._debuff_mask = debuffs
+        slot = self._aura_slot
+        self._aura_at[slot] = self.count
+        self._aura_buffs[slot] = buffs
+        self._aura_debuffs[slot] = debuffs
+        slot += 1
+        self._aura_slot = slot if slot != self.capacity else 0
+        self.aura_count += 1
+
+    def clear(self):
+        self.count = 0
+        self.aura_count = 0
+        self._offset = 0
+        self._aura_slot = 0
+        self._buff_mask = 0
+        self._debuff_mask = 0
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def snapshot(self) -> Tuple[bytes, bytes]:
+        """
+        The buffered records in chronological order, and the AURA_CHANGE
+        entries covering them, indexed from the first of those records
+        """
+        # One copy of each ring so a concurrent record() can't reorder them under us
+        count = self.count
+        aura_count = self.aura_count
+        data = _ring(bytes(self.buffer), count, self.capacity, RECORD_SIZE)
+        changes = list(zip(self._aura_at, self._aura_buffs, self._aura_debuffs))
+        if aura_count > self.capacity:
+            split = aura_count % self.capacity
+            changes = changes[split:] + changes[:split]
+        else:
+            changes = changes[:aura_count]
+
+        first = count - len(data) // RECORD_SIZE
+        # The last change at or before the first record gives it its auras
+        initial = (0, 0)
+        auras = bytearray()
+        for index, buffs, debuffs in changes:
+            if index >= count:
+                # Recorded after count was read
+                break
+            if index <= first:
+                initial = (buffs, debuffs)
+                continue
+            if not auras:
+                auras += _pack_auras(0, *initial)
+            auras += _pack_auras(index - first, buffs, debuffs)
+        if not auras and initial != (0, 0):
+            auras += _pack_auras(0, *initial)
+        return data, bytes(auras)
+
+    def dump(self, path: str, meta: Optional[dict] = None) -> int:
+        """
+        Write the buffered records to a file, returns the number written
+        Args:
+            path: Output file
+            meta: Extra JSON-serializable metadata (class, engine settings)
+        """
+        data, auras = self.snapshot()
+        # Records lost to wrap-around; a replay then starts without cooldown history
+        dropped = max(0, self.count - self.capacity)
+        header = dict(meta or {}, names=self.registry.names, dropped=dropped)
+        header = json.dumps(header, ensure_ascii=False).encode("utf-8")
+        count = len(data) // RECORD_SIZE
+        with open(path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, RECORD_SIZE, count,
+                                len(auras) // AURA_CHANGE.size, len(header)))
+            f.write(header)
+            f.write(data)
+            f.write(auras)
+        return count
+
+
+def _pack_auras(index: int, buffs: int, debuffs: int) -> bytes:
+    return AURA_CHANGE.pack(index, buffs.to_bytes(AURA_MASK_BYTES, "little"),
+                            debuffs.to_bytes(AURA_MASK_BYTES, "little"))
+
+
+def _ring(data: bytes, count: int, capacity: int, size: int) -> bytes:
+    """A ring buffer's records in the order they were written"""
+    if count <= capacity:
+        return data[:count * size]
+    split = (count % capacity) * size
+    return data[split:] + data[:split]
+
+
+def parse_trace(data) -> Tuple[dict, memoryview, memoryview]:
+    """
+    Split a trace dump into its metadata, record bytes and aura change bytes
+    data may be any buffer (bytes, mmap); the records are a view into it
+    """
+    view = memoryview(data)
+    magic, version, record_size, count, aura_count, meta_length = HEADER.unpack_from(view)
+    if magic != MAGIC:
+        raise ValueError("not a trace dump")
+    if version != VERSION or record_size != RECORD_SIZE:
+        raise ValueError(f"unsupported trace version {version} (record size {record_size})")
+    start = HEADER.size + meta_length
+    meta = json.loads(bytes(view[HEADER.size:start]).decode("utf-8"))
+    records_end = start + count * RECORD_SIZE
+    return (meta, view[start:records_end],
+            view[records_end:records_end + aura_count * AURA_CHANGE.size])
+
+
+def load_trace(path: str) -> Tuple[dict, memoryview, memoryview]:
+    with open(path, "rb") as f:
+        return parse_trace(f.read())
+
+
+def iter_records(records, auras=b"") -> Iterator[tuple]:
+    """
+    Unpack record bytes into rows: the RECORD fields followed by the buff
+    and debuff bitsets in effect for that record
+    """
+    changes = AURA_CHANGE.iter_unpack(auras)
+    change = next(changes, None)
+    buffs = debuffs = NO_AURAS
+    for index, record in enumerate(RECORD.iter_unpack(records)):
+        while change is not None and change[0] <= index:
+            _, buffs, debuffs = change
+            change = next(changes, None)
+        yield record + (buffs, debuffs)
+
+
+def mask_ids(mask: bytes) -> List[int]:
+    """Aura IDs set in a bitset field"""
+    value = int.from_bytes(mask, "little")
+    ids = []
+    while value:
+        low = value & -value
+        ids.append(low.bit_length() - 1)
+        value ^= low
+    return ids
+
+
+def reject_names(reject: int) -> List[str]:
+    return [name for bit, name in REJECT_NAMES.items() if reject & bit]
+
+
+def format_record(record: tuple, names: List[str], start: float) -> str:
+    (timestamp, power, max_power, health, target_health, flags,
+     spell_id, reject, buffs, debuffs) = record
+
+    markers = ("C" if flags & FLAG_IN_COMBAT else "-") + ("G" if flags & FLAG_GCD_ACTIVE else "-")
+    if spell_id == NO_SPELL:
+        action = "-"
+    else:
+        action = names[spell_id] + ("" if flags & FLAG_PRESSED else " (no key)")
+
+    line = (f"{timestamp - start:9.3f}s [{markers}] hp {health:3d}% tgt {target_health:3d}% "
+            f"power {power}/{max_power}  -> {action}")
+    if reject:
+        line += f"  skipped: {','.join(reject_names(reject))}"
+    buff_names = [names[aura_id] for aura_id in mask_ids(buffs)]
+    debuff_names = [names[aura_id] for aura_id in mask_ids(debuffs)]
+    if buff_names:
+        line += f"  buffs: {','.join(buff_names)}"
+    if debuff_names:
+        line += f"  debuffs: {','.join(debuff_names)}"
+    return line
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print a decision trace dump as a timeline")
+    parser.add_argument("path")
+    parser.add_argument("--casts", action="store_true", help="only ticks that chose a spell")
+    parser.add_argument("--tail", type=int, default=0, help="only the last N records")
+    args = parser.parse_args()
+
+    meta, records, auras = load_trace(args.path)
+    names = meta["names"]
+    rows = list(iter_records(records, auras))
+    if args.casts:
+        rows = [row for row in rows if row[6] != NO_SPELL]
+    if args.tail:
+        rows = rows[-args.tail:]
+    if not rows:
+        print("empty trace")
+        return 0
+
+    start = rows[0][0]
+    print(f"{meta.get('class', '?')}: {len(rows)} records from "
+          f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(start))}")
+    for row in rows:
+        print(format_record(row, names, start))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,14 +1,116 @@
 """
 WoW Assist - Main Entry Point
+
+    python main.py                                # Qt UI
+    python main.py --headless --class druid       # no UI, Ctrl+C to stop
 """
+import argparse
 import sys
-from ui.main_window import MainWindow
+import time
+
+
+def run_ui(args) -> int:
+    # PyQt6 is only imported on this path
+    from ui.main_window import MainWindow
+
+    app = MainWindow(runtime=args.runtime)
+    return app.run()
+
+
+def run_headless(args) -> int:
+    """Run the reader + rotation engine loop without Qt"""
+    from config.keybinds import load_keybinds
+    from core.engine_worker import EngineWorker
+    from core.hot_reload import ConfigWatcher
+    from core.key_dispatcher import create_key_backend, create_key_dispatcher
+    from core.key_simulator import KeySimulator
+    from core.memory_reader import create_memory_reader
+    from core.metrics import MetricsServer
+    from core.rotation_engine import RotationEngine
+
+    memory_reader = create_memory_reader()
+    if args.runtime == "async":
+        from core.async_runtime import AsyncEngineRuntime, AsyncKeyActor
+        backend = create_key_backend()
+        dispatcher = None
+        actor = AsyncKeyActor(backend) if backend is not None else None
+        key_simulator = KeySimulator(dispatcher=actor)
+    else:
+        dispatcher = create_key_dispatcher()
+        key_simulator = KeySimulator(dispatcher=dispatcher)
+    engine = RotationEngine(memory_reader, key_simulator)
+    engine.set_class(args.class_name)
+    engine.set_keybinds(load_keybinds(engine.current_class))
+    engine.set_options(combat_protect=not args.no_combat_protect)
+
+    if args.runtime == "async":
+        worker = AsyncEngineRuntime(memory_reader, engine, actor=actor, interval=args.interval,
+                                    event_driven=not args.fixed_rate)
+    else:
+        worker = EngineWorker(memory_reader, engine, interval=args.interval,
+                              event_driven=not args.fixed_rate)
+    watcher = ConfigWatcher(engine)
+    metrics = MetricsServer(engine, memory_reader, worker, port=args.metrics_port)
+
+    engine.start()
+    worker.start()
+    if not args.no_watch:
+        watcher.start()
+    if not args.no_metrics and metrics.start():
+        print(f"Metrics on http://{metrics.host}:{metrics.port}/metrics")
+
+    started = time.monotonic()
+    next_status = started + args.status if args.status else None
+    try:
+        while not args.duration or time.monotonic() - started < args.duration:
+            time.sleep(0.2)
+            if next_status is not None and time.monotonic() >= next_status:
+                next_status += args.status
+                state = memory_reader.state
+                print(f"ticks {worker.ticks} (dropped {worker.dropped_ticks}), "
+                      f"power {state.power}/{state.max_power}, "
+                      f"target {state.target_health_percent}%")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        engine.stop()
+        worker.stop()
+        watcher.stop()
+        metrics.stop()
+        if dispatcher is not None:
+            dispatcher.close()
+        memory_reader.close()
+
+    decisions = engine.counters.collect()[engine.COUNT_DECISIONS]
+    print(f"Ran {time.monotonic() - started:.1f}s: {worker.ticks} ticks "
+          f"({worker.dropped_ticks} dropped), {decisions} decisions")
+    return 0
 
 
 def main():
-    app = MainWindow()
-    sys.exit(app.run())
+    parser = argparse.ArgumentParser(description="WoW Assist")
+    parser.add_argument("--headless", action="store_true", help="Run without the Qt UI")
+    parser.add_argument("--class", dest="class_name", default="death_knight",
+                        help="Class to play in headless mode (e.g. druid or 德鲁伊)")
+    parser.add_argument("--interval", type=float, default=0.1, help="Tick interval / polling ceiling")
+    parser.add_argument("--runtime", choices=("thread", "async"), default="thread",
+                        help="Engine loop: a worker thread, or asyncio reader/decider/actor tasks")
+    parser.add_argument("--fixed-rate", action="store_true",
+                        help="Tick at a fixed interval instead of waking at predicted actions")
+    parser.add_argument("--no-combat-protect", action="store_true",
+                        help="Also cast out of combat")
+    parser.add_argument("--no-watch", action="store_true", help="Don't hot-reload rotation files")
+    parser.add_argument("--metrics-port", type=int, default=9108,
+                        help="Loopback port for /metrics (0 picks a free port)")
+    parser.add_argument("--no-metrics", action="store_true", help="Don't serve /metrics")
+    parser.add_argument("--duration", type=float, default=0, help="Stop after N seconds (0 runs until Ctrl+C)")
+    parser.add_argument("--status", type=float, default=0, help="Print a status line every N seconds")
+    args = parser.parse_args()
+
+    if args.headless:
+        return run_headless(args)
+    return run_ui(args)
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
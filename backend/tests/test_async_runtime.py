@@ -0,0 +1,129 @@
+"""Async runtime: latest-value slots, state hand-off to the decider and the key actor"""
+import asyncio
+import time
+
+from core.async_runtime import AsyncEngineRuntime, AsyncKeyActor, LatestSlot
+from core.game_state import GameState
+from core.key_dispatcher import RecordingKeyBackend
+
+KEY_1 = 0x31
+KEY_2 = 0x32
+
+
+class CountingReader:
+    """Refills one GameState on every read, like MemoryReader"""
+
+    def __init__(self):
+        self.state = GameState()
+        self.reads = 0
+
+    def get_game_state(self):
+        self.reads += 1
+        self.state.power = self.reads
+        self.state.max_power = self.reads
+        return self.state
+
+
+class RecordingEngine:
+    """Records the states it decides on and their power at the time"""
+
+    def __init__(self):
+        self.seen = []
+
+    def update(self, state):
+        self.seen.append((state, state.power))
+
+    def time_until_next_action(self, state, ceiling: float = 0.1) -> float:
+        return 0.0
+
+
+def _wait_for(predicate, timeout: float = 2.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.005)
+    return True
+
+
+def test_latest_slot_keeps_the_newest_value():
+    async def scenario():
+        slot = LatestSlot()
+        slot.put(1)
+        slot.put(2)
+        assert await slot.get() == 2
+        waiter = asyncio.create_task(slot.get())
+        await asyncio.sleep(0)
+        assert not waiter.done()
+        slot.put(3)
+        return await waiter, slot.replaced
+
+    assert asyncio.run(scenario()) == (3, 1)
+
+
+def test_decider_gets_a_copy_the_reader_does_not_change():
+    reader = CountingReader()
+    engine = RecordingEngine()
+    runtime = AsyncEngineRuntime(reader, engine, interval=0.002)
+    runtime.start()
+    try:
+        assert _wait_for(lambda: len(engine.seen) >= 10)
+    finally:
+        runtime.stop()
+
+    assert all(state is not reader.state for state, _ in engine.seen)
+    powers = [power for _, power in engine.seen]
+    assert powers == sorted(powers)
+    # The latest snapshot stays as decided while the reader refills its state
+    state, power = engine.seen[-1]
+    reader.get_game_state()
+    assert state.power == state.max_power == power
+
+
+def test_on_state_gets_every_read():
+    reader = CountingReader()
+    seen = []
+    runtime = AsyncEngineRuntime(reader, RecordingEngine(), interval=0.005,
+                                 on_state=lambda state: seen.append(state.power))
+    runtime.start()
+    try:
+        assert _wait_for(lambda: len(seen) >= 5)
+    finally:
+        runtime.stop()
+    assert seen == list(range(1, len(seen) + 1))
+    assert not runtime.is_alive
+
+
+def test_actor_drops_a_press_that_has_not_started():
+    async def scenario(backend):
+        actor = AsyncKeyActor(backend)
+        task = asyncio.create_task(actor.run())
+        await asyncio.sleep(0)
+        actor.schedule([(0, KEY_1, True), (0.03, KEY_1, False)])
+        await asyncio.sleep(0.01)
+        # The first press is running; the second is replaced by the third
+        actor.schedule([(0, KEY_2, True), (0, KEY_2, False)])
+        actor.schedule([(0, KEY_1, True), (0, KEY_1, False)])
+        await asyncio.sleep(0.08)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return actor.dropped_presses
+
+    backend = RecordingKeyBackend()
+    assert asyncio.run(scenario(backend)) == 1
+    assert [(vk_code, is_down) for _, vk_code, is_down in backend.events] == [
+        (KEY_1, True), (KEY_1, False), (KEY_1, True), (KEY_1, False)]
+
+
+def test_stopping_releases_held_keys():
+    backend = RecordingKeyBackend()
+    actor = AsyncKeyActor(backend)
+    reader = CountingReader()
+    runtime = AsyncEngineRuntime(reader, RecordingEngine(), actor=actor, interval=0.01)
+    runtime.start()
+    assert _wait_for(lambda: actor._loop is not None)
+    actor.schedule([(0, KEY_1, True), (10.0, KEY_1, False)])
+    assert _wait_for(lambda: backend.events)
+    runtime.stop()
+    assert [(vk_code, is_down) for _, vk_code, is_down in backend.events] == [
+        (KEY_1, True), (KEY_1, False)]
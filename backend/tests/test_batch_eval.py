@@ -0,0 +1,79 @@
+"""Property tests of the NumPy batch evaluator against the scalar engine"""
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from config.rotations import CLASSES  # noqa: E402
+from core.batch_eval import (BatchEvaluator, StateBatch, random_batch,  # noqa: E402
+                             verify_against_engine)
+from core.game_state import GameState  # noqa: E402
+from core.rotation_program import compile_rotation  # noqa: E402
+from core.spell_registry import REGISTRY  # noqa: E402
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+@pytest.mark.parametrize("class_name", sorted(CLASSES))
+def test_batch_choices_match_engine(class_name, seed):
+    assert verify_against_engine(class_name, rows=3000, seed=seed) == 0
+
+
+WHEN_ROTATION = [
+    {"name": "a", "when": "(power and 5) >= 5 and not debuff(割裂)"},
+    {"name": "b", "when": "(0 or 5) + power >= 60 or target.hp < 10"},
+    {"name": "c", "when": "power - (health or 1) > 0 and buff(猛虎) + debuff(割裂) >= 1"},
+    {"name": "d", "when": "30 < target.hp <= 2 * 35 and (power > 50 or 3) == 3"},
+    {"name": "e", "when": "not (max_power - power < 20) or health < 2 * 15"},
+]
+
+# Stack counts compared against thresholds, not just tested for presence
+STACK_ROTATION = [
+    {"name": "a", "when": "buff(猛虎) >= 3 and debuff(割裂) < 2"},
+    {"name": "b", "when": "buff(猛虎) * 10 + power >= 80"},
+    {"name": "c", "when": "debuff(割裂) == 2 or buff(猛虎) == 1"},
+    {"name": "d", "when": "debuff(割裂) >= 4"},
+]
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+def test_stack_comparisons_match_engine(seed):
+    assert verify_against_engine("druid", rows=3000, seed=seed, rotation=STACK_ROTATION) == 0
+
+
+def _row_state(batch: StateBatch, row: int, aura_ids) -> GameState:
+    state = GameState()
+    state.power = int(batch.power[row])
+    state.max_power = int(batch.max_power[row])
+    state.health_percent = int(batch.health_percent[row])
+    state.target_health_percent = int(batch.target_health_percent[row])
+    state.in_combat = bool(batch.in_combat[row])
+    for table, name in ((state.buffs, "buffs"), (state.debuffs, "debuffs")):
+        for aura_id in aura_ids:
+            stacks = batch.stacks[name].get(aura_id)
+            if stacks is not None:
+                table.set(aura_id, 0.0, int(stacks[row]))
+    return state
+
+
+@pytest.mark.parametrize("rotation", [WHEN_ROTATION, STACK_ROTATION])
+@pytest.mark.parametrize("seed", [0, 1])
+def test_condition_masks_match_compiled_checks(seed, rotation):
+    evaluator = BatchEvaluator(rotation)
+    program = compile_rotation(rotation, {})
+    batch = random_batch(rotation, rows=2000, seed=seed)
+    aura_ids = [REGISTRY.intern(name) for name in ("割裂", "猛虎")]
+    masks = [evaluator.condition_mask(index, batch) for index in range(len(program))]
+    for row in range(len(batch)):
+        state = _row_state(batch, row, aura_ids)
+        for index, spell in enumerate(program):
+            assert bool(masks[index][row]) == (spell.check(state) == 0), (spell.name, row)
+
+
+def test_from_states_keeps_stack_counts():
+    aura_id = REGISTRY.intern("猛虎")
+    states = [GameState() for _ in range(3)]
+    states[0].buffs.set(aura_id, 5.0, 3)
+    states[2].buffs.set(aura_id, 5.0, 1)
+    batch = StateBatch.from_states(states)
+    assert batch.stacks["buffs"][aura_id].tolist() == [3, 0, 1]
+    evaluator = BatchEvaluator([{"name": "a", "when": "buff(猛虎) >= 2"}])
+    assert evaluator.condition_mask(0, batch).tolist() == [True, False, False]
@@ -0,0 +1,36 @@
+"""Sampled condition stats and adaptive reordering"""
+import pytest
+
+from core.simulator import CombatSimulator
+
+
+@pytest.mark.parametrize("class_name", ["death_knight", "druid", "monk"])
+def test_reordering_never_changes_casts(class_name):
+    adaptive = CombatSimulator(class_name)
+    stats = adaptive.engine.condition_stats
+    stats.reorder_every = 4
+    reference = CombatSimulator(class_name)
+    reference.engine.condition_stats = None
+
+    result = adaptive.run(600.0)
+    assert result.casts == reference.run(600.0).casts
+    assert stats.samples > 0
+
+
+def test_samples_every_sample_every_decisions():
+    simulator = CombatSimulator("hunter")
+    stats = simulator.engine.condition_stats
+    result = simulator.run(300.0)
+    # Self heal decisions are counted but never sampled
+    assert stats.samples <= result.decisions // stats.sample_every
+    assert stats.samples >= result.decisions // stats.sample_every - 1
+
+
+def test_snapshot_rows_follow_the_current_order():
+    simulator = CombatSimulator("druid")
+    stats = simulator.engine.condition_stats
+    simulator.run(300.0)
+    rows = stats.snapshot()
+    assert len(rows) == sum(len(spell.conditions) for spell in stats.original)
+    assert all(0 <= row["reject_rate"] <= 1 for row in rows)
+    assert stats.format().splitlines()[0].split()[:2] == ["#", "spell"]
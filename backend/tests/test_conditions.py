@@ -0,0 +1,93 @@
+"""Condition language: folding, and/or semantics and compiled checks"""
+import pytest
+
+from core.conditions import ConditionError, compile_predicate, parse_conditions
+from core.game_state import GameState
+from core.spell_registry import REGISTRY
+
+
+def _compile(conditions):
+    # Reject bits are normally assigned by rotation_program; any nonzero value will do
+    for condition in conditions:
+        condition.reject = 1
+    return compile_predicate(conditions, REGISTRY, "test")
+
+
+def _check(text: str):
+    return _compile(parse_conditions(text))
+
+
+def _state(power=0, target_hp=100, health=100):
+    state = GameState()
+    state.power = power
+    state.max_power = 100
+    state.target_health_percent = target_hp
+    state.health_percent = health
+    state.in_combat = True
+    return state
+
+
+def _reference(text: str, state) -> bool:
+    """The expression evaluated directly by Python, without folding"""
+    class Target:
+        hp = state.target_health_percent
+    names = {"power": state.power, "max_power": state.max_power,
+             "health": state.health_percent, "in_combat": state.in_combat, "target": Target}
+    return bool(eval(text, {"__builtins__": {}}, names))
+
+
+@pytest.mark.parametrize("text, source", [
+    ("power >= 2 * 20 + 5", "power >= 45"),
+    ("power >= -(-40)", "power >= 40"),
+    ("target.hp > 100 - 2 * 35", "target.hp > 30"),
+    ("power >= (1 + 2) * (3 + 4) - -1", "power >= 22"),
+])
+def test_nested_constants_fold_and_compile(text, source):
+    conditions = parse_conditions(text)
+    assert [condition.source for condition in conditions] == [source]
+    check = _compile(conditions)
+    for power in range(0, 101, 5):
+        for target_hp in (0, 30, 31, 100):
+            state = _state(power, target_hp)
+            assert (check(state) == 0) == _reference(text, state)
+
+
+@pytest.mark.parametrize("text", [
+    "(power and 5) >= 5",
+    "(0 or 5) + power >= 10",
+    "(power or 7) < 5",
+    "(target.hp and power) > 10",
+    "power - (health or 1) > 0",
+    "(power > 50 or 3) == 3",
+    "not (power and 0)",
+    "power > 10 or target.hp < 20 and health > 50",
+])
+def test_and_or_keep_python_semantics(text):
+    check = _check(text)
+    for power in (0, 3, 5, 8, 11, 60):
+        for target_hp in (0, 10, 50):
+            for health in (0, 40, 100):
+                state = _state(power, target_hp, health)
+                assert (check(state) == 0) == _reference(text, state), (power, target_hp, health)
+
+
+def test_and_or_operands_reordered_only_in_boolean_position():
+    # Boolean position: the cheaper field test goes before the aura lookup
+    assert parse_conditions("buff(x) or power > 3")[0].source == "power > 3 or buff('x')"
+    # Value position: the operand order is the result, so it's kept
+    assert parse_conditions("(buff(x) or power) > 3")[0].source == "(buff('x') or power) > 3"
+
+
+def test_constant_conjuncts():
+    assert parse_conditions("True and power > 1")[0].source == "power > 1"
+    assert [condition.source for condition in parse_conditions("1 + 1 == 3")] == ["False"]
+    assert _check("1 + 1 == 3")(_state()) != 0
+    assert parse_conditions("2 * 3 == 6") == []
+
+
+@pytest.mark.parametrize("text", [
+    "power >=", "foo > 1", "target.mp > 1", "buff(a, b)", "power / 2 > 1", "'a' == 'a'",
+])
+def test_invalid_expressions_raise_condition_error(text):
+    with pytest.raises(ConditionError):
+        parse_conditions(text)
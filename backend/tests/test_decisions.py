@@ -0,0 +1,239 @@
+"""
+Differential test of the engine's decisions against a full evaluation
+The engine skips spells on GCD or cooldown before evaluating their conditions,
+stops at the first castable spell and reuses check results from its decision
+cache while no threshold the rotation tests has been crossed; the reference
+evaluates every condition's source text directly. Both must agree on the
+spell and on every reject bit, as recorded in the engine's decision trace.
+"""
+import random
+from array import array
+
+import pytest
+
+from config.rotations import CLASSES
+from core.conditions import parse_conditions
+from core.game_state import GameState
+from core.incremental import DecisionCache, dependency_key_source
+from core.rotation_engine import SELF_HEAL, RotationEngine
+from core.rotation_program import REJECT_COOLDOWN, REJECT_GCD
+from core.simulator import NullKeySink, VirtualClock
+from core.spell_registry import REGISTRY
+from core.trace import NO_SPELL, iter_records
+
+# Arithmetic, truthiness, chained comparisons and stack counts
+WHEN_ROTATION = [
+    {"name": "a", "when": "(power and 5) >= 5 and not debuff(割裂)"},
+    {"name": "b", "when": "(0 or 5) + power >= 60 or target.hp < 10"},
+    {"name": "c", "when": "power - (health or 1) > 0 and buff(猛虎) + debuff(割裂) >= 1"},
+    {"name": "d", "when": "30 < target.hp <= 2 * 35 and (power > 50 or 3) == 3"},
+    {"name": "e", "when": "not (max_power - power < 20) or health < 2 * 15"},
+    {"name": "f", "when": "buff(猛虎) >= 3 and debuff(割裂) < 2 and power != 40"},
+    {"name": "g", "when": "debuff(割裂) == 2 or buff(猛虎) and in_combat"},
+    {"name": "h", "when": "buff(猛虎) < 3 and buff(猛虎) or health > max_power"},
+]
+
+# Fields tested both for truth and against a threshold, and nothing else,
+# with an off-GCD spell so decisions during the GCD reach the scan
+TRUTH_ROTATION = [
+    {"name": "a", "when": "buff(猛虎) < 3 and buff(猛虎)"},
+    {"name": "b", "when": "power < 20 and power", "off_gcd": True, "gcd": 0},
+    {"name": "c", "when": "not debuff(割裂) or debuff(割裂) > 2"},
+]
+
+
+class _Target:
+    def __init__(self, state):
+        self.hp = state.target_health_percent
+
+
+def _holds(condition, state) -> bool:
+    names = {
+        "power": state.power,
+        "max_power": state.max_power,
+        "health": state.health_percent,
+        "in_combat": state.in_combat,
+        "target": _Target(state),
+        "buff": lambda name: state.buffs.stacks[REGISTRY.intern(name)],
+        "debuff": lambda name: state.debuffs.stacks[REGISTRY.intern(name)],
+    }
+    return bool(eval(condition.source, {"__builtins__": {}}, names))
+
+
+def _reference(program, state, now, gcd_ready_at, ready_at):
+    """(spell ID, reject bits) from evaluating every condition of every spell"""
+    gcd_active = gcd_ready_at > now
+    if gcd_active and not any(spell.off_gcd for spell in program):
+        return NO_SPELL, REJECT_GCD
+    if not gcd_active and state.health_percent < 20:
+        return SELF_HEAL.spell_id, 0
+
+    reject = 0
+    for spell in program:
+        failing = [condition.reject for condition in spell.conditions if not _holds(condition, state)]
+        if gcd_active and not spell.off_gcd:
+            reject |= REJECT_GCD
+        elif ready_at[spell.spell_id] > now:
+            reject |= REJECT_COOLDOWN
+        elif failing:
+            reject |= failing[0]
+        else:
+            return spell.spell_id, reject
+    return NO_SPELL, reject
+
+
+def _perturb(state, rng: random.Random, aura_ids):
+    """Change a few random fields, leaving the rest as they were"""
+    for _ in range(rng.randrange(1, 4)):
+        field = rng.randrange(7)
+        if field == 0:
+            # Mostly small steps, like power ticking between decisions
+            step = rng.randrange(-6, 7) if rng.random() < 0.7 else rng.randrange(-100, 101)
+            state.power = min(state.max_power, max(0, state.power + step))
+        elif field == 1:
+            state.max_power = rng.choice((100, 120))
+        elif field == 2:
+            state.health_percent = rng.randrange(1, 101)
+        elif field == 3:
+            state.in_combat = rng.random() < 0.9
+        elif field == 4:
+            state.target_health_percent = rng.randrange(0, 101)
+        elif aura_ids:
+            table = state.buffs if field == 5 else state.debuffs
+            aura_id = rng.choice(aura_ids)
+            if rng.random() < 0.4:
+                table.remove(aura_id)
+            else:
+                table.set(aura_id, rng.uniform(0, 15), rng.randrange(1, 6))
+
+
+def _engine(clock, class_name: str, rotation=None, adaptive: bool = False):
+    engine = RotationEngine(None, NullKeySink(), clock=clock)
+    engine.set_class(class_name)
+    if rotation is not None:
+        engine.set_rotation(rotation)
+    engine.set_keybinds({})
+    if adaptive:
+        # Sample and reorder often, so most of the walk runs reordered programs
+        engine.condition_stats.sample_every = 1
+        engine.condition_stats.reorder_every = 16
+    else:
+        engine.condition_stats = None
+    return engine
+
+
+def _walk(engines, ticks: int = 3000, seed: int = 0):
+    """
+    Run every engine's rotation over the same random walk of states and
+    cooldowns, returning the reference decision for the first one per tick
+    """
+    clock = engines[0].clock
+    rng = random.Random(seed)
+    program = engines[0].program
+    aura_ids = sorted({REGISTRY.intern(name) for spell in program
+                       for condition in spell.conditions for _, name in condition.auras})
+    spell_ids = sorted({spell.spell_id for spell in program})
+    state = GameState()
+    state.max_power = 100
+    state.in_combat = True
+    expected = []
+
+    for _ in range(ticks):
+        clock.advance(0.1)
+        now = clock()
+        _perturb(state, rng, aura_ids)
+        gcd_ready_at = now + 1.0 if rng.random() < 0.3 else 0.0
+        changes = [(spell_id, 0.0 if rng.random() < 0.7 else now + 10.0)
+                   for spell_id in spell_ids if rng.random() < 0.2]
+        for engine in engines:
+            cooldowns = engine.cooldowns
+            cooldowns.gcd_ready_at = gcd_ready_at
+            for spell_id, ready_at in changes:
+                cooldowns.ready_at[spell_id] = ready_at
+        # The program in use for this decision, reordered or not
+        first = engines[0]
+        expected.append(_reference(first.program, state, now, gcd_ready_at,
+                                   array("d", first.cooldowns.ready_at)))
+        for engine in engines:
+            engine._execute_rotation(state)
+    return expected
+
+
+def _decisions(engine):
+    return [(record[6], record[7]) for record in iter_records(*engine.trace.snapshot())]
+
+
+@pytest.mark.parametrize("class_name", sorted(CLASSES))
+def test_cached_decisions_match_full_evaluation(class_name):
+    clock = VirtualClock(1000.0)
+    cached, full = _engine(clock, class_name), _engine(clock, class_name)
+    full.decision_cache = None
+    expected = _walk([cached, full])
+    assert _decisions(cached) == expected
+    # Same spells, reject bits, casts and cooldowns, tick for tick
+    assert cached.trace.snapshot() == full.trace.snapshot()
+    # Most decisions reused an earlier key
+    assert cached.decision_cache.misses < len(expected) / 10
+
+
+@pytest.mark.parametrize("class_name", sorted(CLASSES))
+def test_reordered_conditions_match_full_evaluation(class_name):
+    # A reorder changes which failing condition a check reports; the cache must follow
+    engine = _engine(VirtualClock(1000.0), class_name, adaptive=True)
+    expected = _walk([engine])
+    assert _decisions(engine) == expected
+    assert engine.condition_stats.reorders > 0
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+@pytest.mark.parametrize("rotation", [WHEN_ROTATION, TRUTH_ROTATION], ids=["when", "truth"])
+def test_expressions_match_full_evaluation(rotation, seed):
+    clock = VirtualClock(1000.0)
+    cached, full = _engine(clock, "druid", rotation), _engine(clock, "druid", rotation)
+    full.decision_cache = None
+    expected = _walk([cached, full], seed=seed)
+    assert _decisions(cached) == expected
+    assert cached.trace.snapshot() == full.trace.snapshot()
+
+
+def _key_source(when: str) -> str:
+    return dependency_key_source(parse_conditions(when))
+
+
+def test_threshold_comparisons_key_on_their_position():
+    assert _key_source("power >= 30 and power < 50 and power > 10") == (
+        "key = (((v0 := state.power) > 10) + (v0 >= 30) + (v0 >= 50), )")
+    assert _key_source("power >= 10 and power >= 20 and power < 40") == (
+        "key = (bisect_right((10, 20, 40), state.power), )")
+    assert _key_source("target.hp <= 35") == "key = (state.target_health_percent > 35, )"
+
+
+def test_chained_and_swapped_comparisons_key_on_their_position():
+    assert _key_source("30 < target.hp <= 70") == (
+        "key = (((v0 := state.target_health_percent) > 30) + (v0 > 70), )")
+    assert _key_source("40 <= power") == "key = (state.power >= 40, )"
+
+
+def test_truthiness_and_arithmetic_keys():
+    assert _key_source("debuff(割裂)") == (
+        f"key = (not state.debuffs.stacks[{REGISTRY.intern('割裂')}], )")
+    # Compared against another field, the value itself is the key
+    assert _key_source("max_power - power < 20") == "key = (state.max_power, state.power, )"
+    assert _key_source("power > max_power") == "key = (state.max_power, state.power, )"
+
+
+def test_cache_starts_over_for_a_new_program():
+    engine = _engine(VirtualClock(1000.0), "druid")
+    cache = DecisionCache()
+    cache.reset(engine.program)
+    decide = cache.decide
+    state = GameState()
+    assert decide(state, 1000.0, False, engine.cooldowns.ready_at) == engine._decide(state, 1000.0)
+    assert len(cache) == 1
+
+    # Same conditions in the same spells: kept compiled, results cleared
+    cache.reset(tuple(engine.program))
+    assert cache.decide is decide and len(cache) == 0
+    engine.set_rotation(WHEN_ROTATION)
+    cache.reset(engine.program)
+    assert cache.decide is not decide
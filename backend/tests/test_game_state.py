@@ -0,0 +1,110 @@
+"""GameState copies and the worker -> UI snapshot hand-off"""
+import threading
+import tracemalloc
+
+from core.engine_worker import EngineWorker
+from core.game_state import GameState, SnapshotBuffer
+from core.spell_registry import REGISTRY
+
+
+def _state(power: int) -> GameState:
+    state = GameState()
+    state.power = power
+    state.health_percent = power % 100
+    state.in_combat = True
+    state.target_name = "训练假人"
+    state.buffs.set(REGISTRY.intern("猛虎"), 5.0, 2)
+    return state
+
+
+def test_copy_from_overwrites_every_field():
+    source = _state(40)
+    source.spells[7] = 1.5
+    target = _state(90)
+    target.debuffs.set(REGISTRY.intern("割裂"), 3.0)
+    target.spells[8] = 2.0
+    target.copy_from(source)
+    assert target.to_dict() == source.to_dict()
+    assert target.buffs.mask == source.buffs.mask
+    assert target.debuffs.mask == 0
+
+
+def test_take_returns_latest_once():
+    buffer = SnapshotBuffer()
+    assert buffer.take() is None
+    buffer.publish(_state(10))
+    buffer.publish(_state(20))
+    snapshot = buffer.take()
+    assert snapshot.power == 20
+    assert buffer.replaced == 1
+    assert buffer.take() is None
+
+
+def test_taken_snapshot_survives_later_publishes():
+    buffer = SnapshotBuffer()
+    live = _state(10)
+    buffer.publish(live)
+    snapshot = buffer.take()
+    for power in (20, 30, 40):
+        live.power = power
+        buffer.publish(live)
+    assert snapshot.power == 10
+    assert buffer.take().power == 40
+
+
+def test_publish_does_not_allocate():
+    buffer = SnapshotBuffer()
+    live = _state(10)
+    for _ in range(10):
+        buffer.publish(live)
+        buffer.take()
+    tracemalloc.start()
+    for power in range(1000):
+        live.power = power
+        buffer.publish(live)
+        if power % 3 == 0:
+            buffer.take()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # A GameState copy alone is a few KB
+    assert peak < 1024
+
+
+def test_snapshots_are_never_torn():
+    buffer = SnapshotBuffer()
+    done = threading.Event()
+    torn = []
+
+    def consume():
+        while not done.is_set():
+            snapshot = buffer.take()
+            if snapshot is not None and snapshot.health_percent != snapshot.power % 100:
+                torn.append(snapshot.power)
+
+    consumer = threading.Thread(target=consume)
+    consumer.start()
+    live = _state(0)
+    for power in range(20000):
+        live.power = power
+        live.health_percent = power % 100
+        buffer.publish(live)
+    done.set()
+    consumer.join()
+    assert torn == []
+
+
+def test_worker_publishes_the_live_state():
+    live = _state(10)
+    received = []
+
+    class Reader:
+        def get_game_state(self):
+            return live
+
+    class Engine:
+        def update(self, state):
+            pass
+
+    worker = EngineWorker(Reader(), Engine(), on_state=received.append)
+    worker.tick()
+    assert received == [live]
@@ -0,0 +1,119 @@
+"""Config watcher reloads, without watchdog: reload() is called directly"""
+import os
+
+from config.keybinds import DEFAULT_KEYBINDS
+from config.rotations import ROTATION_DIR, ROTATION_LOADER
+from core.hot_reload import ConfigWatcher
+from core.rotation_engine import RotationEngine
+from core.simulator import NullKeySink, VirtualClock
+
+
+def _engine():
+    engine = RotationEngine(None, NullKeySink(), clock=VirtualClock(1000.0))
+    engine.set_class("druid")
+    engine.set_keybinds(dict(DEFAULT_KEYBINDS["druid"]))
+    return engine
+
+
+def _reload(watcher):
+    assert watcher.reload()
+    watcher.rotation_engine._apply_pending_reload()
+
+
+def _key(engine, name):
+    return next(spell.key for spell in engine.program if spell.name == name)
+
+
+def test_override_applies_and_removal_restores_default(tmp_path):
+    path = tmp_path / "keybinds.toml"
+    engine = _engine()
+    watcher = ConfigWatcher(engine, keybinds_file=str(path))
+    assert _key(engine, "割裂") == "3"
+
+    path.write_text('[druid]\n"割裂" = "9"\n', encoding="utf-8")
+    _reload(watcher)
+    assert engine.keybinds["割裂"] == "9"
+    assert _key(engine, "割裂") == "9"
+
+    path.write_text("[druid]\n", encoding="utf-8")
+    _reload(watcher)
+    assert engine.keybinds["割裂"] == "3"
+    assert _key(engine, "割裂") == "3"
+
+    path.unlink()
+    _reload(watcher)
+    assert engine.keybinds == DEFAULT_KEYBINDS["druid"]
+
+
+def test_bad_keybinds_file_keeps_previous_program(tmp_path):
+    path = tmp_path / "keybinds.toml"
+    engine = _engine()
+    watcher = ConfigWatcher(engine, keybinds_file=str(path))
+    program = engine.program
+
+    path.write_text("[druid]\n\"割裂\" = 9\n", encoding="utf-8")
+    assert not watcher.reload()
+    assert watcher.failures == 1
+    assert engine._pending_reload is None
+    assert engine.program is program
+
+
+def test_ui_edits_survive_a_reload_and_the_dict_is_kept(tmp_path):
+    path = tmp_path / "keybinds.toml"
+    engine = _engine()
+    watcher = ConfigWatcher(engine, keybinds_file=str(path))
+    # MainWindow edits its current_class_keybinds and hands the same dict back
+    ui_keybinds = dict(DEFAULT_KEYBINDS["druid"])
+    engine.set_keybinds(ui_keybinds)
+    ui_keybinds["爪击"] = "8"
+    engine.set_keybinds(ui_keybinds)
+
+    path.write_text('[druid]\n"割裂" = "9"\n', encoding="utf-8")
+    _reload(watcher)
+    assert engine.keybinds is ui_keybinds
+    assert ui_keybinds["爪击"] == "8"
+    assert ui_keybinds["割裂"] == "9"
+    assert _key(engine, "爪击") == "8"
+    assert _key(engine, "割裂") == "9"
+
+    # A rotation-only reload leaves every binding alone
+    _reload(watcher)
+    assert ui_keybinds["爪击"] == "8"
+    assert ui_keybinds["割裂"] == "9"
+
+
+def test_keybinds_edited_before_the_reload_is_installed(tmp_path):
+    path = tmp_path / "keybinds.toml"
+    engine = _engine()
+    watcher = ConfigWatcher(engine, keybinds_file=str(path))
+    path.write_text('[druid]\n"割裂" = "9"\n', encoding="utf-8")
+    assert watcher.reload()
+    engine.keybinds["爪击"] = "8"
+    engine.set_keybinds(engine.keybinds)
+    engine._apply_pending_reload()
+    assert _key(engine, "爪击") == "8"
+    assert _key(engine, "割裂") == "9"
+
+
+def test_rotation_is_loaded_from_the_watched_directory(tmp_path):
+    with open(os.path.join(ROTATION_DIR, "druid.toml"), encoding="utf-8") as f:
+        text = f.read()
+    (tmp_path / "druid.toml").write_text(text.replace("power = 40 }", "power = 45 }"),
+                                         encoding="utf-8")
+    engine = _engine()
+    watcher = ConfigWatcher(engine, directory=str(tmp_path),
+                            keybinds_file=str(tmp_path / "keybinds.toml"))
+    assert watcher.loader is not ROTATION_LOADER
+    _reload(watcher)
+    assert next(spell.power_cost for spell in engine.program if spell.name == "爪击") == 45
+
+
+def test_pending_reload_is_taken_once():
+    engine = _engine()
+    program = engine.program
+    engine.queue_reload("druid", engine.rotation, {"爪击": "8"}, {}, program)
+    engine._apply_pending_reload()
+    assert engine._pending_reload is None
+    assert _key(engine, "爪击") == "8"
+    engine._apply_pending_reload()
+    assert _key(engine, "爪击") == "8"
@@ -0,0 +1,106 @@
+"""KeyDispatcher ordering, wait_idle and the key ups flushed on close"""
+import threading
+import time
+
+from core.key_dispatcher import KeyDispatcher, RecordingKeyBackend
+from core.key_simulator import MODIFIER_CODES, KeySimulator
+
+KEY_1 = 0x31
+KEY_2 = 0x32
+SHIFT = MODIFIER_CODES["shift"]
+
+
+class BlockingBackend(RecordingKeyBackend):
+    """Holds the scheduler thread inside key_down until released"""
+
+    def __init__(self):
+        super().__init__()
+        self.sending = threading.Event()
+        self.release = threading.Event()
+
+    def key_down(self, vk_code: int):
+        self.sending.set()
+        self.release.wait(2.0)
+        super().key_down(vk_code)
+
+
+def _keys(backend):
+    return [(vk_code, is_down) for _, vk_code, is_down in backend.events]
+
+
+def test_events_are_sent_in_due_order_with_their_spacing():
+    backend = RecordingKeyBackend()
+    dispatcher = KeyDispatcher(backend)
+    simulator = KeySimulator(dispatcher)
+    started = time.monotonic()
+    simulator.press_key_with_modifier("shift", "1", duration=0.03)
+    simulator.press_key("2", duration=0.01)
+    assert dispatcher.wait_idle()
+    dispatcher.close()
+
+    assert _keys(backend) == [
+        (SHIFT, True), (KEY_2, True), (KEY_2, False),
+        (KEY_1, True), (KEY_1, False), (SHIFT, False),
+    ]
+    # Never sent before it's due
+    sent = {(vk_code, is_down): at - started for at, vk_code, is_down in backend.events}
+    assert sent[(KEY_2, False)] >= 0.01
+    assert sent[(KEY_1, True)] >= 0.02
+    assert sent[(KEY_1, False)] >= 0.05
+    assert sent[(SHIFT, False)] >= 0.07
+
+
+def test_events_due_together_keep_their_scheduling_order():
+    backend = RecordingKeyBackend()
+    dispatcher = KeyDispatcher(backend, clock=lambda: 0.0)
+    dispatcher.schedule([(0, KEY_1, True), (0, KEY_2, True), (0, KEY_1, False), (0, KEY_2, False)])
+    assert dispatcher.wait_idle()
+    dispatcher.close()
+    assert _keys(backend) == [(KEY_1, True), (KEY_2, True), (KEY_1, False), (KEY_2, False)]
+
+
+def test_close_releases_held_keys():
+    backend = RecordingKeyBackend()
+    dispatcher = KeyDispatcher(backend)
+    dispatcher.schedule([(0, KEY_1, True), (10.0, KEY_1, False), (20.0, KEY_2, True)])
+    deadline = time.monotonic() + 1.0
+    while not backend.events and time.monotonic() < deadline:
+        time.sleep(0.001)
+    started = time.monotonic()
+    dispatcher.close()
+    assert time.monotonic() - started < 0.5
+    # The pending key down is dropped, the key up sent right away
+    assert _keys(backend) == [(KEY_1, True), (KEY_1, False)]
+    assert dispatcher.pending == 0
+
+
+def test_close_while_a_key_down_is_being_sent_still_releases_it():
+    backend = BlockingBackend()
+    dispatcher = KeyDispatcher(backend)
+    dispatcher.schedule([(0, KEY_1, True), (10.0, KEY_1, False)])
+    assert backend.sending.wait(1.0)
+
+    closer = threading.Thread(target=dispatcher.close)
+    closer.start()
+    deadline = time.monotonic() + 1.0
+    while not dispatcher._closed and time.monotonic() < deadline:
+        time.sleep(0.001)
+    backend.release.set()
+    closer.join(2.0)
+
+    assert _keys(backend) == [(KEY_1, True), (KEY_1, False)]
+
+
+def test_wait_idle_waits_for_an_event_being_sent():
+    backend = BlockingBackend()
+    dispatcher = KeyDispatcher(backend)
+    dispatcher.schedule([(0, KEY_1, True)])
+    assert backend.sending.wait(1.0)
+    # Popped off the heap but not sent yet
+    assert dispatcher.pending == 1
+    assert not dispatcher.wait_idle(timeout=0.05)
+
+    backend.release.set()
+    assert dispatcher.wait_idle()
+    assert _keys(backend) == [(KEY_1, True)]
+    dispatcher.close()
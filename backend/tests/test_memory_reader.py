@@ -0,0 +1,176 @@
+"""MemoryReader against a fake process image served by BytearrayProcessBackend"""
+import struct
+
+import pytest
+
+from core.memory_reader import (CLIENT_POINTER_BASE, CLIENT_POINTER_OFFSETS, COMBAT_FLAG,
+                                BytearrayProcessBackend, MemoryReader)
+
+BASE = 0x00DD0000
+SIZE = 0x40000
+
+
+class FakeProcess:
+    """A process image with the client pointer chain, a player and a target"""
+
+    def __init__(self):
+        self.memory = bytearray(SIZE)
+        self.backend = BytearrayProcessBackend(self.memory, BASE)
+        self.links = [BASE + 0x10000, BASE + 0x11000]
+        self.client = BASE + 0x12000
+        self.player = BASE + 0x14000
+        self.target = BASE + 0x16000
+        self.write_chain(self.links + [self.client])
+        self.write(self.client + 0xC98, self.player)
+        self.write(self.client + 0xCA0, self.target)
+
+    def write(self, address: int, value: int):
+        struct.pack_into("<I", self.memory, address - BASE, value)
+
+    def write_chain(self, pointers):
+        address = CLIENT_POINTER_BASE
+        for offset, pointer in zip(CLIENT_POINTER_OFFSETS, pointers):
+            self.write(address + offset, pointer)
+            address = pointer
+
+    def set_player(self, health, max_health, power, max_power, in_combat):
+        self.write(self.player + 0x94, COMBAT_FLAG if in_combat else 0)
+        self.write(self.player + 0xF8, health)
+        self.write(self.player + 0xFC, max_health)
+        self.write(self.player + 0x104, power)
+        self.write(self.player + 0x108, max_power)
+
+    def set_target(self, name, health, max_health):
+        self.write(self.target + 0xF8, health)
+        self.write(self.target + 0xFC, max_health)
+        chars = [ord(c) for c in name][:12]
+        for i in range(12):
+            self.write(self.target + 0x200 + i * 4, chars[i] if i < len(chars) else 0)
+
+
+def _read(process, snapshot_mode, cache_pointers=True):
+    reader = MemoryReader(process.backend, snapshot_mode=snapshot_mode, cache_pointers=cache_pointers)
+    return reader.get_game_state().to_dict()
+
+
+@pytest.mark.parametrize("player, target", [
+    ((8000, 10000, 40, 100, True), ("训练假人", 500, 1000)),
+    ((1, 10000, 0, 120, False), ("Hogger", 0, 1000)),
+    ((10000, 10000, 100, 100, True), ("", 1000, 1000)),
+    ((0, 0, 0, 0, False), ("Dummy", 10, 0)),
+])
+def test_snapshot_matches_field_reads(player, target):
+    process = FakeProcess()
+    process.set_player(*player)
+    process.set_target(*target)
+    snapshot = _read(process, snapshot_mode=True)
+    assert snapshot == _read(process, snapshot_mode=False)
+    assert snapshot["power"] == player[2]
+    assert snapshot["inCombat"] == player[4]
+    assert snapshot["targetName"] == target[0]
+
+
+def test_no_target_matches_field_reads():
+    process = FakeProcess()
+    process.set_player(5000, 10000, 30, 100, True)
+    process.write(process.client + 0xCA0, 0)
+    snapshot = _read(process, snapshot_mode=True)
+    assert snapshot == _read(process, snapshot_mode=False)
+    assert snapshot["targetName"] == ""
+    assert snapshot["targetHealthPercent"] == 100
+
+
+def test_snapshot_mode_reads_less():
+    process = FakeProcess()
+    process.set_player(5000, 10000, 30, 100, True)
+    process.set_target("Dummy", 10, 100)
+    reader = MemoryReader(process.backend, snapshot_mode=True)
+    reader.get_game_state()
+    snapshot_reads = process.backend.reads
+    process.backend.reads = 0
+    MemoryReader(process.backend, snapshot_mode=False).get_game_state()
+    assert snapshot_reads < process.backend.reads
+
+
+def test_cached_chain_is_reused_and_follows_a_moved_client():
+    process = FakeProcess()
+    process.set_player(5000, 10000, 30, 100, True)
+    reader = MemoryReader(process.backend)
+    cache = reader.pointer_cache
+
+    reader.get_game_state()
+    assert cache.misses == 1
+    process.backend.reads = 0
+    assert reader.get_game_state().power == 30
+    assert cache.hits == 1
+    # The sentinel read plus the unit pointers, player and target regions
+    assert process.backend.reads == 4
+
+    # Client object moved (zone change): the last link changes
+    moved = BASE + 0x20000
+    process.write(moved + 0xC98, process.player)
+    process.write(moved + 0xCA0, process.target)
+    process.write(process.links[-1] + CLIENT_POINTER_OFFSETS[-1], moved)
+    process.set_player(5000, 10000, 55, 100, True)
+    assert reader.get_game_state().power == 55
+    assert cache.misses == 2
+    assert cache.entries[(CLIENT_POINTER_BASE, CLIENT_POINTER_OFFSETS)][1] == moved
+
+
+def test_revalidation_picks_up_a_changed_intermediate_link():
+    process = FakeProcess()
+    process.set_player(5000, 10000, 30, 100, True)
+    reader = MemoryReader(process.backend)
+    cache = reader.pointer_cache
+    cache.revalidate_interval = 3
+    reader.get_game_state()
+
+    # A new chain whose old last link still holds the old client pointer
+    links = [BASE + 0x30000, BASE + 0x31000]
+    client = BASE + 0x32000
+    player = BASE + 0x34000
+    process.write_chain(links + [client])
+    process.write(client + 0xC98, player)
+    process.player = player
+    process.set_player(5000, 10000, 77, 100, True)
+
+    powers = [reader.get_game_state().power for _ in range(4)]
+    # Stale while the sentinel still matches, then re-walked
+    assert powers == [30, 30, 30, 77]
+    assert cache.revalidations == 1
+
+
+def test_lost_player_invalidates_the_cache():
+    process = FakeProcess()
+    process.set_player(5000, 10000, 30, 100, True)
+    reader = MemoryReader(process.backend)
+    reader.get_game_state()
+    assert reader.pointer_cache.entries
+
+    # Loading screen: the client object no longer has a player
+    process.write(process.client + 0xC98, 0)
+    state = reader.get_game_state()
+    assert not reader.pointer_cache.entries
+    assert state.power == 0
+
+
+def test_broken_chain_resets_the_state():
+    process = FakeProcess()
+    process.set_player(5000, 10000, 30, 100, True)
+    reader = MemoryReader(process.backend)
+    assert reader.get_game_state().power == 30
+    # Logged out: the last link is cleared
+    process.write(process.links[-1] + CLIENT_POINTER_OFFSETS[-1], 0)
+    state = reader.get_game_state()
+    assert state.power == 0
+    assert not state.in_combat
+
+
+def test_unmapped_reads_count_failures():
+    process = FakeProcess()
+    process.set_player(5000, 10000, 30, 100, True)
+    process.write(process.client + 0xC98, 0x7FFF0000)
+    reader = MemoryReader(process.backend)
+    state = reader.get_game_state()
+    assert state.power == 0
+    assert reader.counters.collect()[MemoryReader.COUNT_READ_FAILURES] > 0
@@ -0,0 +1,135 @@
+"""Prometheus exposition, the /metrics endpoint and the dropped tick counters behind it"""
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+from core.async_runtime import AsyncEngineRuntime
+from core.engine_worker import EngineWorker
+from core.game_state import GameState
+from core.metrics import MetricsServer, ThreadCounters
+from core.rotation_engine import RotationEngine
+from core.simulator import NullKeySink, VirtualClock
+from core.spell_registry import REGISTRY
+
+
+class SlowReader:
+    """Returns the same state after sleeping for delay seconds"""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.state = GameState()
+
+    def get_game_state(self):
+        if self.delay:
+            time.sleep(self.delay)
+        return self.state
+
+
+def _engine():
+    engine = RotationEngine(None, NullKeySink(), clock=VirtualClock(10.0))
+    engine.set_class("druid")
+    engine.set_keybinds({})
+    return engine
+
+
+def _samples(text: str) -> dict:
+    """Sample lines as {name{labels}: value}, checking each has HELP and TYPE lines"""
+    samples = {}
+    described = set()
+    for line in text.splitlines():
+        if line.startswith("# HELP "):
+            described.add(line.split()[2])
+            continue
+        if line.startswith("# TYPE "):
+            name, kind = line.split()[2:4]
+            assert name in described and kind in ("counter", "gauge")
+            continue
+        key, value = line.rsplit(" ", 1)
+        assert key.split("{", 1)[0] in described
+        samples[key] = float(value)
+    return samples
+
+
+def test_thread_counters_sum_every_shard():
+    counters = ThreadCounters(2)
+    counters.shard()[0] += 3
+
+    def other():
+        counters.shard()[0] += 2
+        counters.shard()[1] += 1
+
+    thread = threading.Thread(target=other)
+    thread.start()
+    thread.join()
+    assert counters.collect() == [5, 1]
+
+
+def test_render_exposition():
+    engine = _engine()
+    engine.start()
+    spell_id = REGISTRY.intern('名字"带\\引号')
+    counts = engine.counters.shard()
+    counts[engine.COUNT_DECISIONS] += 7
+    counts[engine.COUNT_CASTS + spell_id] += 2
+    worker = EngineWorker(SlowReader(), engine)
+    worker.ticks = 11
+    worker.dropped_ticks = 3
+
+    text = MetricsServer(engine, engine_worker=worker).render()
+    assert text.endswith("\n")
+    samples = _samples(text)
+    assert samples["wowassist_ticks_total"] == 11
+    assert samples["wowassist_dropped_ticks_total"] == 3
+    assert samples["wowassist_decisions_total"] == 7
+    assert samples['wowassist_casts_total{spell="名字\\"带\\\\引号"}'] == 2
+    assert samples["wowassist_engine_running"] == 1
+    assert "wowassist_start_time_seconds" in samples
+
+
+def test_render_without_worker_or_reader_counters():
+    samples = _samples(MetricsServer(_engine()).render())
+    assert "wowassist_ticks_total" not in samples
+    assert "wowassist_read_failures_total" not in samples
+    assert samples["wowassist_engine_running"] == 0
+
+
+def test_endpoint_serves_metrics_on_a_free_port():
+    server = MetricsServer(_engine(), port=0)
+    assert server.start()
+    try:
+        assert server.port != 0
+        url = f"http://{server.host}:{server.port}"
+        with urllib.request.urlopen(url + "/metrics", timeout=2) as response:
+            assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+            assert "wowassist_decisions_total 0" in response.read().decode("utf-8")
+        with pytest.raises(urllib.error.HTTPError) as error:
+            urllib.request.urlopen(url + "/other", timeout=2)
+        assert error.value.code == 404
+    finally:
+        server.stop()
+
+
+def _run(worker, seconds: float):
+    worker.start()
+    time.sleep(seconds)
+    worker.stop()
+
+
+@pytest.mark.parametrize("worker_type", [EngineWorker, AsyncEngineRuntime])
+def test_event_driven_counts_late_decisions(worker_type):
+    # Every read takes three polling intervals, so each decision is late by two or more
+    worker = worker_type(SlowReader(delay=0.06), _engine(), interval=0.02, event_driven=True)
+    _run(worker, 0.4)
+    assert worker.ticks >= 2
+    assert worker.dropped_ticks >= 2 * (worker.ticks - 1)
+
+
+@pytest.mark.parametrize("worker_type", [EngineWorker, AsyncEngineRuntime])
+def test_event_driven_on_time_drops_nothing(worker_type):
+    worker = worker_type(SlowReader(), _engine(), interval=0.25, event_driven=True)
+    _run(worker, 0.4)
+    assert worker.ticks >= 2
+    assert worker.dropped_ticks == 0
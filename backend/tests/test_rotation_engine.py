@@ -0,0 +1,57 @@
+"""Event-driven wake-up estimates and cooldown bookkeeping"""
+import pytest
+
+from core.cooldowns import CooldownTracker
+from core.game_state import GameState
+from core.rotation_engine import RotationEngine
+from core.simulator import CombatSimulator, NullKeySink, VirtualClock
+
+
+def _engine(class_name: str, now: float = 10.0):
+    clock = VirtualClock(now)
+    engine = RotationEngine(None, NullKeySink(), clock=clock)
+    engine.set_class(class_name)
+    engine.set_keybinds({})
+    engine.start()
+    return engine, clock
+
+
+def test_decision_without_a_press_does_not_rate_limit():
+    engine, clock = _engine("death_knight")
+    state = GameState()
+    state.in_combat = True
+    state.power = 0
+    engine.update(state)
+    assert engine.last_action_time == 0
+    engine.power_regen_rate = 100.0
+    # Every spell needs 1+ power: the wake-up is the power crossing, not the rate limit
+    assert engine.time_until_next_action(state, ceiling=1.0) == pytest.approx(0.01)
+
+
+def test_press_starts_the_rate_limit():
+    engine, clock = _engine("death_knight")
+    state = GameState()
+    state.in_combat = True
+    state.power = 100
+    engine.update(state)
+    assert engine.last_action_time == 10.0
+    clock.advance(0.05)
+    assert engine.time_until_next_action(state, ceiling=1.0) >= 0.05 - 1e-9
+
+
+def test_cooldown_heap_stays_bounded_without_earliest_ready():
+    simulator = CombatSimulator("druid")
+    simulator.run(600.0)
+    heap = simulator.engine.cooldowns._heap
+    assert len(heap) <= len(simulator.engine.program)
+
+
+def test_superseded_and_expired_entries_are_pruned_on_cast():
+    cooldowns = CooldownTracker()
+    for now in range(100):
+        cooldowns.record_cast(1, float(now), cooldown=5.0)
+        cooldowns.record_cast(2, float(now), cooldown=0.5)
+    # Only the live entry of each spell is left
+    assert sorted(cooldowns._heap) == [(99.5, 2), (104.0, 1)]
+    assert cooldowns.earliest_ready(99.0) == (99.5, 2)
+    assert cooldowns.earliest_ready(100.0) == (104.0, 1)
@@ -0,0 +1,114 @@
+"""Rotation file parsing, validation and the loader cache"""
+import glob
+import os
+
+import pytest
+
+from config.rotations import ROTATION_DIR
+from core.rotation_loader import RotationError, RotationLoader, parse_rotation, validate_rotation
+
+SPELL_TOML = """
+[[spells]]
+name = "爪击"
+key = "4"
+conditions = { power = 40 }
+"""
+
+
+def _issues(text: str, path: str = "druid.toml", class_name=None):
+    document, issues = parse_rotation(text.encode("utf-8"), path)
+    if issues:
+        return issues
+    return validate_rotation(document, class_name)
+
+
+def _messages(issues, severity="error"):
+    return [issue.message for issue in issues if issue.severity == severity]
+
+
+@pytest.mark.parametrize("path", sorted(glob.glob(os.path.join(ROTATION_DIR, "*"))))
+def test_builtin_rotations_are_clean(path):
+    with open(path, "rb") as f:
+        document, issues = parse_rotation(f.read(), path)
+    class_name = os.path.splitext(os.path.basename(path))[0]
+    assert issues + validate_rotation(document, class_name) == []
+
+
+def test_duplicate_toml_key():
+    issues = _issues('class = "druid"\nclass = "druid"\n' + SPELL_TOML)
+    assert len(issues) == 1
+    assert issues[0].message.startswith("duplicate key")
+
+
+@pytest.mark.parametrize("text, message, index", [
+    ('{"class": "druid", "class": "hunter", "spells": [{"name": "爪击"}]}',
+     "duplicate key 'class'", None),
+    ('{"spells": [{"name": "爪击", "key": "4", "key": "5"}]}', "duplicate key 'key'", 0),
+    ('{"spells": [{"name": "爪击", "conditions": {"power": 40, "power": 50}}]}',
+     "duplicate condition 'power'", 0),
+])
+def test_duplicate_json_keys(text, message, index):
+    issues = _issues(text, "druid.json")
+    assert [(issue.message, issue.index) for issue in issues] == [(message, index)]
+
+
+@pytest.mark.parametrize("text, message", [
+    ('classs = "druid"\n' + SPELL_TOML, "unknown field 'classs'"),
+    (SPELL_TOML + 'cooldwn = 10\n', "unknown field 'cooldwn'"),
+    (SPELL_TOML.replace("power = 40", "power = 40, has_buf = '猛虎'"), "unknown condition 'has_buf'"),
+    ('title = 3\n' + SPELL_TOML, "'title' must be a non-empty string"),
+    ('class = ""\n' + SPELL_TOML, "'class' must be a non-empty string"),
+    (SPELL_TOML.replace("power = 40", "power = 'lots'"), "'power' must be a number"),
+    (SPELL_TOML + 'gcd = -1\n', "'gcd' must be a non-negative number"),
+    ('title = "no spells"\n', "rotation has no [[spells]] entries"),
+])
+def test_unknown_fields_and_bad_values(text, message):
+    assert message in _messages(_issues(text))
+
+
+def test_class_must_match_the_loaded_class():
+    text = 'class = "hunter"\n' + SPELL_TOML
+    assert _messages(_issues(text)) == []
+    assert _messages(_issues(text, class_name="druid")) == [
+        "'class' is 'hunter' but the file is loaded for 'druid'"]
+
+
+@pytest.mark.parametrize("when, message", [
+    ("power >=", "invalid syntax"),
+    ("mana > 3", "unknown name 'mana'"),
+    ("buff(猛虎, 2)", "buff() takes one aura name"),
+    ("power if in_combat else 0", "unsupported syntax"),
+    ("target.mana > 3", "unknown name 'target.mana'"),
+])
+def test_bad_expressions(when, message):
+    errors = _messages(_issues(SPELL_TOML + f"when = {when!r}\n"))
+    assert len(errors) == 1
+    assert errors[0].startswith("'when': ") and message in errors[0]
+
+
+def test_always_false_expression_warns():
+    issues = _issues(SPELL_TOML + 'when = "power > 10 and 1 > 2"\n')
+    assert _messages(issues) == []
+    assert _messages(issues, "warning") == ["'when' is always false"]
+
+
+def test_unreachable_priority_warns():
+    text = SPELL_TOML + SPELL_TOML.replace("power = 40", "power = 50")
+    issues = _issues(text)
+    assert [(issue.message, issue.index) for issue in issues if issue.severity == "warning"] == [
+        ("unreachable: shadowed by '爪击' (#1)", 1)]
+
+
+def test_loader_raises_and_caches(tmp_path):
+    path = tmp_path / "druid.toml"
+    path.write_text('class = "druid"\n' + SPELL_TOML, encoding="utf-8")
+    loader = RotationLoader(str(tmp_path))
+    rotation = loader.load("druid")
+    assert loader.load("druid") is rotation
+    assert (loader.hits, loader.misses) == (1, 1)
+
+    path.write_text('class = "hunter"\n' + SPELL_TOML, encoding="utf-8")
+    os.utime(path, ns=(1, 1))
+    with pytest.raises(RotationError) as error:
+        loader.load("druid")
+    assert "but the file is loaded for 'druid'" in str(error.value)
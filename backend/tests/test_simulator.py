@@ -0,0 +1,55 @@
+"""Offline simulator: virtual clock, rate limiting and result counters"""
+import pytest
+
+from core.simulator import CombatSimulator
+
+
+@pytest.mark.parametrize("class_name", ["monk", "druid"])
+def test_tick_equal_to_action_cooldown_is_never_rate_limited(class_name):
+    simulator = CombatSimulator(class_name, tick=0.1, action_cooldown=0.1)
+    result = simulator.run(300.0)
+    assert result.ticks == 3000
+    # Only the first tick, at the engine's initial last_action_time, is limited
+    assert result.decisions == result.ticks - 1
+
+
+def test_decisions_match_slightly_shorter_action_cooldown():
+    exact = CombatSimulator("monk", tick=0.1, action_cooldown=0.1).run(300.0)
+    shorter = CombatSimulator("monk", tick=0.1, action_cooldown=0.0999).run(300.0)
+    assert exact.decisions == shorter.decisions
+    assert exact.casts == shorter.casts
+
+
+def test_virtual_clock_does_not_drift():
+    simulator = CombatSimulator("monk", tick=0.1)
+    simulator.run(3000.0)
+    assert simulator.clock() == 3000.0
+
+
+def test_longer_action_cooldown_rate_limits_presses():
+    simulator = CombatSimulator("monk", tick=0.1, action_cooldown=0.25)
+    result = simulator.run(300.0)
+    times = [at for at, _, _ in simulator.sink.presses]
+    assert min(b - a for a, b in zip(times, times[1:])) >= 0.25 - 1e-9
+    # Only ticks after a press are limited, not every tick after a decision
+    assert result.ticks / 3 < result.decisions < result.ticks
+    assert result.ticks_per_second >= result.decisions_per_second
+
+
+def test_casts_are_credited_to_the_chosen_spell_when_keys_are_shared():
+    rotation = [
+        {"name": "割裂", "key": "2", "gcd": 1.5, "conditions": {"has_not_debuff": "割裂", "power": 30}},
+        {"name": "爪击", "key": "2", "gcd": 1.5, "conditions": {"power": 40}},
+    ]
+    simulator = CombatSimulator("druid", rotation=rotation)
+    result = simulator.run(120.0)
+    # 割裂 lasts 15s, so it's cast at most once per refresh; 爪击 fills the rest
+    assert 1 <= result.casts["割裂"] <= 120 / 15 + 1
+    assert result.casts["爪击"] > result.casts["割裂"]
+    assert result.total_casts == len(simulator.sink.presses)
+
+
+def test_self_heal_is_counted_under_its_name():
+    result = CombatSimulator("monk", health_percent=10).run(30.0)
+    assert result.casts["治疗石"] > 0
+    assert "7" not in result.casts
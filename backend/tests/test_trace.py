@@ -0,0 +1,109 @@
+"""Decision trace recorder: records, wrap-around, dumps and out-of-range values"""
+from core.game_state import GameState
+from core.spell_registry import REGISTRY
+from core.trace import (FLAG_IN_COMBAT, FLAG_PRESSED, NO_SPELL, TraceRecorder,
+                        iter_records, load_trace, mask_ids)
+
+
+def _state(power=50, max_power=100, health=80, target_hp=60):
+    state = GameState()
+    state.power = power
+    state.max_power = max_power
+    state.health_percent = health
+    state.target_health_percent = target_hp
+    state.in_combat = True
+    return state
+
+
+def test_records_fields_and_aura_bitsets():
+    trace = TraceRecorder(capacity=8)
+    state = _state()
+    aura_id = REGISTRY.intern("割裂")
+    trace.record(1.0, state, 3, 5, FLAG_PRESSED)
+    state.debuffs.set(aura_id, 10.0, 1)
+    trace.record(2.0, state, NO_SPELL, 0, 0)
+
+    first, second = iter_records(*trace.snapshot())
+    assert first[:8] == (1.0, 50, 100, 80, 60, FLAG_IN_COMBAT | FLAG_PRESSED, 3, 5)
+    assert mask_ids(first[9]) == []
+    assert second[6] == NO_SPELL
+    assert mask_ids(second[9]) == [aura_id]
+
+
+def test_wraps_around_in_chronological_order():
+    trace = TraceRecorder(capacity=4)
+    state = _state()
+    for tick in range(10):
+        trace.record(float(tick), state, NO_SPELL, 0, 0)
+    assert len(trace) == 4
+    assert [record[0] for record in iter_records(*trace.snapshot())] == [6.0, 7.0, 8.0, 9.0]
+
+
+def test_out_of_range_reads_are_clamped():
+    # Garbage memory reads: power is read as uint32, health percents computed from it
+    trace = TraceRecorder(capacity=4)
+    state = _state(power=2 ** 32 - 1, max_power=2 ** 31, health=-70000, target_hp=100000)
+    trace.record(1.0, state, 3, 0, 0)
+    record = next(iter_records(*trace.snapshot()))
+    assert record[1:5] == (2 ** 31 - 1, 2 ** 31 - 1, -2 ** 15, 2 ** 15 - 1)
+    assert trace.count == 1
+
+
+def test_dump_round_trip(tmp_path):
+    trace = TraceRecorder(capacity=4)
+    state = _state()
+    for tick in range(6):
+        trace.record(float(tick), state, 3, 0, 0)
+    path = tmp_path / "trace.bin"
+    assert trace.dump(str(path), meta={"class": "druid"}) == 4
+    meta, records, auras = load_trace(str(path))
+    assert meta["class"] == "druid"
+    assert meta["dropped"] == 2
+    assert [record[0] for record in iter_records(records, auras)] == [2.0, 3.0, 4.0, 5.0]
+
+
+def test_auras_are_stored_only_on_change():
+    trace = TraceRecorder(capacity=8)
+    state = _state()
+    aura_id = REGISTRY.intern("猛虎之怒")
+    for tick in range(5):
+        if tick == 2:
+            state.buffs.set(aura_id, 10.0, 1)
+        trace.record(float(tick), state, NO_SPELL, 0, 0)
+    assert trace.aura_count == 1
+    rows = list(iter_records(*trace.snapshot()))
+    assert [mask_ids(row[8]) for row in rows] == [[], [], [aura_id], [aura_id], [aura_id]]
+
+
+def test_auras_survive_wrap_around(tmp_path):
+    # The change behind the oldest kept record still gives that record its auras
+    trace = TraceRecorder(capacity=4)
+    state = _state()
+    first_id = REGISTRY.intern("割裂")
+    second_id = REGISTRY.intern("斜掠")
+    for tick in range(12):
+        if tick == 1:
+            state.debuffs.set(first_id, 30.0, 1)
+        if tick == 10:
+            state.debuffs.set(second_id, 30.0, 1)
+        trace.record(float(tick), state, NO_SPELL, 0, 0)
+    expected = [(8.0, [first_id]), (9.0, [first_id]),
+                (10.0, sorted([first_id, second_id])), (11.0, sorted([first_id, second_id]))]
+    assert [(row[0], mask_ids(row[9])) for row in iter_records(*trace.snapshot())] == expected
+
+    path = tmp_path / "trace.bin"
+    trace.dump(str(path))
+    meta, records, auras = load_trace(str(path))
+    assert [(row[0], mask_ids(row[9])) for row in iter_records(records, auras)] == expected
+
+
+def test_aura_changes_every_tick_wrap_with_the_records():
+    trace = TraceRecorder(capacity=4)
+    state = _state()
+    for tick in range(10):
+        state.buffs.clear()
+        state.buffs.set(tick + 1, 10.0, 1)
+        trace.record(float(tick), state, NO_SPELL, 0, 0)
+    assert trace.aura_count == 10
+    rows = iter_records(*trace.snapshot())
+    assert [mask_ids(row[8]) for row in rows] == [[7], [8], [9], [10]]
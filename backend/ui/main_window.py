@@ -6,71 +6,25 @@ from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QH
                              QDialog, QGridLayout, QLineEdit, QTabWidget, QTextEdit)
 from PyQt6.QtCore import Qt, QTimer
 from PyQt6.QtGui import QFont
+import os
 import sys
+import time
 
+from core.async_runtime import AsyncEngineRuntime, AsyncKeyActor, create_qt_event_loop
+from core.engine_worker import EngineWorker
+from core.hot_reload import ConfigWatcher
+from core.key_dispatcher import create_key_backend, create_key_dispatcher
 from core.memory_reader import create_memory_reader
+from core.metrics import MetricsServer
+from core.profiler import STAGE_LABELS, create_engine_profiler
 from core.key_simulator import KeySimulator
 from core.rotation_engine import RotationEngine
-
-
-# Default spell keybinds for each class
-DEFAULT_KEYBINDS = {
-    "death_knight": {
-        "暗影打击": "1",
-        "传染": "2",
-        "心脏打击": "3",
-        "灵界打击": "4",
-        "符文打击": "5",
-        "枯萎凋零": "q",
-        "血液沸腾": "e",
-    },
-    "hunter": {
-        "杀戮命令": "1",
-        "奥术射击": "2",
-        "多重射击": "3",
-        "稳固射击": "4",
-        "钉刺": "5",
-        "狂野怒火": "q",
-        "误导": "e",
-    },
-    "warrior": {
-        "致死打击": "1",
-        "巨人打击": "2",
-        "压制": "3",
-        "顺劈斩": "4",
-        "英勇打击": "5",
-        "撕裂": "q",
-        "冲锋": "e",
-    },
-    "monk": {
-        "猛虎掌": "1",
-        "幻灭踢": "2",
-        "碎玉闪电": "3",
-        "连击": "4",
-        "腿击": "q",
-        "旭日东升踢": "e",
-    },
-    "shaman": {
-        "闪电箭": "1",
-        "大地震击": "2",
-        "风暴打击": "3",
-        "烈焰震击": "4",
-        "元素冲击": "q",
-        "冰霜震击": "e",
-    },
-    "druid": {
-        "凶猛撕咬": "1",
-        "斜掠": "2",
-        "割裂": "3",
-        "爪击": "4",
-        "裂伤": "5",
-        "狂暴": "q",
-    },
-}
+from config.keybinds import load_keybinds
+from ui.state_bridge import StateBridge
 
 
 class MainWindow:
-    def __init__(self):
+    def __init__(self, runtime: str = "thread"):
         self.app = QApplication(sys.argv)
         self.window = QMainWindow()
         self.window.setWindowTitle("WoW Assist - 魔兽世界自动输出辅助")
@@ -78,19 +32,69 @@ class MainWindow:
 
         # Core components - using memory reader
         self.memory_reader = create_memory_reader()
-        self.key_simulator = KeySimulator()
+        # With the async runtime keys are sent by its actor task instead of a dispatcher thread
+        self.key_actor = None
+        if runtime == "async":
+            backend = create_key_backend()
+            if backend is not None:
+                self.key_actor = AsyncKeyActor(backend)
+            self.key_simulator = KeySimulator(dispatcher=self.key_actor)
+        else:
+            self.key_simulator = KeySimulator(dispatcher=create_key_dispatcher())
         self.rotation_engine = RotationEngine(self.memory_reader, self.key_simulator)
 
+        # Per-stage latency histograms, hooked in only while enabled
+        self.profiler = create_engine_profiler(self.memory_reader, self.rotation_engine)
+        self.profiler.add_stage("ui", self, "update_loop")
+
         # Keybinds
         self.current_class_keybinds = {}
 
         self.is_running = False
         self.setup_ui()
 
-        # Update timer
-        self.timer = QTimer()
-        self.timer.timeout.connect(self.update_loop)
-        self.timer.start(100)
+        # State polling and rotation run on a worker thread; the UI only
+        # repaints from the snapshots it publishes, at most once per frame
+        refresh_rate = self.app.primaryScreen().refreshRate() or 60
+        self.state_bridge = StateBridge(frame_interval=1 / refresh_rate)
+        # Looked up on every call so the profiler can wrap update_loop
+        self.state_bridge.state_changed.connect(lambda state: self.update_loop(state))
+        # The async runtime shares the GUI event loop when qasync is installed,
+        # otherwise it runs its own loop on a thread like the engine worker
+        self.event_loop = None
+        if runtime == "async":
+            self.event_loop = create_qt_event_loop(self.app)
+            self.engine_worker = AsyncEngineRuntime(
+                self.memory_reader,
+                self.rotation_engine,
+                actor=self.key_actor,
+                interval=0.1,
+                on_state=self.state_bridge.publish,
+                event_driven=True,
+            )
+        else:
+            self.engine_worker = EngineWorker(
+                self.memory_reader,
+                self.rotation_engine,
+                interval=0.1,
+                on_state=self.state_bridge.publish,
+                event_driven=True,
+            )
+        self.app.aboutToQuit.connect(self.engine_worker.stop)
+        if self.event_loop is not None:
+            self.engine_worker.start(self.event_loop)
+        else:
+            self.engine_worker.start()
+
+        # Reload rotation and keybind files when they are edited
+        self.config_watcher = ConfigWatcher(self.rotation_engine)
+        self.app.aboutToQuit.connect(self.config_watcher.stop)
+        self.config_watcher.start()
+
+        # Prometheus /metrics on loopback for long sessions
+        self.metrics_server = MetricsServer(self.rotation_engine, self.memory_reader, self.engine_worker)
+        self.app.aboutToQuit.connect(self.metrics_server.stop)
+        self.metrics_server.start()
 
     def setup_ui(self):
         central_widget = QWidget()
@@ -167,6 +171,10 @@ class MainWindow:
         self.config_button.clicked.connect(self.open_keybind_config)
         button_layout.addWidget(self.config_button)
 
+        self.trace_button = QPushButton("导出决策记录")
+        self.trace_button.clicked.connect(self.dump_trace)
+        button_layout.addWidget(self.trace_button)
+
         main_layout.addLayout(button_layout)
         main_tab.setLayout(main_layout)
         tabs.addTab(main_tab, "主界面")
@@ -188,6 +196,30 @@ class MainWindow:
         keybind_tab.setLayout(keybind_layout)
         tabs.addTab(keybind_tab, "按键配置")
 
+        # Tab 3: Performance
+        perf_tab = QWidget()
+        perf_layout = QVBoxLayout()
+
+        self.profile_check = QCheckBox("启用性能分析")
+        self.profile_check.toggled.connect(self.toggle_profiling)
+        perf_layout.addWidget(self.profile_check)
+
+        self.perf_text = QTextEdit()
+        self.perf_text.setReadOnly(True)
+        self.perf_text.setFont(QFont("Courier", 10))
+        perf_layout.addWidget(QLabel("各阶段耗时 (微秒):"))
+        perf_layout.addWidget(self.perf_text)
+
+        self.reset_perf_button = QPushButton("清零")
+        self.reset_perf_button.clicked.connect(self.reset_profiling)
+        perf_layout.addWidget(self.reset_perf_button)
+
+        perf_tab.setLayout(perf_layout)
+        tabs.addTab(perf_tab, "性能")
+
+        self.perf_timer = QTimer()
+        self.perf_timer.timeout.connect(self.refresh_perf_display)
+
         layout.addWidget(tabs)
 
         # Log
@@ -209,7 +241,7 @@ class MainWindow:
             "德鲁伊": "druid"
         }
         key = class_map.get(class_name, "death_knight")
-        self.current_class_keybinds = DEFAULT_KEYBINDS.get(key, {}).copy()
+        self.current_class_keybinds = load_keybinds(key)
 
         # Update rotation engine
         self.rotation_engine.set_keybinds(self.current_class_keybinds)
@@ -282,21 +314,48 @@ class MainWindow:
         self.stop_button.setEnabled(False)
         self.status_label.setText("状态: 已停止")
 
-    def update_loop(self):
-        state = self.memory_reader.get_game_state()
-
-        self.health_label.setText(f"生命值: {state.get('healthPercent', 0)}%")
-        self.energy_label.setText(f"能量: {state.get('power', 0)}/{state.get('maxPower', 100)}")
-        self.in_combat_label.setText(f"战斗状态: {'是' if state.get('inCombat', False) else '否'}")
-
-        if self.is_running:
-            self.rotation_engine.update()
+    def toggle_profiling(self, enabled: bool):
+        if enabled:
+            self.profiler.enable()
+            self.perf_timer.start(1000)
+        else:
+            self.profiler.disable()
+            self.perf_timer.stop()
+        self.refresh_perf_display()
+
+    def reset_profiling(self):
+        self.profiler.reset()
+        self.refresh_perf_display()
+
+    def refresh_perf_display(self):
+        text = self.profiler.format(STAGE_LABELS)
+        stats = self.rotation_engine.condition_stats
+        if stats is not None and stats.samples:
+            text += "\n\n" + stats.format()
+        self.perf_text.setText(text)
+
+    def dump_trace(self):
+        """Write the engine's decision trace to traces/ for offline inspection"""
+        os.makedirs("traces", exist_ok=True)
+        path = os.path.join("traces", time.strftime("trace-%Y%m%d-%H%M%S.bin"))
+        count = self.rotation_engine.dump_trace(path)
+        self.log(f"已导出 {count} 条决策记录: {path}")
+
+    def update_loop(self, state):
+        """Repaint the game state labels from a worker snapshot"""
+        self.health_label.setText(f"生命值: {state.health_percent}%")
+        self.energy_label.setText(f"能量: {state.power}/{state.max_power}")
+        self.in_combat_label.setText(f"战斗状态: {'是' if state.in_combat else '否'}")
 
     def log(self, message):
         self.log_label.setText(f"日志: {message}")
 
     def run(self):
         self.window.show()
+        if self.event_loop is not None:
+            with self.event_loop:
+                self.event_loop.run_forever()
+            return 0
         return self.app.exec()
 
 
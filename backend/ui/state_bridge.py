@@ -0,0 +1,56 @@
+"""
+State Bridge
+Hands game state snapshots from the engine worker thread to the Qt GUI thread
+"""
+import threading
+import time
+
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
+
+from core.game_state import SnapshotBuffer
+
+
+class StateBridge(QObject):
+    """
+    Coalescing worker -> GUI signal
+    publish() may be called at any rate from the reading thread, with the
+    reader's live state; it is copied into preallocated buffers, so publishing
+    never allocates. state_changed is emitted on the GUI thread with the latest
+    snapshot, at most once per frame, valid until the next emit.
+    """
+    state_changed = pyqtSignal(object)
+    _notify = pyqtSignal()
+
+    def __init__(self, frame_interval: float = 1 / 60):
+        super().__init__()
+        self.frame_interval = frame_interval
+        self._lock = threading.Lock()
+        self._snapshots = SnapshotBuffer()
+        self._pending = False
+        self._last_emit = 0.0
+        # Cross-thread emit is delivered as a queued call on the GUI thread
+        self._notify.connect(self._deliver)
+
+    def publish(self, state):
+        """Store the latest snapshot, waking the GUI thread only if it isn't already due"""
+        self._snapshots.publish(state)
+        with self._lock:
+            if self._pending:
+                return
+            self._pending = True
+        self._notify.emit()
+
+    def _deliver(self):
+        wait = self.frame_interval - (time.monotonic() - self._last_emit)
+        if wait > 0:
+            # Too soon since the last repaint, try again at the next frame
+            QTimer.singleShot(int(wait * 1000) + 1, self._deliver)
+            return
+
+        with self._lock:
+            self._pending = False
+        state = self._snapshots.take()
+        if state is None:
+            return
+        self._last_emit = time.monotonic()
+        self.state_changed.emit(state)